@@ -1,6 +1,5 @@
 
-import json
-import os
+import catalog
 
 # with open("meteorites_data.json", "r", encoding= "utf-8") as f:
 #     datos = json.load(f)
@@ -9,52 +8,24 @@ import os
 #         print(metodo["name"])
 
 
-# Obtener la carpeta raíz del proyecto (donde está app.py)
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))  # carpeta Controllers
-ROOT_DIR = os.path.dirname(BASE_DIR)                  # sube un nivel a la raíz
-JSON_PATH = os.path.join(ROOT_DIR, "meteorites_data.json")
-
-with open(JSON_PATH, "r", encoding="utf-8") as f:
-    datos = json.load(f)
+# El catálogo lo carga y recarga catalog.get_provider(), compartido con routes.py.
+# Cada función toma una sola instantánea para no mezclar versiones a mitad de petición.
 
 
 def Listameteoros():
-    names = []
-    for metodo in datos["neos"]:
-        names.append(metodo["name"])  
-    return names  # Regresa la lista, no hagas json.dumps aquí
+    return catalog.get_catalog().names  # Regresa la lista, no hagas json.dumps aquí
 
 
 def infoasteroide(name):
-    for metodo in datos["neos"]:
-        if name == metodo["name"]:
-            return metodo
+    return catalog.get_catalog().find(name)
 
 def velocidad(name):
-    for metodo in datos["neos"]:
-        if name == metodo["name"]:
-            return metodo
+    return catalog.get_catalog().find(name)
 
 def todos(name):
-    for metodo in datos["neos"]:
-        if name == metodo["name"]:
-            return metodo
-
-def top_impacto(n=5):
-    lista = datos["neos"][:]
-    for i in range(1, len(lista)):
-        key = lista[i]
-        j = i - 1
-        while j >= 0 and lista[j]["impact"] < key["impact"]:
-            lista[j + 1] = lista[j]
-            j -= 1
-        lista[j + 1] = key
-    
-    top5 = lista[:5]
-    return json.dumps(top5)
-
-
-
-
+    return catalog.get_catalog().find(name)
 
-    
+def top_impacto(n=5, key="energy", order="desc"):
+    # Antes: copia completa + ordenamiento por inserción O(n²) sobre un campo
+    # inexistente. Ahora se lee del índice ordenado construido al cargar.
+    return catalog.get_catalog().top_k(n, key, order)  # Lista, jsonify lo serializa
@@ -22,11 +22,29 @@ document.addEventListener('DOMContentLoaded', function () {
     // Añade la capa satelital por defecto
     esriSat.addTo(map);
 
+    // Capa global de zonas de daño renderizada en el servidor (/api/tiles) para el meteorito
+    // seleccionado, con impactos en las ubicaciones de referencia; se activa desde el control de capas
+    const hazardLayer = L.tileLayer('/api/tiles/{z}/{x}/{y}.png?{scenario}', {
+        scenario: 'diameter=1000&velocity=20&density=3000',
+        opacity: 0.7,
+        maxZoom: 18,
+        attribution: 'Zonas de daño: modelo de impacto local'
+    });
+    window.updateHazardLayer = function(diameter, velocity, density) {
+        if (!(diameter > 0) || !(velocity > 0)) return;
+        const scenario = `diameter=${diameter}&velocity=${velocity}&density=${density || 3000}`;
+        if (hazardLayer.options.scenario === scenario) return;
+        hazardLayer.options.scenario = scenario;
+        if (map.hasLayer(hazardLayer)) hazardLayer.redraw();
+    };
+
     // Control para alternar entre capas base (ubicado en bottomleft para evitar solapamiento con HUD)
     L.control.layers({
         'Satelital': esriSat,
         'Mapa calles': osmStreets
-    }, null, { position: 'bottomleft' }).addTo(map);
+    }, {
+        'Zonas de daño (global)': hazardLayer
+    }, { position: 'bottomleft' }).addTo(map);
 
     let impactMarker;
     let impactCircle;
@@ -162,6 +180,7 @@ document.addEventListener('DOMContentLoaded', function () {
             velocity = parseFloat(document.getElementById('custom-velocity')?.value) || 0;
             density = parseFloat(document.getElementById('custom-density')?.value) || density;
         }
+        window.updateHazardLayer(diameter, velocity, density);
 
         const intensityInput = document.getElementById('quake-intensity');
         let intensityValueFromForm = null;
@@ -425,24 +444,46 @@ document.addEventListener('DOMContentLoaded', function () {
                     }
                 }
 
+                // actualizar panel de energía/cráter en cuanto llega la física
+                try { if (data.impact_effects && data.impact_effects.energy_megatons) document.getElementById('impact-energy').innerText = data.impact_effects.energy_megatons + ' MT'; } catch(e){}
+                try { if (data.impact_effects && data.impact_effects.crater_diameter_meters) document.getElementById('Resultado_Escala').innerText = Math.round(data.impact_effects.crater_diameter_meters) + ' m'; } catch(e){}
+
                 // Mostrar el texto devuelto por Gemini o texto crudo
-                if (geminiText) {
-                    if (data.gemini_analysis) {
-                        if (typeof data.gemini_analysis === 'string') {
-                            geminiText.innerText = data.gemini_analysis;
+                const mostrarAnalisis = (analysis) => {
+                    if (!geminiText) return;
+                    if (analysis) {
+                        if (typeof analysis === 'string') {
+                            geminiText.innerText = analysis;
+                        } else if (analysis.fallback && analysis.text) {
+                            // análisis local provisional mientras llega el de Gemini
+                            geminiText.innerText = analysis.text;
                         } else {
                             // pretty-print structured gemini_analysis
-                            try { geminiText.innerText = JSON.stringify(data.gemini_analysis, null, 2); } catch(e) { geminiText.innerText = String(data.gemini_analysis); }
+                            try { geminiText.innerText = JSON.stringify(analysis, null, 2); } catch(e) { geminiText.innerText = String(analysis); }
                         }
                     } else if (data.text) {
                         geminiText.innerText = data.text;
                     } else {
                         geminiText.innerText = 'Análisis recibido.';
                     }
+                };
+                mostrarAnalisis(data.gemini_analysis);
+
+                // Si Gemini no llegó a tiempo, el análisis sigue en segundo plano: sondear el trabajo (long-poll)
+                if (data.job_id) {
+                    const jobUrl = data.job_url || `/api/simulate/${data.job_id}`;
+                    for (let attempt = 0; attempt < 10; attempt++) {
+                        const jobRes = await fetch(`${jobUrl}?wait=20`);
+                        if (!jobRes.ok) throw new Error(`HTTP ${jobRes.status} al consultar el análisis`);
+                        const job = await jobRes.json();
+                        if (job.status === 'done') {
+                            // si Gemini falló se conserva el análisis local ya mostrado
+                            if (job.gemini_analysis && !job.gemini_analysis.error) mostrarAnalisis(job.gemini_analysis);
+                            break;
+                        }
+                        if (job.status === 'error') break;
+                    }
                 }
-                // actualizar panel de energía/cráter si vienen
-                try { if (data.impact_effects && data.impact_effects.energy_megatons) document.getElementById('impact-energy').innerText = data.impact_effects.energy_megatons + ' MT'; } catch(e){}
-                try { if (data.impact_effects && data.impact_effects.crater_diameter_meters) document.getElementById('Resultado_Escala').innerText = Math.round(data.impact_effects.crater_diameter_meters) + ' m'; } catch(e){}
 
             } catch (err) {
                 console.warn('Error llamando a /api/simulate:', err);
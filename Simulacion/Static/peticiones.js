@@ -14,6 +14,78 @@ async function nombre() {
     }
 }
 
+// Autocompletado: el servidor busca en su índice de nombres y devuelve solo
+// las mejores coincidencias, en lugar de descargar /lista entera
+async function buscarNeos(texto, limite = 10) {
+    try {
+        const response = await fetch(`/api/neos/search?q=${encodeURIComponent(texto)}&limit=${limite}`);
+        if (response.ok) {
+            const data = await response.json();
+            return data.results;
+        } else {
+            console.error("Retorno no exitoso en /api/neos/search, código:", response.status);
+        }
+    } catch (error) {
+        console.error("Error al hacer fetch:", error);
+    }
+    return [];
+}
+
+// Los resultados van a un <datalist> del buscador: el <select> conserva sus
+// opciones (las de la página y los meteoritos personalizados de map.js) y solo
+// se le añade el NEO que el usuario elige
+function activarAutocompletado(inputId, selectId, esperaMs = 150) {
+    const input = document.getElementById(inputId);
+    const select = document.getElementById(selectId);
+    if (!input || !select) return;
+    let lista = input.list;
+    if (!lista) {
+        lista = document.createElement("datalist");
+        lista.id = `${inputId}-resultados`;
+        input.after(lista);
+        input.setAttribute("list", lista.id);
+    }
+    let temporizador = null;
+    let ultimaConsulta = "";
+    input.addEventListener("input", () => {
+        clearTimeout(temporizador);
+        temporizador = setTimeout(async () => {
+            const texto = input.value.trim();
+            ultimaConsulta = texto;
+            if (!texto) {
+                lista.innerHTML = "";
+                return;
+            }
+            const resultados = await buscarNeos(texto);
+            // Descarta respuestas de consultas anteriores que lleguen tarde
+            if (texto !== ultimaConsulta) return;
+            lista.innerHTML = "";
+            for (const neo of resultados) {
+                const opcion = document.createElement("option");
+                opcion.value = neo.name;
+                if (neo.is_hazardous) opcion.label = `${neo.name} ⚠`;
+                lista.appendChild(opcion);
+            }
+        }, esperaMs);
+    });
+    // Al elegir una sugerencia se selecciona en el <select>, añadiéndola si no estaba
+    input.addEventListener("change", () => {
+        const nombre = input.value.trim();
+        const sugerida = Array.from(lista.options).some(opcion => opcion.value === nombre);
+        if (!sugerida) return;
+        if (!Array.from(select.options).some(opcion => opcion.value === nombre)) {
+            const opcion = document.createElement("option");
+            opcion.value = nombre;
+            opcion.textContent = nombre;
+            select.appendChild(opcion);
+        }
+        select.value = nombre;
+        select.dispatchEvent(new Event("change"));
+    });
+}
+
+document.addEventListener("DOMContentLoaded", () => activarAutocompletado("meteorite-search", "meteorite-select"));
+
 async function infoasteroide(nombre) {
     try {
         const response = await fetch(`/infoasteroide?name=${encodeURIComponent(nombre)}`);;
@@ -0,0 +1,199 @@
+# app/admission.py
+"""
+Control de admisión para los endpoints que dependen de Gemini.
+El trabajo caro entra por un carril acotado (ADMISSION_WORKERS menos
+ADMISSION_RESERVED huecos) con cola de prioridad y espera máxima; lo que no
+cabe se rechaza enseguida con 429 + Retry-After. Las rutas baratas (catálogo,
+física) usan su propio carril y nunca esperan detrás del trabajo de Gemini.
+"""
+import heapq
+import itertools
+import math
+import threading
+import time
+from collections import deque
+from functools import wraps
+
+from flask import current_app, jsonify, request
+
+from settings import get_setting
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class _Waiter:
+    def __init__(self):
+        self.event = threading.Event()
+        self.granted = False
+
+
+class AdmissionController:
+    def __init__(self, workers=16, reserved=4, max_queue=32, max_wait=5.0):
+        self.capacity = max(1, workers - reserved)
+        self.reserved = reserved
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self._lock = threading.Lock()
+        self._queue = []                 # heap de (prioridad, orden, _Waiter)
+        self._seq = itertools.count()
+        self._active = 0
+        self._active_cheap = 0
+        self._waits = deque(maxlen=500)
+        self._service_times = deque(maxlen=100)
+        self.counters = {'admitted': 0, 'rejected_full': 0, 'rejected_timeout': 0, 'cheap_requests': 0}
+
+    def _retry_after(self):
+        # Estimación: tiempo medio de servicio x (cola + 1) / huecos, al menos 1 s
+        avg = sum(self._service_times) / len(self._service_times) if self._service_times else self.max_wait
+        return max(1, math.ceil(avg * (len(self._queue) + 1) / self.capacity))
+
+    def acquire(self, priority=5):
+        """Reserva un hueco del carril caro (menor prioridad = antes). Lanza AdmissionRejected."""
+        started = time.monotonic()
+        with self._lock:
+            if self._active < self.capacity and not self._queue:
+                self._active += 1
+                self.counters['admitted'] += 1
+                self._waits.append(0.0)
+                return started
+            if len(self._queue) >= self.max_queue:
+                self.counters['rejected_full'] += 1
+                raise AdmissionRejected('Cola de análisis llena', self._retry_after())
+            waiter = _Waiter()
+            entry = (priority, next(self._seq), waiter)
+            heapq.heappush(self._queue, entry)
+
+        waiter.event.wait(self.max_wait)
+        with self._lock:
+            if not waiter.granted:
+                self._queue.remove(entry)
+                heapq.heapify(self._queue)
+                self.counters['rejected_timeout'] += 1
+                raise AdmissionRejected('Tiempo máximo de espera en cola agotado', self._retry_after())
+            self._waits.append(time.monotonic() - started)
+        return time.monotonic()
+
+    def release(self, admitted_at=None):
+        with self._lock:
+            if admitted_at is not None:
+                self._service_times.append(time.monotonic() - admitted_at)
+            if self._queue:
+                # El hueco pasa directamente al siguiente de la cola
+                _, _, waiter = heapq.heappop(self._queue)
+                waiter.granted = True
+                self.counters['admitted'] += 1
+                waiter.event.set()
+            else:
+                self._active -= 1
+
+    def releaser(self, admitted_at=None):
+        """
+        Función que libera el hueco una sola vez aunque se llame varias veces:
+        para huecos que se sueltan fuera de la vista (fin de un stream, trabajo
+        en segundo plano), donde hay más de un camino que puede liberarlo.
+        """
+        lock = threading.Lock()
+        released = []
+
+        def release(*_):
+            with lock:
+                if released:
+                    return
+                released.append(True)
+            self.release(admitted_at)
+        return release
+
+    def enter_cheap(self):
+        with self._lock:
+            self._active_cheap += 1
+            self.counters['cheap_requests'] += 1
+
+    def exit_cheap(self):
+        with self._lock:
+            self._active_cheap -= 1
+
+    def stats(self):
+        with self._lock:
+            waits = sorted(self._waits)
+            stats = dict(self.counters)
+            stats.update({
+                'capacity': self.capacity,
+                'reserved_cheap': self.reserved,
+                'active': self._active,
+                'active_cheap': self._active_cheap,
+                'queue_depth': len(self._queue),
+                'max_queue': self.max_queue,
+                'max_wait_seconds': self.max_wait,
+            })
+        if waits:
+            stats['wait_seconds'] = {
+                'p50': waits[len(waits) // 2],
+                'p95': waits[min(len(waits) - 1, int(len(waits) * 0.95))],
+                'max': waits[-1],
+            }
+        return stats
+
+
+_controller = None
+_controller_lock = threading.Lock()
+
+
+def get_controller(config=None):
+    """ADMISSION_WORKERS, ADMISSION_RESERVED, ADMISSION_MAX_QUEUE, ADMISSION_MAX_WAIT."""
+    global _controller
+    if _controller is None:
+        with _controller_lock:
+            if _controller is None:
+                _controller = AdmissionController(get_setting(config, 'ADMISSION_WORKERS', 16, int),
+                                                  get_setting(config, 'ADMISSION_RESERVED', 4, int),
+                                                  get_setting(config, 'ADMISSION_MAX_QUEUE', 32, int),
+                                                  get_setting(config, 'ADMISSION_MAX_WAIT', 5.0, float))
+    return _controller
+
+
+def request_priority():
+    """Prioridad de la petición (cabecera X-Priority, 0 = más urgente, 9 = menos)."""
+    try:
+        return min(max(int(request.headers.get('X-Priority', 5)), 0), 9)
+    except ValueError:
+        return 5
+
+
+def rejected_response(error):
+    response = jsonify({'error': str(error), 'retry_after': error.retry_after})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response
+
+
+def expensive_route(view):
+    """Decorador: la vista entera ocupa un hueco del carril caro."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        controller = get_controller(current_app.config)
+        try:
+            admitted_at = controller.acquire(request_priority())
+        except AdmissionRejected as e:
+            return rejected_response(e)
+        try:
+            return view(*args, **kwargs)
+        finally:
+            controller.release(admitted_at)
+    return wrapper
+
+
+def cheap_route(view):
+    """Decorador: la vista va por el carril reservado (solo se contabiliza, nunca espera)."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        controller = get_controller(current_app.config)
+        controller.enter_cheap()
+        try:
+            return view(*args, **kwargs)
+        finally:
+            controller.exit_cheap()
+    return wrapper
@@ -0,0 +1,100 @@
+# app/analysis_cache.py
+"""
+Caché de análisis de Gemini. La clave cuantiza diámetro, energía y cráter
+(3 cifras significativas), ajusta lat/lng a una rejilla configurable e incluye
+el modelo (y el backend, ver model_key), de modo que escenarios casi idénticos
+comparten respuesta.
+"""
+import json
+import os
+import threading
+
+from cache import LRUCache, SQLiteCache, TieredCache
+from settings import get_setting
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'gemini_cache.sqlite3')
+
+
+def _quantize(value, digits=3):
+    return float(f'{float(value):.{digits}g}')
+
+
+def _snap(value, grid):
+    if not grid:
+        return round(float(value), 4)
+    return round(round(float(value) / grid) * grid, 6)
+
+
+def model_key(config=None):
+    """
+    Modelo con el que se construyen las claves (GEMINI_MODEL). Con otro backend
+    que no sea el real (GEMINI_BACKEND=fake) se antepone su nombre, para que
+    las respuestas del stub nunca se sirvan como análisis de Gemini.
+    """
+    model_name = get_setting(config, 'GEMINI_MODEL', 'gemini-2.5-pro')
+    backend = get_setting(config, 'GEMINI_BACKEND', 'google')
+    return model_name if backend == 'google' else f'{backend}:{model_name}'
+
+
+def make_key(meteorite_data, location, model_name, grid_deg):
+    """Clave normalizada de un escenario (la misma para todos los workers)."""
+    return '|'.join([
+        str(model_name),
+        'd=%r' % _quantize(meteorite_data['diameter']),
+        'e=%r' % _quantize(meteorite_data['energy']),
+        'c=%r' % _quantize(meteorite_data['crater_diameter']),
+        'lat=%r' % _snap(location['lat'], grid_deg),
+        'lng=%r' % _snap(location['lng'], grid_deg),
+    ])
+
+
+class AnalysisCache:
+    """TieredCache de análisis serializados como JSON (se devuelve siempre una copia)."""
+
+    def __init__(self, tiers, grid_deg):
+        self.tiers = tiers
+        self.grid_deg = grid_deg
+
+    def key(self, meteorite_data, location, model_name):
+        return make_key(meteorite_data, location, model_name, self.grid_deg)
+
+    def get(self, key, count=True):
+        raw = self.tiers.get(key, count)
+        return json.loads(raw) if raw is not None else None
+
+    def set(self, key, analysis):
+        self.tiers.set(key, json.dumps(analysis, ensure_ascii=False))
+
+    def stats(self):
+        stats = self.tiers.stats()
+        stats['grid_deg'] = self.grid_deg
+        return stats
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache(config=None):
+    """
+    Caché del proceso. Parámetros (app.config o entorno):
+    GEMINI_CACHE_SIZE, GEMINI_CACHE_MEMORY_TTL, GEMINI_CACHE_PATH ('' desactiva
+    el disco), GEMINI_CACHE_TTL y GEMINI_CACHE_GRID_DEG.
+    """
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                memory = LRUCache(get_setting(config, 'GEMINI_CACHE_SIZE', 2048, int),
+                                  get_setting(config, 'GEMINI_CACHE_MEMORY_TTL', 3600, float))
+                path = get_setting(config, 'GEMINI_CACHE_PATH', DEFAULT_PATH)
+                disk = None
+                if path:
+                    try:
+                        disk = SQLiteCache(path, 'gemini_analysis',
+                                           get_setting(config, 'GEMINI_CACHE_TTL', 7 * 24 * 3600, float))
+                    except Exception as e:
+                        print(f"WARNING: caché en disco de Gemini desactivada ({path}): {e}")
+                _cache = AnalysisCache(TieredCache(memory, disk),
+                                       get_setting(config, 'GEMINI_CACHE_GRID_DEG', 0.5, float))
+    return _cache
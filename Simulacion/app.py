@@ -1,6 +1,7 @@
 from flask import Flask, jsonify, request, render_template
 import sys
 from Controllers import calculos
+from admission import cheap_route
 from flask_cors import CORS
 
 app = Flask(__name__, static_folder="static", template_folder="templates\HTML")
@@ -83,6 +84,7 @@ def fuerntes():
     
 
 @app.route("/lista", methods=["GET"])
+@cheap_route
 def lista_meteoros():
     names = calculos.Listameteoros()
     if names:
@@ -90,6 +92,7 @@ def lista_meteoros():
     return jsonify({"error": "No encontrado"})
 
 @app.route("/infoasteroide", methods=["GET"])
+@cheap_route
 def info_asteroide():#no pasar parametro ya esta en si en la peticion
     name = request.args.get("name")
     info = calculos.infoasteroide(name)
@@ -98,6 +101,7 @@ def info_asteroide():#no pasar parametro ya esta en si en la peticion
     return jsonify({"error": "No encontrado"}), 404
 
 @app.route("/velocidad", methods=["GET"])
+@cheap_route
 def velocidad():
     name = request.args.get("velocidad")
     info = calculos.velocidad(name)
@@ -106,6 +110,7 @@ def velocidad():
     return jsonify({"error": "No encontrado"}), 404
 
 @app.route("/todos", methods=["GET"])
+@cheap_route
 def todos():
     name = request.args.get("name")
     if not name:
@@ -127,9 +132,20 @@ def todos():
 
 
 @app.route("/lista_mayor_impacto", methods=["GET"])
+@cheap_route
 def lista_mayor_impacto():
-    top5 = calculos.top_impacto(5)
-    return jsonify(top5)
+    # ?n=5&key=energy|diameter|hazard|orbit|<ruta.punteada>&order=desc|asc
+    try:
+        n = int(request.args.get("n", 5))
+    except ValueError:
+        return jsonify({"error": "El parámetro 'n' debe ser un entero"}), 400
+    key = request.args.get("key", "energy")
+    order = request.args.get("order", "desc")
+    try:
+        top = calculos.top_impacto(min(max(n, 0), 1000), key, order)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(top)
 
 if __name__ == "__main__":
     app.run(debug=True)
@@ -0,0 +1,160 @@
+# app/cache.py
+"""
+Cachés reutilizables: LRU en memoria con TTL y almacén SQLite persistente.
+TieredCache combina ambos (memoria primero, disco después) y lleva contadores.
+"""
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache:
+    """LRU acotado por número de entradas, con caducidad opcional (ttl en segundos)."""
+
+    def __init__(self, maxsize=1024, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            value, expires = item
+            if expires is not None and expires < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        expires = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SQLiteCache:
+    """
+    Tabla clave -> valor (texto o bytes) en SQLite. Sobrevive a reinicios y la
+    comparten todos los workers que apunten al mismo archivo (modo WAL).
+    Con ttl, las filas caducadas se borran al abrir y cada purge_every escrituras.
+    """
+
+    def __init__(self, path, table='cache', ttl=None, purge_every=500):
+        self.path = path
+        self.table = table
+        self.ttl = ttl
+        self.purge_every = purge_every
+        self._local = threading.local()
+        self._sets = 0
+        self._sets_lock = threading.Lock()
+        conn = self._conn()
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute(f'CREATE TABLE IF NOT EXISTS {table} '
+                     '(key TEXT PRIMARY KEY, value BLOB NOT NULL, created REAL NOT NULL)')
+        conn.commit()
+        self.purge_expired()
+
+    def _conn(self):
+        # Una conexión por hilo: sqlite3 no comparte conexiones entre hilos
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            self._local.conn = conn
+        return conn
+
+    def get(self, key, default=None):
+        row = self._conn().execute(
+            f'SELECT value, created FROM {self.table} WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return default
+        value, created = row
+        if self.ttl and created + self.ttl < time.time():
+            return default
+        return value
+
+    def set(self, key, value):
+        conn = self._conn()
+        conn.execute(f'INSERT OR REPLACE INTO {self.table} (key, value, created) VALUES (?, ?, ?)',
+                     (key, value, time.time()))
+        conn.commit()
+        with self._sets_lock:
+            self._sets += 1
+            purge = self.purge_every and self._sets % self.purge_every == 0
+        if purge:
+            self.purge_expired()
+
+    def purge_expired(self):
+        if not self.ttl:
+            return 0
+        conn = self._conn()
+        cur = conn.execute(f'DELETE FROM {self.table} WHERE created < ?', (time.time() - self.ttl,))
+        conn.commit()
+        return cur.rowcount
+
+
+class TieredCache:
+    """Memoria (LRUCache) delante de disco (SQLiteCache opcional) con estadísticas."""
+
+    def __init__(self, memory, disk=None):
+        self.memory = memory
+        self.disk = disk
+        self._lock = threading.Lock()
+        self.counters = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'stores': 0, 'disk_errors': 0}
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def get(self, key, count=True):
+        """count=False para relecturas que no deben contar otra vez (p. ej. singleflight)."""
+        value = self.memory.get(key)
+        if value is not None:
+            if count:
+                self._count('memory_hits')
+            return value
+        if self.disk is not None:
+            try:
+                value = self.disk.get(key)
+            except sqlite3.Error:
+                self._count('disk_errors')
+                value = None
+            if value is not None:
+                if count:
+                    self._count('disk_hits')
+                self.memory.set(key, value)
+                return value
+        if count:
+            self._count('misses')
+        return None
+
+    def set(self, key, value):
+        self.memory.set(key, value)
+        if self.disk is not None:
+            try:
+                self.disk.set(key, value)
+            except sqlite3.Error:
+                self._count('disk_errors')
+        self._count('stores')
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+        lookups = stats['memory_hits'] + stats['disk_hits'] + stats['misses']
+        stats['hit_ratio'] = (stats['memory_hits'] + stats['disk_hits']) / lookups if lookups else 0.0
+        stats['memory_entries'] = len(self.memory)
+        stats['disk_enabled'] = self.disk is not None
+        return stats
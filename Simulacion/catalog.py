@@ -0,0 +1,248 @@
+# app/catalog.py
+"""Catálogo de NEOs en memoria con índices hash para búsquedas O(1)."""
+import heapq
+import json
+import os
+import re
+import threading
+import time
+
+_NON_ALNUM = re.compile(r'[^0-9a-z]+')
+
+# Ruta absoluta del catálogo junto a este archivo (no depende del CWD)
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'meteorites_data.json')
+
+# Índices ordenados que se construyen al cargar: alias -> ruta del campo
+RANKED_KEYS = {
+    'energy': 'impact_stats.energy_megatons',
+    'diameter': 'diameter_meters',
+    'hazard': 'is_hazardous',
+    'orbit': 'orbit_radius_au',
+}
+
+
+def normalize_name(name):
+    """
+    Clave de búsqueda insensible a mayúsculas y puntuación.
+    '433 Eros (A898 PA)' y '433 eros a898-pa' producen la misma clave.
+    """
+    if name is None:
+        return ''
+    return ' '.join(_NON_ALNUM.split(str(name).casefold())).strip()
+
+
+def field_value(neo, path):
+    """Lee un campo con ruta punteada ('impact_stats.energy_megatons'); None si falta."""
+    value = neo
+    for part in path.split('.'):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    # bool es subclase de int: se ordena como 0/1 (peligroso primero en 'desc')
+    if isinstance(value, (int, float)):
+        return value
+    return None
+
+
+class NeoCatalog:
+    """
+    Vista indexada de un documento meteorites_data.json.
+    Se construye una sola vez al cargar los datos; las consultas no recorren la lista.
+    """
+
+    def __init__(self, data, version=None):
+        self.data = data
+        self.version = version
+        self.metadata = data.get('metadata', {})
+        self.neos = data.get('neos', [])
+
+        self.by_name = {}
+        self.by_id = {}
+        self.by_key = {}
+        for neo in self.neos:
+            name = neo.get('name')
+            # Ante nombres repetidos se conserva el primero, igual que el recorrido lineal original
+            self.by_name.setdefault(name, neo)
+            self.by_key.setdefault(normalize_name(name), neo)
+            if neo.get('id') is not None:
+                self.by_id.setdefault(str(neo['id']), neo)
+
+        self.names = [neo.get('name') for neo in self.neos]
+
+        # Listas ordenadas de mayor a menor; el desempate es la energía de impacto
+        self.ranked = {}
+        energy_path = RANKED_KEYS['energy']
+        for alias, path in RANKED_KEYS.items():
+            scored = []
+            for neo in self.neos:
+                value = field_value(neo, path)
+                if value is not None:
+                    tie = field_value(neo, energy_path)
+                    scored.append((value, tie if tie is not None else float('-inf'), neo))
+            scored.sort(key=lambda item: (item[0], item[1]), reverse=True)
+            self.ranked[alias] = [item[2] for item in scored]
+
+        # Derivados perezosos (p. ej. respuestas serializadas) ligados a esta versión
+        self._derived = {}
+        self._derived_lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.neos)
+
+    def find(self, name):
+        """Busca un NEO por nombre exacto, por id o por nombre normalizado."""
+        if name is None:
+            return None
+        neo = self.by_name.get(name)
+        if neo is None:
+            neo = self.by_id.get(str(name))
+        if neo is None:
+            neo = self.by_key.get(normalize_name(name))
+        return neo
+
+    def get_by_id(self, neo_id):
+        return self.by_id.get(str(neo_id))
+
+    def top_k(self, n=5, key='energy', order='desc'):
+        """
+        Los n NEOs con mayor ('desc') o menor ('asc') valor de key.
+        key puede ser un alias de RANKED_KEYS (coste O(k) sobre el índice) o
+        cualquier ruta punteada numérica, resuelta con un heap en O(n log k).
+        """
+        if order not in ('asc', 'desc'):
+            raise ValueError("order debe ser 'asc' o 'desc'")
+        if n <= 0:
+            return []
+
+        ranked = self.ranked.get(key)
+        if ranked is not None:
+            if order == 'desc':
+                return ranked[:n]
+            return ranked[:-n - 1:-1] if n < len(ranked) else ranked[::-1]
+
+        path = RANKED_KEYS.get(key, key)
+        candidates = [neo for neo in self.neos if field_value(neo, path) is not None]
+        select = heapq.nlargest if order == 'desc' else heapq.nsmallest
+        return select(n, candidates, key=lambda neo: field_value(neo, path))
+
+    def cached(self, key, factory):
+        """
+        Memoriza factory() para esta instantánea. Al recargarse el archivo se crea
+        un NeoCatalog nuevo, así que la caché se invalida sola por versión.
+        """
+        value = self._derived.get(key)
+        if value is None:
+            with self._derived_lock:
+                value = self._derived.get(key)
+                if value is None:
+                    value = factory()
+                    self._derived[key] = value
+        return value
+
+
+class CatalogProvider:
+    """
+    Fuente única del catálogo compartida por routes.py y calculos.py.
+    Parsea el archivo una vez y vigila su mtime/tamaño en un hilo de fondo;
+    cuando fetch_meteorites.py lo reescribe, construye el nuevo NeoCatalog y
+    lo intercambia de forma atómica. Quien ya tenga una instantánea la conserva.
+    """
+
+    def __init__(self, path=DEFAULT_PATH, poll_interval=2.0):
+        self.path = path
+        self.poll_interval = poll_interval
+        self._catalog = None
+        self._stamp = None
+        self._lock = threading.Lock()
+        self._watcher = None
+
+    def _stat(self):
+        st = os.stat(self.path)
+        return (st.st_mtime_ns, st.st_size)
+
+    def _load(self):
+        stamp = self._stat()
+        with open(self.path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        # Si el archivo cambió mientras lo leíamos, el siguiente sondeo lo recargará
+        self._catalog = NeoCatalog(data, version='%x-%x' % stamp)
+        self._stamp = stamp
+
+    def get(self):
+        """
+        Devuelve la instantánea vigente. Puede lanzar FileNotFoundError o
+        json.JSONDecodeError si todavía no se ha podido cargar nunca.
+        """
+        catalog = self._catalog
+        if catalog is None:
+            with self._lock:
+                if self._catalog is None:
+                    self._load()
+                catalog = self._catalog
+            self._start_watcher()
+        return catalog
+
+    def refresh(self):
+        """Recarga si el archivo cambió. Devuelve True si hubo intercambio."""
+        try:
+            stamp = self._stat()
+        except OSError:
+            return False
+        if stamp == self._stamp:
+            return False
+        with self._lock:
+            if stamp == self._stamp:
+                return False
+            try:
+                self._load()
+            except (OSError, ValueError) as e:
+                # Archivo a medio escribir o inválido: se mantiene la versión anterior
+                print(f"WARNING: no se pudo recargar {self.path}: {e}")
+                return False
+        return True
+
+    def _start_watcher(self):
+        if self._watcher is not None or self.poll_interval <= 0:
+            return
+        with self._lock:
+            if self._watcher is not None:
+                return
+            self._watcher = threading.Thread(target=self._watch, name='catalog-watcher', daemon=True)
+            self._watcher.start()
+
+    def _watch(self):
+        while True:
+            time.sleep(self.poll_interval)
+            self.refresh()
+
+
+_provider = None
+_provider_lock = threading.Lock()
+
+
+def get_provider():
+    """Proveedor del proceso; METEORITES_DATA_PATH y CATALOG_POLL_SECONDS lo configuran."""
+    global _provider
+    if _provider is None:
+        with _provider_lock:
+            if _provider is None:
+                _provider = CatalogProvider(
+                    os.getenv('METEORITES_DATA_PATH', DEFAULT_PATH),
+                    float(os.getenv('CATALOG_POLL_SECONDS', '2')),
+                )
+    return _provider
+
+
+def install_provider(provider):
+    """
+    Sustituye el proveedor del proceso (p. ej. por shared_catalog.SharedCatalogProvider
+    en los workers de serve.py). Debe llamarse antes de atender peticiones.
+    """
+    global _provider
+    with _provider_lock:
+        _provider = provider
+
+
+def get_catalog():
+    """Atajo para obtener la instantánea vigente del catálogo."""
+    return get_provider().get()
@@ -0,0 +1,277 @@
+# app/catalog_store.py
+"""
+Consultas de /api/neos sobre el catálogo SQLite que genera fetch_meteorites
+(write_catalog_db): filtros de igualdad y de rango, orden, paginación por
+cursor y proyección de campos, resueltos con los índices de cada columna.
+
+La base vive junto a meteorites_data.json (meteorites_data.sqlite, o
+CATALOG_DB_PATH). Si falta o es más antigua que el JSON, se reconstruye a
+partir de la instantánea vigente del catálogo.
+"""
+import base64
+import json
+import os
+import sqlite3
+import threading
+
+import catalog
+import ingestion
+from settings import get_setting
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+# Parámetros de /api/neos que no son filtros
+RESERVED_PARAMS = {'sort', 'order', 'limit', 'cursor', 'fields', 'trajectories'}
+# Nombres cortos aceptados en filtros y en sort (los mismos que catalog.RANKED_KEYS)
+ALIASES = {
+    'energy': 'energy_megatons',
+    'diameter': 'diameter_meters',
+    'orbit': 'orbit_radius_au',
+    'hazard': 'is_hazardous',
+    'hazardous': 'is_hazardous',
+}
+
+
+def _columns(config=None):
+    """columna -> tipo SQLite, según el esquema de fetch_meteorites (FETCH_METEORITES_PATH de config)."""
+    return {name: kind for name, kind, _ in ingestion.get_fetch_module(config).CATALOG_DB_COLUMNS}
+
+
+def _column(name, columns):
+    column = ALIASES.get(name, name)
+    if column not in columns:
+        raise ValueError(f'Campo no filtrable: {name}')
+    return column
+
+
+def _filter(name, columns):
+    """
+    (columna, operador) del parámetro name, o None si no es un filtro conocido:
+    los parámetros desconocidos (p. ej. ?_=123 para saltarse cachés) se ignoran.
+    """
+    for suffix, operator in (('_min', '>='), ('_max', '<=')):
+        if name.endswith(suffix) and ALIASES.get(name[:-len(suffix)], name[:-len(suffix)]) in columns:
+            return ALIASES.get(name[:-len(suffix)], name[:-len(suffix)]), operator
+    column = ALIASES.get(name, name)
+    return (column, 'IN') if column in columns else None
+
+
+def is_query(args, config=None):
+    """True si la query string pide filtrar, ordenar o paginar (algo que resuelve SQLite)."""
+    columns = _columns(config)
+    return any(name in RESERVED_PARAMS - {'trajectories'} or _filter(name, columns) is not None
+               for name in args)
+
+
+def _convert(value, kind):
+    if kind == 'INTEGER':
+        lowered = value.lower()
+        if lowered in ('1', 'true', 'yes'):
+            return 1
+        if lowered in ('0', 'false', 'no'):
+            return 0
+        raise ValueError(f'Valor booleano inválido: {value}')
+    if kind == 'REAL':
+        return float(value)
+    return value
+
+
+def _encode_cursor(sort, order, value, rowid):
+    raw = json.dumps([sort, order, value, rowid], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def _decode_cursor(cursor, sort, order):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        cursor_sort, cursor_order, value, rowid = json.loads(raw)
+        # Lo que llega a SQLite: rowid entero y un valor escalar (o NULL)
+        if type(rowid) is not int:
+            raise TypeError(rowid)
+        if value is not None and type(value) not in (int, float, str):
+            raise TypeError(value)
+    except (ValueError, TypeError):
+        raise ValueError('Cursor inválido')
+    if (cursor_sort, cursor_order) != (sort, order):
+        raise ValueError('El cursor pertenece a otra ordenación')
+    return value, rowid
+
+
+def parse_query(args, config=None):
+    """
+    Traduce la query string a un dict con where/params (sin el cursor), sort,
+    order, limit, cursor y fields. Lanza ValueError ante parámetros inválidos;
+    los que no son filtros conocidos se ignoran.
+
+        ?is_hazardous=true&energy_min=10&sort=energy&order=desc&limit=50&fields=id,name
+    """
+    columns = _columns(config)
+    clauses, params = [], []
+    for name in args:
+        found = None if name in RESERVED_PARAMS else _filter(name, columns)
+        if found is None:
+            continue
+        column, operator = found
+        values = args.getlist(name) if hasattr(args, 'getlist') else [args[name]]
+        if operator != 'IN':
+            if columns[column] != 'REAL':
+                raise ValueError(f'{name}: los rangos solo se aplican a campos numéricos')
+            for value in values:
+                clauses.append(f'{column} {operator} ?')
+                params.append(float(value))
+        else:
+            # Valores repetidos o separados por comas: cualquiera de ellos (IN)
+            options = [_convert(v.strip(), columns[column]) for value in values for v in value.split(',')]
+            clauses.append(f"{column} IN ({', '.join('?' * len(options))})")
+            params.extend(options)
+
+    sort = args.get('sort')
+    sort = _column(sort, columns) if sort else 'rowid'
+    order = args.get('order', 'asc' if sort == 'rowid' else 'desc')
+    if order not in ('asc', 'desc'):
+        raise ValueError("order debe ser 'asc' o 'desc'")
+    limit = int(args.get('limit', DEFAULT_LIMIT))
+    if not 1 <= limit <= MAX_LIMIT:
+        raise ValueError(f'limit debe estar entre 1 y {MAX_LIMIT}')
+    fields = [f.strip() for f in args.get('fields', '').split(',') if f.strip()] or None
+    cursor = args.get('cursor')
+    return {
+        'where': ' AND '.join(clauses) or '1',
+        'params': params,
+        'sort': sort,
+        'order': order,
+        'limit': limit,
+        'cursor': _decode_cursor(cursor, sort, order) if cursor else None,
+        'fields': fields,
+    }
+
+
+def _after_cursor(sort, order, value, rowid):
+    """
+    Condición "después de (value, rowid)" para ORDER BY sort, rowid. SQLite
+    coloca los NULL primero en ASC y al final en DESC; se tratan aparte porque
+    cualquier comparación con NULL es NULL.
+    """
+    if sort == 'rowid':
+        return ('rowid > ?', [rowid]) if order == 'asc' else ('rowid < ?', [rowid])
+    if order == 'asc':
+        if value is None:
+            return f'(({sort} IS NULL AND rowid > ?) OR {sort} IS NOT NULL)', [rowid]
+        return f'({sort} > ? OR ({sort} = ? AND rowid > ?))', [value, value, rowid]
+    if value is None:
+        return f'({sort} IS NULL AND rowid < ?)', [rowid]
+    return f'({sort} < ? OR ({sort} = ? AND rowid < ?) OR {sort} IS NULL)', [value, value, rowid]
+
+
+_MISSING = object()
+
+
+def _project(record, fields):
+    """Solo los campos pedidos; acepta rutas punteadas ('impact_stats.energy_megatons')."""
+    if fields is None:
+        return record
+    projected = {}
+    for field in fields:
+        value = record
+        for part in field.split('.'):
+            value = value.get(part, _MISSING) if isinstance(value, dict) else _MISSING
+        if value is not _MISSING:
+            projected[field] = value
+    return projected
+
+
+class CatalogStore:
+    """Conexiones de solo lectura (una por hilo) al catálogo SQLite."""
+
+    def __init__(self, path, source_path, config=None):
+        self.path = path
+        self.source_path = source_path
+        self.config = config
+        self._version = None
+        self._identity = None
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.counters = {'queries': 0, 'rebuilds': 0}
+
+    def _fresh(self):
+        try:
+            return os.stat(self.path).st_mtime_ns >= os.stat(self.source_path).st_mtime_ns
+        except OSError:
+            return False
+
+    def ensure(self, snapshot):
+        """Reconstruye la base si es más antigua que el JSON de esta instantánea."""
+        if self._version == snapshot.version:
+            return
+        with self._lock:
+            if self._version == snapshot.version:
+                return
+            if not self._fresh():
+                ingestion.get_fetch_module(self.config).write_catalog_db(self.path, snapshot.data)
+                self.counters['rebuilds'] += 1
+            st = os.stat(self.path)
+            self._identity = (st.st_ino, st.st_mtime_ns)
+            self._version = snapshot.version
+
+    def _conn(self):
+        # La base se reemplaza con os.replace: al cambiar de archivo se reabre
+        cached = getattr(self._local, 'conn', None)
+        if cached is not None and cached[0] == self._identity:
+            return cached[1]
+        if cached is not None:
+            cached[1].close()
+        conn = sqlite3.connect(f'file:{self.path}?mode=ro', uri=True)
+        self._local.conn = (self._identity, conn)
+        return conn
+
+    def query(self, snapshot, query):
+        self.ensure(snapshot)
+        conn = self._conn()
+        sort, order = query['sort'], query['order']
+        where, params = query['where'], list(query['params'])
+        total = conn.execute(f'SELECT COUNT(*) FROM neos WHERE {where}', params).fetchone()[0]
+        if query['cursor'] is not None:
+            condition, extra = _after_cursor(sort, order, *query['cursor'])
+            where = f'({where}) AND {condition}'
+            params += extra
+        rows = conn.execute(
+            f'SELECT rowid, {sort}, record FROM neos WHERE {where} '
+            f'ORDER BY {sort} {order.upper()}, rowid {order.upper()} LIMIT ?',
+            params + [query['limit'] + 1]).fetchall()
+        with self._lock:
+            self.counters['queries'] += 1
+
+        page = rows[:query['limit']]
+        next_cursor = None
+        if len(rows) > query['limit']:
+            rowid, value, _ = page[-1]
+            next_cursor = _encode_cursor(sort, order, value, rowid)
+        return {
+            'metadata': snapshot.metadata,
+            'total': total,
+            'count': len(page),
+            'neos': [_project(json.loads(record), query['fields']) for _, _, record in page],
+            'next_cursor': next_cursor,
+        }
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+        stats['path'] = self.path
+        return stats
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store(config=None):
+    """Almacén del proceso; CATALOG_DB_PATH cambia la ruta de la base."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                source = catalog.get_provider().path
+                default = ingestion.get_fetch_module(config).catalog_db_path(source)
+                _store = CatalogStore(get_setting(config, 'CATALOG_DB_PATH', default), source, config)
+    return _store
@@ -0,0 +1,318 @@
+# app/gemini_client.py
+"""
+Cliente de Gemini compartido por todo el proceso.
+Se configura una sola vez y añade: límite de llamadas simultáneas, plazo por
+llamada, reintentos con backoff aleatorio y un circuit breaker que, ante muchos
+errores o latencias altas, falla rápido en vez de ocupar workers.
+Con GEMINI_BACKEND=fake se usa FakeGeminiModel (stub local, sin red).
+"""
+import json
+import random
+import threading
+import time
+from collections import deque
+
+from settings import get_setting
+
+try:
+    from google.api_core import exceptions as google_exceptions
+    _RETRYABLE = (TimeoutError, ConnectionError,
+                  google_exceptions.DeadlineExceeded, google_exceptions.ResourceExhausted,
+                  google_exceptions.ServiceUnavailable, google_exceptions.InternalServerError)
+except ImportError:
+    _RETRYABLE = (TimeoutError, ConnectionError)
+
+# Línea que precede al arreglo JSON de escenarios en los prompts por lotes
+BATCH_MARKER = 'ESCENARIOS_JSON:'
+
+
+class GeminiUnavailable(Exception):
+    """La llamada no se hizo (circuito abierto o sin hueco a tiempo)."""
+
+
+class GeminiTimeout(Exception):
+    """Se agotó el plazo total de la llamada, reintentos incluidos."""
+
+
+class CircuitBreaker:
+    """
+    Ventana de los últimos `window` resultados. Se abre si la tasa de error
+    (las llamadas más lentas que slow_call_seconds cuentan como error) supera
+    error_threshold con al menos min_calls muestras. Tras open_seconds deja
+    pasar una llamada de prueba (half_open) y se cierra si sale bien.
+    """
+
+    def __init__(self, window=20, min_calls=5, error_threshold=0.5, slow_call_seconds=20.0, open_seconds=30.0):
+        self.window = deque(maxlen=window)
+        self.min_calls = min_calls
+        self.error_threshold = error_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.open_seconds = open_seconds
+        self.state = 'closed'
+        self.opened_at = None
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == 'closed':
+                return True
+            if self.state == 'open' and time.monotonic() - self.opened_at >= self.open_seconds:
+                self.state = 'half_open'
+            if self.state == 'half_open' and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def record(self, ok, latency):
+        failed = (not ok) or latency > self.slow_call_seconds
+        with self._lock:
+            if self.state == 'half_open':
+                self._probe_in_flight = False
+                if failed:
+                    self._open()
+                else:
+                    self.state = 'closed'
+                    self.window.clear()
+                return
+            self.window.append(failed)
+            if len(self.window) >= self.min_calls and sum(self.window) / len(self.window) >= self.error_threshold:
+                self._open()
+
+    def cancel(self):
+        """La llamada autorizada no llegó a hacerse: libera la prueba de half_open."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def _open(self):
+        self.state = 'open'
+        self.opened_at = time.monotonic()
+        self.window.clear()
+
+    def snapshot(self):
+        with self._lock:
+            recent = list(self.window)
+            return {'state': self.state,
+                    'recent_calls': len(recent),
+                    'recent_error_rate': sum(recent) / len(recent) if recent else 0.0}
+
+
+class FakeGeminiModel:
+    """
+    Stub local con la misma interfaz que genai.GenerativeModel.generate_content.
+    latency (s) y failure_rate permiten reproducir un upstream lento o inestable;
+    max_output_chars corta la respuesta como haría el límite de tokens de salida.
+    """
+
+    def __init__(self, model_name='fake', latency=0.0, failure_rate=0.0, text=None, max_output_chars=0):
+        self.model_name = model_name
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.text = text
+        self.max_output_chars = max_output_chars
+        self.calls = 0
+
+    def _reply(self, prompt):
+        if self.text is not None:
+            return self.text
+        if BATCH_MARKER in prompt:
+            # Prompt por lotes: un objeto {"id", "text"} por escenario
+            scenarios = json.loads(prompt.split(BATCH_MARKER, 1)[1].strip().splitlines()[0])
+            return json.dumps([{'id': s['id'],
+                                'text': 'La zona corresponde al punto indicado en los datos del impacto. '
+                                        'Análisis generado por el stub local de Gemini a partir de: '
+                                        + ', '.join(f'{k}={v}' for k, v in s.items() if k != 'id')}
+                               for s in scenarios], ensure_ascii=False)
+        return ('La zona corresponde al punto indicado en los datos del impacto. '
+                'Análisis generado por el stub local de Gemini a partir de: '
+                + ' '.join(line.strip() for line in prompt.splitlines() if line.strip().startswith('-')))
+
+    def generate_content(self, prompt, stream=False, request_options=None):
+        self.calls += 1
+        timeout = (request_options or {}).get('timeout')
+        if timeout is not None and self.latency > timeout:
+            time.sleep(timeout)
+            raise TimeoutError('FakeGeminiModel: plazo agotado')
+        time.sleep(self.latency)
+        if self.failure_rate and random.random() < self.failure_rate:
+            raise ConnectionError('FakeGeminiModel: fallo simulado')
+        text = self._reply(prompt)
+        if self.max_output_chars:
+            text = text[:self.max_output_chars]
+        if stream:
+            words = text.split(' ')
+            return iter([_FakeResponse(w + (' ' if i < len(words) - 1 else '')) for i, w in enumerate(words)])
+        return _FakeResponse(text)
+
+
+class _FakeResponse:
+    def __init__(self, text):
+        self.text = text
+        self.candidates = []
+
+
+class GeminiClient:
+    """Envoltorio del modelo con semáforo, plazos, reintentos y circuit breaker."""
+
+    def __init__(self, model, model_name, max_concurrency=4, timeout=30.0, retries=2,
+                 backoff=0.5, breaker=None):
+        self.model = model
+        self.model_name = model_name
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.breaker = breaker or CircuitBreaker()
+        self.max_concurrency = max_concurrency
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._latencies = deque(maxlen=200)
+        self.counters = {'calls': 0, 'successes': 0, 'failures': 0, 'retries': 0,
+                         'timeouts': 0, 'rejected_open': 0, 'rejected_busy': 0}
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self.counters[name] += amount
+
+    def _acquire(self, deadline):
+        if not self.breaker.allow():
+            self._count('rejected_open')
+            raise GeminiUnavailable('Circuito abierto: Gemini está fallando o respondiendo lento')
+        if not self._slots.acquire(timeout=max(0.0, deadline - time.monotonic())):
+            self.breaker.cancel()
+            self._count('rejected_busy')
+            raise GeminiUnavailable('Demasiadas llamadas a Gemini en curso')
+        with self._lock:
+            self._in_flight += 1
+
+    def _release(self):
+        with self._lock:
+            self._in_flight -= 1
+        self._slots.release()
+
+    def _finish(self, ok, started):
+        latency = time.monotonic() - started
+        self.breaker.record(ok, latency)
+        with self._lock:
+            self._latencies.append(latency)
+            self.counters['successes' if ok else 'failures'] += 1
+
+    def generate(self, prompt, timeout=None):
+        """Devuelve la respuesta de generate_content. Lanza GeminiUnavailable/GeminiTimeout o el error final."""
+        deadline = time.monotonic() + (timeout or self.timeout)
+        self._acquire(deadline)
+        self._count('calls')
+        started = time.monotonic()
+        try:
+            attempt = 0
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._count('timeouts')
+                    raise GeminiTimeout(f'Gemini no respondió en {timeout or self.timeout:.1f} s')
+                try:
+                    response = self.model.generate_content(prompt, request_options={'timeout': remaining})
+                    self._finish(True, started)
+                    return response
+                except _RETRYABLE as e:
+                    attempt += 1
+                    if attempt > self.retries:
+                        raise
+                    self._count('retries')
+                    # Backoff exponencial con jitter completo, sin pasarse del plazo
+                    delay = random.uniform(0, self.backoff * (2 ** (attempt - 1)))
+                    time.sleep(min(delay, max(0.0, deadline - time.monotonic())))
+        except BaseException:
+            self._finish(False, started)
+            raise
+        finally:
+            self._release()
+
+    def stream(self, prompt, timeout=None):
+        """
+        Generador de fragmentos (stream=True). El hueco del semáforo se mantiene
+        mientras dura el stream; no se reintenta una vez empezado.
+        """
+        deadline = time.monotonic() + (timeout or self.timeout)
+        self._acquire(deadline)
+        self._count('calls')
+        started = time.monotonic()
+        ok = False
+        try:
+            for chunk in self.model.generate_content(prompt, stream=True,
+                                                     request_options={'timeout': deadline - time.monotonic()}):
+                yield chunk
+            ok = True
+        finally:
+            self._finish(ok, started)
+            self._release()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+            latencies = sorted(self._latencies)
+            stats['in_flight'] = self._in_flight
+        stats['max_concurrency'] = self.max_concurrency
+        stats['model'] = self.model_name
+        stats['breaker'] = self.breaker.snapshot()
+        if latencies:
+            stats['latency_seconds'] = {
+                'p50': latencies[len(latencies) // 2],
+                'p95': latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+                'max': latencies[-1],
+                'samples': len(latencies),
+            }
+        return stats
+
+
+_client = None
+_client_key = None
+_client_lock = threading.Lock()
+
+
+def _build_model(config, model_name):
+    backend = get_setting(config, 'GEMINI_BACKEND', 'google')
+    if backend == 'fake':
+        return FakeGeminiModel(model_name,
+                               get_setting(config, 'GEMINI_FAKE_LATENCY', 0.0, float),
+                               get_setting(config, 'GEMINI_FAKE_FAILURE_RATE', 0.0, float),
+                               max_output_chars=get_setting(config, 'GEMINI_FAKE_MAX_OUTPUT_CHARS', 0, int))
+    import google.generativeai as genai
+    options = {}
+    endpoint = get_setting(config, 'GEMINI_API_ENDPOINT')
+    if endpoint:
+        # Permite apuntar el SDK a un servidor local que imite la API REST
+        options = {'transport': 'rest', 'client_options': {'api_endpoint': endpoint}}
+    genai.configure(api_key=get_setting(config, 'GEMINI_API_KEY'), **options)
+    return genai.GenerativeModel(model_name)
+
+
+def get_client(config=None):
+    """
+    Cliente del proceso; se reconstruye solo si cambia la clave, el modelo o el
+    backend. Parámetros: GEMINI_MAX_CONCURRENCY, GEMINI_TIMEOUT, GEMINI_RETRIES,
+    GEMINI_BACKOFF, GEMINI_BREAKER_ERROR_RATE, GEMINI_BREAKER_SLOW_SECONDS,
+    GEMINI_BREAKER_OPEN_SECONDS. Devuelve None si no hay clave ni backend fake.
+    """
+    global _client, _client_key
+    model_name = get_setting(config, 'GEMINI_MODEL', 'gemini-2.5-pro')
+    backend = get_setting(config, 'GEMINI_BACKEND', 'google')
+    api_key = get_setting(config, 'GEMINI_API_KEY')
+    if backend != 'fake' and not api_key:
+        return None
+    key = (backend, api_key, model_name, get_setting(config, 'GEMINI_API_ENDPOINT'))
+    if _client is None or _client_key != key:
+        with _client_lock:
+            if _client is None or _client_key != key:
+                breaker = CircuitBreaker(
+                    error_threshold=get_setting(config, 'GEMINI_BREAKER_ERROR_RATE', 0.5, float),
+                    slow_call_seconds=get_setting(config, 'GEMINI_BREAKER_SLOW_SECONDS', 20.0, float),
+                    open_seconds=get_setting(config, 'GEMINI_BREAKER_OPEN_SECONDS', 30.0, float))
+                _client = GeminiClient(_build_model(config, model_name), model_name,
+                                       max_concurrency=get_setting(config, 'GEMINI_MAX_CONCURRENCY', 4, int),
+                                       timeout=get_setting(config, 'GEMINI_TIMEOUT', 30.0, float),
+                                       retries=get_setting(config, 'GEMINI_RETRIES', 2, int),
+                                       backoff=get_setting(config, 'GEMINI_BACKOFF', 0.5, float),
+                                       breaker=breaker)
+                _client_key = key
+    return _client
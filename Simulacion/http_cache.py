@@ -0,0 +1,108 @@
+# app/http_cache.py
+"""
+Respuestas pre-serializadas y comprimidas con validación por ETag.
+Se usan para payloads que solo cambian cuando cambia la versión del catálogo.
+"""
+import gzip
+import hashlib
+import json
+import threading
+from datetime import datetime, timezone
+
+from flask import Response
+from werkzeug.http import http_date
+
+try:
+    import brotli  # Opcional: si no está instalado solo se ofrece gzip
+except ImportError:
+    brotli = None
+
+
+def _parse_last_modified(value):
+    """Convierte metadata.last_updated (ISO 8601, sin zona = UTC) en datetime."""
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        dt = value
+    else:
+        try:
+            dt = datetime.fromisoformat(str(value))
+        except ValueError:
+            return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt
+
+
+class CachedPayload:
+    """Bytes ya serializados más sus variantes gzip/brotli, calculadas una sola vez."""
+
+    def __init__(self, body, mimetype='application/json', last_modified=None, compress=True):
+        self.body = body
+        self.mimetype = mimetype
+        self.compress = compress     # False para formatos ya comprimidos (PNG)
+        self.last_modified = _parse_last_modified(last_modified)
+        self.etag = hashlib.sha256(body).hexdigest()[:32]
+        self._encoded = {'identity': body}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_json(cls, data, last_modified=None):
+        body = json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        return cls(body, 'application/json', last_modified)
+
+    def encodings(self):
+        if not self.compress:
+            return ('identity',)
+        return ('br', 'gzip', 'identity') if brotli is not None else ('gzip', 'identity')
+
+    def encoded(self, encoding):
+        body = self._encoded.get(encoding)
+        if body is None:
+            with self._lock:
+                body = self._encoded.get(encoding)
+                if body is None:
+                    if encoding == 'gzip':
+                        body = gzip.compress(self.body, compresslevel=9, mtime=0)
+                    elif encoding == 'br':
+                        body = brotli.compress(self.body)
+                    else:
+                        raise ValueError(f'Codificación no soportada: {encoding}')
+                    self._encoded[encoding] = body
+        return body
+
+    def etag_for(self, encoding):
+        # Cada codificación es una representación distinta: ETag fuerte propio
+        return self.etag if encoding == 'identity' else f'{self.etag}-{encoding}'
+
+    def choose_encoding(self, accept_encodings):
+        for encoding in self.encodings():
+            if encoding == 'identity' or accept_encodings[encoding] > 0:
+                return encoding
+        return 'identity'
+
+
+def make_cached_response(payload, req, max_age=0):
+    """
+    Sirve un CachedPayload respetando Accept-Encoding e If-None-Match.
+    max_age=0 obliga a revalidar siempre, lo que con ETag cuesta un 304 sin cuerpo.
+    """
+    encoding = payload.choose_encoding(req.accept_encodings)
+
+    headers = {
+        'ETag': '"%s"' % payload.etag_for(encoding),
+        'Vary': 'Accept-Encoding',
+        'Cache-Control': f'public, max-age={int(max_age)}, must-revalidate',
+    }
+    if payload.last_modified is not None:
+        headers['Last-Modified'] = http_date(payload.last_modified)
+
+    # Cualquier variante del mismo contenido valida la caché del cliente. If-None-Match
+    # usa comparación débil (RFC 7232): los proxies que comprimen debilitan el ETag (W/"...")
+    if any(req.if_none_match.contains_weak(payload.etag_for(e)) for e in payload.encodings()):
+        return Response(status=304, headers=headers)
+
+    response = Response(payload.encoded(encoding), mimetype=payload.mimetype, headers=headers)
+    if encoding != 'identity':
+        response.headers['Content-Encoding'] = encoding
+    return response
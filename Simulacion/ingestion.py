@@ -0,0 +1,33 @@
+# app/ingestion.py
+"""
+Acceso desde el backend al script de ingesta Visualizacion/fetch_meteorites.py
+(categorías de impacto, generación de trayectorias, formatos de catálogo).
+Se carga por ruta, igual que app.py carga routes.py, porque no es un paquete.
+"""
+import importlib.util
+import os
+import threading
+
+from settings import get_setting
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                            'Visualizacion', 'fetch_meteorites.py')
+
+_module = None
+_module_lock = threading.Lock()
+
+
+def get_fetch_module(config=None):
+    """Devuelve el módulo fetch_meteorites (cargado una vez). Lanza ImportError si no existe."""
+    global _module
+    if _module is None:
+        with _module_lock:
+            if _module is None:
+                path = get_setting(config, 'FETCH_METEORITES_PATH', DEFAULT_PATH)
+                if not os.path.exists(path):
+                    raise ImportError(f'No se encontró fetch_meteorites.py en {path}')
+                spec = importlib.util.spec_from_file_location('fetch_meteorites', path)
+                module = importlib.util.module_from_spec(spec)
+                spec.loader.exec_module(module)
+                _module = module
+    return _module
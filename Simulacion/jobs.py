@@ -0,0 +1,139 @@
+# app/jobs.py
+"""
+Trabajos en segundo plano para el análisis de Gemini: /api/simulate devuelve la
+física al instante y el análisis se consulta después por id (sondeo o long-poll).
+"""
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from settings import get_setting
+
+
+class JobCapacityError(Exception):
+    """No caben más trabajos pendientes; el cliente debe reintentar más tarde."""
+
+
+class Job:
+    def __init__(self, job_id):
+        self.id = job_id
+        self.status = 'pending'          # pending -> running -> done | error
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.finished = None
+        self._done = threading.Event()
+        self._callbacks = []
+        self._callbacks_lock = threading.Lock()
+
+    @property
+    def is_finished(self):
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        return self._done.wait(timeout)
+
+    def add_done_callback(self, fn):
+        """Llama a fn(job) al terminar el trabajo (enseguida si ya terminó)."""
+        with self._callbacks_lock:
+            if not self._done.is_set():
+                self._callbacks.append(fn)
+                return
+        fn(self)
+
+    def _finish(self):
+        self.finished = time.time()
+        with self._callbacks_lock:
+            self._done.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for fn in callbacks:
+            try:
+                fn(self)
+            except Exception as e:
+                print(f"WARNING: callback del trabajo {self.id} falló: {type(e).__name__}: {e}")
+
+    def to_dict(self):
+        data = {'job_id': self.id, 'status': self.status, 'created': self.created}
+        if self.finished is not None:
+            data['finished'] = self.finished
+        if self.error is not None:
+            data['error'] = self.error
+        return data
+
+
+class JobManager:
+    """
+    Executor acotado + registro de trabajos con caducidad.
+    capacity limita los trabajos sin terminar; ttl (s) cuánto se conserva un
+    resultado ya terminado para que el cliente lo recoja.
+    """
+
+    def __init__(self, max_workers=4, capacity=256, ttl=600):
+        self.capacity = capacity
+        self.ttl = ttl
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='gemini-job')
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._rejected = 0
+
+    def _purge(self, now):
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.finished is not None and job.finished + self.ttl < now]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def submit(self, fn, *args, **kwargs):
+        with self._lock:
+            self._purge(time.time())
+            unfinished = sum(1 for job in self._jobs.values() if not job.is_finished)
+            if unfinished >= self.capacity:
+                self._rejected += 1
+                raise JobCapacityError(f'Hay {unfinished} trabajos en curso (máximo {self.capacity})')
+            job = Job(uuid.uuid4().hex)
+            self._jobs[job.id] = job
+        self._executor.submit(self._run, job, fn, args, kwargs)
+        return job
+
+    def _run(self, job, fn, args, kwargs):
+        job.status = 'running'
+        try:
+            job.result = fn(*args, **kwargs)
+            job.status = 'done'
+        except Exception as e:
+            job.error = f'{type(e).__name__}: {e}'
+            job.status = 'error'
+        finally:
+            job._finish()
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None and job.finished is not None and job.finished + self.ttl < time.time():
+                del self._jobs[job_id]
+                return None
+            return job
+
+    def stats(self):
+        with self._lock:
+            statuses = {}
+            for job in self._jobs.values():
+                statuses[job.status] = statuses.get(job.status, 0) + 1
+            return {'jobs': len(self._jobs), 'by_status': statuses,
+                    'capacity': self.capacity, 'rejected': self._rejected}
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_manager(config=None):
+    """Gestor del proceso: GEMINI_JOB_WORKERS, GEMINI_JOB_CAPACITY y GEMINI_JOB_TTL."""
+    global _manager
+    if _manager is None:
+        with _manager_lock:
+            if _manager is None:
+                _manager = JobManager(get_setting(config, 'GEMINI_JOB_WORKERS', 4, int),
+                                      get_setting(config, 'GEMINI_JOB_CAPACITY', 256, int),
+                                      get_setting(config, 'GEMINI_JOB_TTL', 600, float))
+    return _manager
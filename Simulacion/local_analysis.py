@@ -0,0 +1,59 @@
+# app/local_analysis.py
+"""
+Análisis local y determinista de un impacto, sin llamar a Gemini.
+Se usa como respaldo cuando Gemini no responde dentro del plazo de la petición.
+Las categorías de escala son las de fetch_meteorites.get_impact_description.
+"""
+import math
+
+import ingestion
+
+
+def _format_energy(energy_mt):
+    if energy_mt >= 1:
+        return f"{energy_mt:,.1f} megatones"
+    return f"{energy_mt * 1000:,.1f} kilotones"
+
+
+def _format_distance(meters):
+    if meters >= 1000:
+        return f"{meters / 1000:,.1f} km"
+    return f"{meters:,.0f} m"
+
+
+def build_local_analysis(meteorite_data, location, config=None):
+    """
+    Devuelve {'text', 'scale_category', 'description', 'historical_comparison',
+    'source': 'local'} a partir de energía, cráter y tamaño del proyectil.
+    config (app.config) indica dónde está fetch_meteorites (FETCH_METEORITES_PATH).
+    """
+    energy_mt = float(meteorite_data.get('energy') or 0)
+    crater_m = float(meteorite_data.get('crater_diameter') or 0)
+    diameter_m = float(meteorite_data.get('diameter') or 0)
+
+    try:
+        # get_impact_description trabaja en kilotones
+        category, description, comparison = ingestion.get_fetch_module(config).get_impact_description(energy_mt * 1000)
+    except (ImportError, AttributeError):
+        category, description, comparison = 'N/A', 'N/A', 'N/A'
+
+    # Radio aproximado de daños severos por onda expansiva (~escala cúbica con la energía)
+    blast_radius_m = 2200 * (energy_mt ** (1 / 3)) if energy_mt > 0 else 0
+
+    text = (
+        f"Impacto en las coordenadas ({location['lat']}, {location['lng']}). "
+        f"Un objeto de {_format_distance(diameter_m)} liberaría unos {_format_energy(energy_mt)} de TNT "
+        f"y abriría un cráter de aproximadamente {_format_distance(crater_m)} de diámetro. "
+        f"Escala del evento: {category} ({description}); comparable a: {comparison}. "
+    )
+    if blast_radius_m > 0 and math.isfinite(blast_radius_m):
+        text += (f"La onda expansiva causaría daños graves en un radio cercano a "
+                 f"{_format_distance(blast_radius_m)} alrededor del punto de impacto.")
+
+    return {
+        'text': text.strip(),
+        'scale_category': category,
+        'description': description,
+        'historical_comparison': comparison,
+        'source': 'local',
+    }
@@ -0,0 +1,48 @@
+# app/neo_scenarios.py
+"""
+Escenarios de impacto compartidos por las rutas y los trabajos de fondo: los
+parámetros de un NEO del catálogo tal como los envía la interfaz y las
+ubicaciones de referencia (reference_locations.json). Los usan /api/tiles
+(vista global sin puntos de impacto) y warm_cache.py.
+"""
+import json
+import os
+
+import utils
+
+DEFAULT_LOCATIONS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'reference_locations.json')
+# Los mismos valores por defecto que los campos personalizados de map.js
+DEFAULT_DENSITY = 3000      # kg/m³
+DEFAULT_VELOCITY = 20.0     # km/s si el NEO no trae 'velocity'
+
+
+def load_locations(path):
+    """Lee [{'name', 'lat', 'lng'}, ...] en JSON o líneas 'nombre,lat,lng' en CSV."""
+    with open(path, encoding='utf-8') as f:
+        if path.endswith('.json'):
+            return [{'name': loc.get('name', f"{loc['lat']},{loc['lng']}"),
+                     'lat': float(loc['lat']), 'lng': float(loc['lng'])} for loc in json.load(f)]
+        locations = []
+        for line in f:
+            parts = [p.strip() for p in line.rsplit(',', 2)]
+            if len(parts) != 3 or line.startswith('#'):
+                continue
+            try:
+                locations.append({'name': parts[0], 'lat': float(parts[1]), 'lng': float(parts[2])})
+            except ValueError:
+                continue    # cabecera u otra línea no numérica
+        return locations
+
+
+def neo_physics(neo, density=DEFAULT_DENSITY):
+    """
+    Datos para Gemini de un NEO del catálogo con los mismos parámetros que envía
+    la interfaz a /api/simulate (map.js): diámetro 'diameter_meters', velocidad
+    'velocity' (el campo 'velocidad' de /todos) y densidad 3000 kg/m³, para que
+    las claves calentadas coincidan con las del tráfico real.
+    """
+    diameter = float(neo.get('diameter_meters') or 0)
+    velocity = float(neo.get('velocity') or DEFAULT_VELOCITY)
+    energy = utils.calculate_impact_energy(diameter, velocity, density)
+    return {'diameter': diameter, 'velocity': velocity, 'density': density,
+            'energy': energy, 'crater_diameter': utils.calculate_crater_diameter(energy)}
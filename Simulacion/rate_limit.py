@@ -0,0 +1,34 @@
+# app/rate_limit.py
+"""
+Token bucket compartido entre hilos. Lo usan warm_cache.py (llamadas a
+Gemini) y Visualizacion/fetch_meteorites.py (páginas de la API de la NASA).
+Sin dependencias del resto del backend para que el script de ingesta pueda
+importarlo tal cual.
+"""
+import threading
+import time
+
+
+class RateLimiter:
+    """`rate` adquisiciones por segundo (0 = sin límite) con ráfagas de hasta `burst`."""
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if not self.rate:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
@@ -0,0 +1,290 @@
+# app/risk.py
+"""
+Motor Monte Carlo de riesgo de impacto por NEO.
+Muestrea diámetro, densidad, velocidad y ángulo de entrada según
+distribuciones configurables, evalúa los modelos de energía y cráter de utils
+en bloques vectorizados repartidos en un pool de procesos y resume el
+resultado en percentiles e histogramas.
+
+Cada bloque devuelve histogramas finos (log-espaciados) en lugar de las
+muestras, así que el coste de comunicación no depende del número de muestras.
+"""
+import copy
+import hashlib
+import json
+import math
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import utils
+from cache import LRUCache
+from settings import get_setting
+from singleflight import SingleFlight
+
+# Rango de los histogramas internos (log10); ~0.5 % de resolución relativa
+ENERGY_LOG_RANGE = (-9.0, 13.0)     # megatones
+CRATER_LOG_RANGE = (-1.0, 8.0)      # metros
+FINE_BINS = 4000
+PERCENTILES = (1, 5, 25, 50, 75, 95, 99)
+# Cociente máx/mín de los diámetros estimados por NeoWs (albedo 0.25 frente a 0.05)
+NEOWS_DIAMETER_RATIO = math.sqrt(5)
+
+# Distribución -> parámetros obligatorios ('normal' y 'sin2' aceptan además low/high)
+DISTRIBUTIONS = {
+    'fixed': ('value',),
+    'uniform': ('low', 'high'),
+    'loguniform': ('low', 'high'),
+    'normal': ('mean', 'std'),
+    'lognormal': ('median', 'sigma'),
+    'triangular': ('low', 'mode', 'high'),
+    'sin2': (),
+}
+
+
+def default_distributions(neo):
+    """
+    Distribuciones por defecto de un NEO del catálogo:
+    - diámetro: log-uniforme entre estimated_diameter_min/max (o, si el catálogo
+      solo trae la media, el rango equivalente de NeoWs),
+    - densidad: normal 2600 ± 700 kg/m³ acotada a [1000, 8000] (rocosos a metálicos),
+    - velocidad: normal centrada en la estimación del catálogo ± 3 km/s, en [11.2, 72],
+    - ángulo de entrada: densidad sin(2θ), la distribución isótropa de Shoemaker.
+    """
+    diameter = float(neo.get('diameter_meters') or 0)
+    low = neo.get('diameter_min_meters')
+    high = neo.get('diameter_max_meters')
+    if not low or not high:
+        low = 2 * diameter / (1 + NEOWS_DIAMETER_RATIO)
+        high = low * NEOWS_DIAMETER_RATIO
+    velocity = float((neo.get('impact_stats') or {}).get('impact_velocity_km_s') or 20.0)
+    return {
+        'diameter': {'dist': 'loguniform', 'low': float(low), 'high': float(high)},
+        'density': {'dist': 'normal', 'mean': 2600.0, 'std': 700.0, 'low': 1000.0, 'high': 8000.0},
+        'velocity': {'dist': 'normal', 'mean': velocity, 'std': 3.0, 'low': 11.2, 'high': 72.0},
+        'angle': {'dist': 'sin2'},
+    }
+
+
+def merge_distributions(base, overrides):
+    """Aplica overrides ({'density': {'mean': 3000}, ...}) y valida el resultado. Lanza ValueError."""
+    merged = copy.deepcopy(base)
+    for name, spec in (overrides or {}).items():
+        if name not in merged:
+            raise ValueError(f'Variable desconocida: {name}')
+        if not isinstance(spec, dict):
+            raise ValueError(f'La distribución de {name} debe ser un objeto')
+        if 'dist' in spec and spec['dist'] != merged[name].get('dist'):
+            merged[name] = dict(spec)
+        else:
+            merged[name].update(spec)
+    for name, spec in merged.items():
+        if spec.get('dist') not in DISTRIBUTIONS:
+            raise ValueError(f"{name}: distribución no soportada {spec.get('dist')!r} (usa {', '.join(DISTRIBUTIONS)})")
+        missing = [field for field in DISTRIBUTIONS[spec['dist']] if field not in spec]
+        if missing:
+            raise ValueError(f"{name}: faltan parámetros de {spec['dist']}: {', '.join(missing)}")
+        for field, value in spec.items():
+            if field != 'dist' and (isinstance(value, bool) or not isinstance(value, (int, float))
+                                    or not math.isfinite(value)):
+                raise ValueError(f'{name}.{field} debe ser numérico y finito')
+        if spec.get('low') is not None and spec.get('high') is not None and spec['low'] > spec['high']:
+            raise ValueError(f'{name}: low no puede ser mayor que high')
+        if spec['dist'] == 'loguniform' and spec['low'] <= 0:
+            raise ValueError(f'{name}: loguniform necesita low > 0')
+    return merged
+
+
+def _sample(rng, spec, n):
+    dist = spec['dist']
+    if dist == 'fixed':
+        return np.full(n, float(spec['value']))
+    if dist == 'uniform':
+        return rng.uniform(spec['low'], spec['high'], n)
+    if dist == 'loguniform':
+        return np.exp(rng.uniform(math.log(spec['low']), math.log(spec['high']), n))
+    if dist == 'lognormal':
+        return rng.lognormal(math.log(spec['median']), spec['sigma'], n)
+    if dist == 'triangular':
+        return rng.triangular(spec['low'], spec['mode'], spec['high'], n)
+    if dist == 'sin2':
+        # Ángulo sobre la horizontal (grados) con densidad sin(2θ): θ = arccos(1 - 2u) / 2
+        low, high = math.radians(spec.get('low', 0.0)), math.radians(spec.get('high', 90.0))
+        u = rng.uniform((1 - math.cos(2 * low)) / 2, (1 - math.cos(2 * high)) / 2, n)
+        return np.degrees(np.arccos(1 - 2 * u) / 2)
+    values = rng.normal(spec['mean'], spec['std'], n)
+    if 'low' in spec or 'high' in spec:
+        values = np.clip(values, spec.get('low', -np.inf), spec.get('high', np.inf))
+    return values
+
+
+def _log_histogram(values, log_range):
+    """
+    Histograma fino de log10(values). Lo que cae fuera del rango (incluido el
+    -inf de las muestras nulas) se acumula en los bins extremos, de modo que
+    los conteos siempre suman len(values).
+    """
+    with np.errstate(divide='ignore'):
+        logs = np.clip(np.log10(values), *log_range)
+    counts, _ = np.histogram(logs, bins=FINE_BINS, range=log_range)
+    return counts
+
+
+def _edges(log_range, low, high):
+    """Bordes (log10) del histograma fino; los bins extremos llegan hasta el mínimo y el máximo observados."""
+    edges = np.linspace(log_range[0], log_range[1], FINE_BINS + 1)
+    if low > 0:
+        edges[0] = min(edges[0], math.log10(low))
+    if high > 0:
+        edges[-1] = max(edges[-1], math.log10(high))
+    return edges
+
+
+def simulate_chunk(distributions, n, seed):
+    """
+    Evalúa n muestras (función de nivel de módulo para poder enviarla al pool).
+    El cráter se corrige por el ángulo de entrada con sin(θ)^(1/3), que es
+    como escala el diámetro con la componente vertical del impacto.
+    """
+    rng = np.random.default_rng(seed)
+    diameter = _sample(rng, distributions['diameter'], n)
+    density = _sample(rng, distributions['density'], n)
+    velocity = _sample(rng, distributions['velocity'], n)
+    angle = _sample(rng, distributions['angle'], n)
+
+    energy = utils.calculate_impact_energy_array(diameter, velocity, density)
+    crater = utils.calculate_crater_diameter_array(energy) * np.cbrt(np.sin(np.radians(np.clip(angle, 0, 90))))
+    return {
+        'n': n,
+        'energy_hist': _log_histogram(energy, ENERGY_LOG_RANGE),
+        'crater_hist': _log_histogram(crater, CRATER_LOG_RANGE),
+        'energy_sum': float(energy.sum()),
+        'crater_sum': float(crater.sum()),
+        'energy_min': float(energy.min()), 'energy_max': float(energy.max()),
+        'crater_min': float(crater.min()), 'crater_max': float(crater.max()),
+    }
+
+
+def _percentiles(counts, edges, low, high):
+    """
+    Percentiles a partir del histograma fino, interpolando en escala log dentro
+    del bin y acotados al mínimo y máximo observados.
+    """
+    cumulative = np.cumsum(counts)
+    total = cumulative[-1]
+    result = {}
+    for p in PERCENTILES:
+        target = total * p / 100.0
+        i = int(np.searchsorted(cumulative, target, side='left'))
+        i = min(i, FINE_BINS - 1)
+        below = cumulative[i - 1] if i > 0 else 0
+        fraction = (target - below) / counts[i] if counts[i] else 0.0
+        value = 10 ** (edges[i] + fraction * (edges[i + 1] - edges[i]))
+        result[f'p{p}'] = float(min(max(value, low), high))
+    return result
+
+
+def _coarse_histogram(counts, edges, bins):
+    """Agrupa el histograma fino en `bins` barras sobre el tramo con muestras."""
+    nonzero = np.nonzero(counts)[0]
+    if len(nonzero) == 0:
+        return {'edges': [], 'counts': []}
+    first, last = nonzero[0], nonzero[-1] + 1
+    starts = np.unique(np.linspace(first, last, bins + 1).astype(int))
+    grouped = np.add.reduceat(counts[:last], starts[:-1])
+    return {'edges': [float(10 ** edges[i]) for i in starts], 'counts': [int(c) for c in grouped]}
+
+
+def summarize(chunks, bins=30):
+    n = sum(c['n'] for c in chunks)
+    summary = {'samples': n}
+    for name, log_range, unit in (('energy', ENERGY_LOG_RANGE, 'megatons'), ('crater', CRATER_LOG_RANGE, 'meters')):
+        counts = np.sum([c[f'{name}_hist'] for c in chunks], axis=0)
+        low = min(c[f'{name}_min'] for c in chunks)
+        high = max(c[f'{name}_max'] for c in chunks)
+        edges = _edges(log_range, low, high)
+        summary[f'{name}_{unit}'] = {
+            'mean': sum(c[f'{name}_sum'] for c in chunks) / n,
+            'min': low,
+            'max': high,
+            'percentiles': _percentiles(counts, edges, low, high),
+            'histogram': _coarse_histogram(counts, edges, bins),
+        }
+    return summary
+
+
+class RiskEngine:
+    """
+    Reparte las muestras en bloques de chunk_size sobre un ProcessPoolExecutor
+    (contexto spawn, creado al primer uso). Con workers <= 1 se calcula en el
+    propio proceso. Los resultados se guardan en un LRU por NEO, versión del
+    catálogo, distribuciones, muestras y semilla.
+    """
+
+    def __init__(self, workers=None, chunk_size=250000, max_samples=10000000, cache_size=256):
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.max_samples = max_samples
+        self.cache = LRUCache(cache_size)
+        self._flight = SingleFlight()
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+    def _executor(self):
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'))
+        return self._pool
+
+    def run(self, distributions, samples, seed=0, bins=30):
+        """Simulación sin caché. Devuelve el resumen (ver summarize)."""
+        samples = int(samples)
+        if not 1 <= samples <= self.max_samples:
+            raise ValueError(f'samples debe estar entre 1 y {self.max_samples}')
+        sizes = [self.chunk_size] * (samples // self.chunk_size)
+        if samples % self.chunk_size:
+            sizes.append(samples % self.chunk_size)
+        seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+        if self.workers <= 1 or len(sizes) == 1:
+            chunks = [simulate_chunk(distributions, n, s) for n, s in zip(sizes, seeds)]
+        else:
+            chunks = list(self._executor().map(simulate_chunk, [distributions] * len(sizes), sizes, seeds))
+        return summarize(chunks, bins)
+
+    def neo_risk(self, neo, catalog_version, overrides=None, samples=1000000, seed=0, bins=30):
+        distributions = merge_distributions(default_distributions(neo), overrides)
+        key = hashlib.sha1(json.dumps([neo.get('id'), catalog_version, distributions, samples, seed, bins],
+                                      sort_keys=True).encode('utf-8')).hexdigest()
+        cached = self.cache.get(key)
+        if cached is not None:
+            return dict(cached, cached=True)
+
+        def compute():
+            result = self.run(distributions, samples, seed, bins)
+            result.update({'id': neo.get('id'), 'name': neo.get('name'), 'seed': seed,
+                           'distributions': distributions})
+            self.cache.set(key, result)
+            return result
+
+        return dict(self._flight.do(key, compute), cached=False)
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine(config=None):
+    """Motor del proceso: RISK_WORKERS, RISK_CHUNK_SIZE, RISK_MAX_SAMPLES y RISK_CACHE_SIZE."""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = RiskEngine(get_setting(config, 'RISK_WORKERS', None, int),
+                                     get_setting(config, 'RISK_CHUNK_SIZE', 250000, int),
+                                     get_setting(config, 'RISK_MAX_SAMPLES', 10000000, int),
+                                     get_setting(config, 'RISK_CACHE_SIZE', 256, int))
+    return _engine
@@ -1,85 +1,660 @@
 # app/routes.py (Versión sin Google Maps)
 
-from flask import request, jsonify, Blueprint
+from flask import request, jsonify, Blueprint, Response, stream_with_context
+import json
+import math
+import sqlite3
+import time
+import numpy as np
 import services
 import utils
+import http_cache
+import analysis_cache
+import jobs
+import gemini_client
+import singleflight
+import local_analysis
+import ingestion
+import admission
+import catalog_store
+import tiles
+import trajectories
+import risk
+import search
+import neo_scenarios
+from settings import get_setting
 from flask import current_app
 
 bp = Blueprint('api', __name__, url_prefix='/api')
 
+# Límites del endpoint por lotes (configurables en app.config)
+BATCH_MAX_SCENARIOS = 100000
+BATCH_MAX_ANALYSES = 20
+
+
+@bp.record_once
+def _warm_up(state):
+    # Carga fetch_meteorites ahora para que el primer análisis local no pague la importación
+    try:
+        ingestion.get_fetch_module(state.app.config)
+    except ImportError as e:
+        print(f"WARNING: {e}")
+
 @bp.route('/neos', methods=['GET'])
+@admission.cheap_route
 def get_neos():
-    """Endpoint para obtener la lista de Objetos Cercanos a la Tierra."""
-    neos_data = services.get_nasa_neos()
-    if "error" in neos_data:
-        return jsonify(neos_data), 500
-    return jsonify(neos_data)
+    """Endpoint para obtener la lista de Objetos Cercanos a la Tierra.
+    El cuerpo se serializa y comprime una vez por versión del catálogo y se
+    valida con ETag (If-None-Match -> 304). Las trayectorias solo se incluyen
+    con ?trajectories=1; si no, se piden por NEO a /neos/<id>/trajectory.
+
+    Con filtros, sort, limit, cursor o fields la consulta se resuelve en el
+    catálogo SQLite (ver catalog_store.parse_query), una página cada vez:
+    ?is_hazardous=true&energy_min=10&sort=energy&limit=50&fields=id,name
+    """
+    try:
+        if catalog_store.is_query(request.args, current_app.config):
+            return _query_neos()
+    except ImportError as e:
+        return jsonify({'error': str(e)}), 500
+    payload = services.get_nasa_neos_payload(request.args.get('trajectories') in ('1', 'true'))
+    if isinstance(payload, dict):
+        return jsonify(payload), 500
+    return http_cache.make_cached_response(payload, request)
+
+def _query_neos():
+    snapshot = services.get_neo_catalog()
+    if isinstance(snapshot, dict):
+        return jsonify(snapshot), 500
+    try:
+        query = catalog_store.parse_query(request.args, current_app.config)
+    except ValueError as e:
+        return jsonify({'error': f'Parámetros inválidos: {e}'}), 400
+    except ImportError as e:
+        return jsonify({'error': str(e)}), 500
+    try:
+        return jsonify(catalog_store.get_store(current_app.config).query(snapshot, query))
+    except (OSError, sqlite3.Error) as e:
+        return jsonify({'error': f'Catálogo SQLite no disponible: {e}'}), 500
+
+@bp.route('/neos/search', methods=['GET'])
+@admission.cheap_route
+def search_neos():
+    """
+    Autocompletado de nombres: ?q=eros&limit=10. Coincidencias exactas, por
+    prefijo, por palabra y aproximadas (ver search.py), de mejor a peor.
+    """
+    snapshot = services.get_neo_catalog()
+    if isinstance(snapshot, dict):
+        return jsonify(snapshot), 500
+    try:
+        limit = int(request.args.get('limit', 10))
+    except ValueError:
+        return jsonify({'error': 'limit debe ser un entero'}), 400
+    index = search.get_index(snapshot)
+    started = time.perf_counter()
+    matches = index.search(request.args.get('q', ''), limit)
+    took = time.perf_counter() - started
+    return jsonify({
+        'query': request.args.get('q', ''),
+        'results': [{
+            'id': neo.get('id'),
+            'name': neo.get('name'),
+            'is_hazardous': neo.get('is_hazardous'),
+            'diameter_meters': neo.get('diameter_meters'),
+            'match': match,
+            'distance': distance,
+        } for neo, match, distance in matches],
+        'took_ms': round(took * 1000, 3),
+    })
+
+@bp.route('/neos/stats', methods=['GET'])
+def catalog_store_stats():
+    return jsonify(catalog_store.get_store(current_app.config).stats())
+
+@bp.route('/neos/trajectories.bin', methods=['GET'])
+@admission.cheap_route
+def get_neo_trajectories():
+    """
+    El catálogo en binario (ver fetch_meteorites.encode_binary_catalog): el
+    navegador envuelve posiciones y trayectorias en Float32Array sin parsear JSON.
+    """
+    try:
+        payload = services.get_neo_trajectories_payload()
+    except ImportError as e:
+        return jsonify({'error': str(e)}), 500
+    if isinstance(payload, dict):
+        return jsonify(payload), 500
+    return http_cache.make_cached_response(payload, request)
+
+@bp.route('/neos/<neo_id>/trajectory', methods=['GET'])
+@admission.cheap_route
+def get_neo_trajectory(neo_id):
+    """
+    Trayectoria generada bajo demanda (ver trajectories.py).
+    Query: points (muestras de la órbita, 2..5000), fraction (0..1] de la
+    órbita y tolerance (unidades de escena; 0 = sin simplificar).
+    """
+    snapshot = services.get_neo_catalog()
+    if isinstance(snapshot, dict):
+        return jsonify(snapshot), 500
+    neo = snapshot.get_by_id(neo_id) or snapshot.find(neo_id)
+    if neo is None:
+        return jsonify({'error': f'NEO no encontrado: {neo_id}'}), 404
+    try:
+        points, fraction, tolerance = trajectories.parse_params(request.args)
+    except ValueError as e:
+        return jsonify({'error': f'Parámetros inválidos: {e}'}), 400
+    try:
+        payload = trajectories.get_service(current_app.config).payload(
+            neo, snapshot.version, points, fraction, tolerance)
+    except ImportError as e:
+        return jsonify({'error': str(e)}), 500
+    return http_cache.make_cached_response(payload, request, max_age=3600)
+
+@bp.route('/neos/trajectories/stats', methods=['GET'])
+def trajectory_stats():
+    return jsonify(trajectories.get_service(current_app.config).stats())
+
+@bp.route('/neos/<neo_id>/risk', methods=['GET', 'POST'])
+@admission.expensive_route
+def get_neo_risk(neo_id):
+    """
+    Estimación Monte Carlo de energía y cráter de un NEO con incertidumbre en
+    diámetro, densidad, velocidad y ángulo de entrada (ver risk.py).
+    Query: samples (por defecto RISK_DEFAULT_SAMPLES), seed, bins. Con POST,
+    el cuerpo puede traer {'distributions': {'density': {'mean': 3000}, ...}}.
+    El resultado se cachea por NEO, versión del catálogo y parámetros.
+    """
+    snapshot = services.get_neo_catalog()
+    if isinstance(snapshot, dict):
+        return jsonify(snapshot), 500
+    neo = snapshot.get_by_id(neo_id) or snapshot.find(neo_id)
+    if neo is None:
+        return jsonify({'error': f'NEO no encontrado: {neo_id}'}), 404
+
+    body = request.get_json(silent=True) or {}
+    if not isinstance(body, dict):
+        return jsonify({'error': 'El cuerpo debe ser un objeto JSON'}), 400
+    try:
+        samples = int(request.args.get('samples', body.get('samples',
+                      get_setting(current_app.config, 'RISK_DEFAULT_SAMPLES', 1000000, int))))
+        seed = int(request.args.get('seed', body.get('seed', 0)))
+        bins = min(max(int(request.args.get('bins', body.get('bins', 30))), 1), 200)
+        result = risk.get_engine(current_app.config).neo_risk(
+            neo, snapshot.version, body.get('distributions'), samples=samples, seed=seed, bins=bins)
+    except (ValueError, TypeError) as e:
+        return jsonify({'error': f'Parámetros inválidos: {e}'}), 400
+    return jsonify(result)
+
+
+def _normalize_gemini(gemini_analysis):
+    """
+    Normalizar la estructura de gemini_analysis para que el frontend
+    siempre reciba un objeto predecible (dict). Si el servicio devuelve
+    una cadena u otro tipo, la envolvemos como {'text': ...}.
+    """
+    if isinstance(gemini_analysis, dict):
+        return gemini_analysis
+    try:
+        return { 'text': str(gemini_analysis) }
+    except Exception:
+        return { 'text': 'Respuesta de Gemini no disponible.' }
+
+
+def _run_gemini_job(app, meteorite_data, location):
+    # Se ejecuta en el executor de jobs: necesita su propio contexto de aplicación
+    with app.app_context():
+        try:
+            return _normalize_gemini(services.get_gemini_analysis(meteorite_data, location))
+        except Exception as e:
+            # No queremos que falle el trabajo si Gemini tiene problemas
+            # Devolvemos un dict con 'error' para que el frontend lo maneje
+            return {'error': f"Exception calling Gemini: {type(e).__name__}: {e}"}
+
+
+def _job_payload(job):
+    payload = job.to_dict()
+    if job.status == 'done':
+        payload['gemini_analysis'] = job.result
+    return payload
+
+
+def _simulate_physics(data):
+    """
+    Valida {'meteorite': {...}, 'location': {...}} y calcula energía y cráter.
+    Devuelve (respuesta_base, datos_para_gemini); lanza ValueError/KeyError/TypeError.
+    """
+    location = data['location'] # Esperamos {'lat': ..., 'lng': ...}
+    if 'lat' not in location or 'lng' not in location:
+        raise KeyError("location debe contener 'lat' y 'lng'")
+    # Se convierten aquí: la clave de caché y el prompt necesitan números finitos
+    location = dict(location, lat=float(location['lat']), lng=float(location['lng']))
+    if not (math.isfinite(location['lat']) and math.isfinite(location['lng'])):
+        raise ValueError("'lat' y 'lng' deben ser números finitos")
+    meteorite_params = data['meteorite']
+    diameter = float(meteorite_params['diameter'])
+    velocity = float(meteorite_params['velocity'])
+    density = float(meteorite_params['density'])
+    if not all(math.isfinite(value) for value in (diameter, velocity, density)):
+        raise ValueError("'diameter', 'velocity' y 'density' deben ser números finitos")
+
+    # 1. Realizar cálculos
+    try:
+        energy = utils.calculate_impact_energy(diameter, velocity, density)
+        crater_diameter = utils.calculate_crater_diameter(energy)
+    except OverflowError:
+        raise ValueError('la energía del impacto desborda') from None
+    if not (math.isfinite(energy) and math.isfinite(crater_diameter)):
+        raise ValueError('la energía del impacto desborda')
+
+    response_data = {
+        "impact_effects": {
+            "energy_megatons": round(energy, 2),
+            "crater_diameter_meters": round(crater_diameter, 2)
+        },
+        "location": location,
+    }
+    meteorite_data_for_gemini = {
+        "diameter": diameter, "velocity": velocity, "density": density,
+        "energy": energy, "crater_diameter": crater_diameter
+    }
+    return response_data, meteorite_data_for_gemini
+
+
+def _request_deadline(data):
+    """
+    Plazo (s) para esperar a Gemini: cabecera X-Deadline-Ms, o 'wait' (s) en el
+    cuerpo, o SIMULATE_DEADLINE_MS en config. 0 = responder sin esperar.
+    """
+    header = request.headers.get('X-Deadline-Ms')
+    if header is not None:
+        return min(float(header) / 1000.0, 60.0)
+    if data.get('wait') is not None:
+        return min(float(data['wait']), 60.0)
+    return min(get_setting(current_app.config, 'SIMULATE_DEADLINE_MS', 0, float) / 1000.0, 60.0)
+
+
+def _with_fallback(response_data, meteorite_data, location, reason):
+    # Análisis local determinista cuando Gemini no contesta a tiempo (o falla)
+    analysis = local_analysis.build_local_analysis(meteorite_data, location, current_app.config)
+    analysis['fallback'] = True
+    response_data["gemini_analysis"] = analysis
+    response_data["fallback"] = True
+    response_data["fallback_reason"] = reason
+    return response_data
+
 
 @bp.route('/simulate', methods=['POST'])
 def simulate_impact():
-    """Endpoint principal para simular el impacto de un meteorito."""
+    """Endpoint principal para simular el impacto de un meteorito.
+    Devuelve impact_effects y el análisis de Gemini si está en caché o llega
+    dentro del plazo de la petición (ver _request_deadline). Si no, responde con
+    un análisis local marcado 'fallback' y un job_id: el trabajo sigue en
+    segundo plano, deja el resultado en caché y se recoge en /api/simulate/<job_id>.
+    """
+    started = time.monotonic()
     data = request.get_json()
 
     if not data or 'meteorite' not in data or 'location' not in data:
         return jsonify({"error": "Datos de entrada inválidos"}), 400
 
     try:
-        location = data['location'] # Esperamos {'lat': ..., 'lng': ...}
-        if 'lat' not in location or 'lng' not in location:
-            return jsonify({'error': "location debe contener 'lat' y 'lng'"}), 400
-        meteorite_params = data['meteorite']
-        diameter = float(meteorite_params['diameter'])
-        velocity = float(meteorite_params['velocity'])
-        density = float(meteorite_params['density'])
+        response_data, meteorite_data_for_gemini = _simulate_physics(data)
+        deadline = _request_deadline(data)
+    except (ValueError, KeyError, TypeError) as e:
+        return jsonify({"error": f"Formato de parámetro inválido o faltan 'lat'/'lng': {e}"}), 400
+    location = response_data["location"]
 
-        # 1. Realizar cálculos
-        energy = utils.calculate_impact_energy(diameter, velocity, density)
-        crater_diameter = utils.calculate_crater_diameter(energy)
+    # 2. Análisis de Gemini: de caché si existe, si no como trabajo en segundo plano
+    cached = services.get_cached_gemini_analysis(meteorite_data_for_gemini, location)
+    if cached is not None:
+        response_data["analysis_status"] = "done"
+        response_data["gemini_analysis"] = _normalize_gemini(cached)
+        return jsonify(response_data)
+
+    # A partir de aquí la petición depende de Gemini: pasa por el control de
+    # admisión, y el hueco dura lo que dure el trabajo, no solo la petición
+    controller = admission.get_controller(current_app.config)
+    try:
+        release = controller.releaser(controller.acquire(admission.request_priority()))
+    except admission.AdmissionRejected as e:
+        return admission.rejected_response(e)
+    try:
+        job = jobs.get_manager(current_app.config).submit(
+            _run_gemini_job, current_app._get_current_object(), meteorite_data_for_gemini, location)
+    except jobs.JobCapacityError as e:
+        release()
+        response_data["analysis_status"] = "unavailable"
+        return jsonify(_with_fallback(response_data, meteorite_data_for_gemini, location, str(e)))
+    except BaseException:
+        release()
+        raise
+    job.add_done_callback(release)
+
+    remaining = deadline - (time.monotonic() - started)
+    finished = remaining > 0 and job.wait(remaining)
+
+    if finished:
+        result = job.result if job.status == 'done' else {'error': job.error}
+        if 'error' not in result:
+            response_data["analysis_status"] = "done"
+            response_data["gemini_analysis"] = result
+            return jsonify(response_data)
+        response_data["analysis_status"] = "error"
+        return jsonify(_with_fallback(response_data, meteorite_data_for_gemini, location, result['error']))
 
-        # 2. Obtener análisis de Gemini
-        meteorite_data_for_gemini = {
-            "diameter": diameter, "velocity": velocity, "density": density,
-            "energy": energy, "crater_diameter": crater_diameter
+    response_data["analysis_status"] = job.status
+    response_data["job_id"] = job.id
+    response_data["job_url"] = f"{bp.url_prefix}/simulate/{job.id}"
+    _with_fallback(response_data, meteorite_data_for_gemini, location,
+                   f"Gemini no respondió en {max(deadline, 0) * 1000:.0f} ms")
+    return jsonify(response_data), 202
+
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@bp.route('/simulate/stream', methods=['GET', 'POST'])
+def simulate_stream():
+    """
+    Server-Sent Events: primero 'physics' con impact_effects, luego un evento
+    'chunk' por cada fragmento de texto de Gemini y al final 'done' con el
+    análisis normalizado. POST acepta el mismo JSON que /api/simulate; GET
+    (para EventSource) usa ?diameter=&velocity=&density=&lat=&lng=.
+    """
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+    else:
+        args = request.args
+        data = {
+            'meteorite': {k: args.get(k) for k in ('diameter', 'velocity', 'density')},
+            'location': {'lat': args.get('lat', type=float), 'lng': args.get('lng', type=float)},
         }
+    if 'meteorite' not in data or 'location' not in data:
+        return jsonify({"error": "Datos de entrada inválidos"}), 400
+    try:
+        response_data, meteorite_data_for_gemini = _simulate_physics(data)
+    except (ValueError, KeyError, TypeError) as e:
+        return jsonify({"error": f"Formato de parámetro inválido o faltan 'lat'/'lng': {e}"}), 400
+    location = response_data["location"]
+
+    # El hueco de admisión se mantiene mientras dura el stream. Se libera al
+    # cerrar la respuesta: el generador no llega a arrancar con HEAD o si el
+    # cliente se desconecta antes del primer evento
+    controller = admission.get_controller(current_app.config)
+    try:
+        release = controller.releaser(controller.acquire(admission.request_priority()))
+    except admission.AdmissionRejected as e:
+        return admission.rejected_response(e)
+
+    def generate():
         try:
-            gemini_analysis = services.get_gemini_analysis(meteorite_data_for_gemini, location)
+            yield _sse('physics', response_data)
+            for event, payload in services.stream_gemini_analysis(meteorite_data_for_gemini, location):
+                if event == 'chunk':
+                    yield _sse('chunk', {'text': payload})
+                else:
+                    yield _sse('done', {'gemini_analysis': _normalize_gemini(payload)})
         except Exception as e:
-            # No queremos que falle toda la petición si Gemini tiene problemas
-            # Devolvemos un dict con 'error' para que el frontend lo maneje
-            gemini_analysis = {'error': f"Exception calling Gemini: {type(e).__name__}: {e}"}
-
-        # Normalizar la estructura de gemini_analysis para que el frontend
-        # siempre reciba un objeto predecible (dict). Si el servicio devuelve
-        # una cadena u otro tipo, la envolvemos como {'text': ...}.
-        if isinstance(gemini_analysis, dict):
-            normalized_gemini = gemini_analysis
-        else:
-            try:
-                normalized_gemini = { 'text': str(gemini_analysis) }
-            except Exception:
-                normalized_gemini = { 'text': 'Respuesta de Gemini no disponible.' }
-
-        # 3. Preparar la respuesta
-        response_data = {
-            "impact_effects": {
-                "energy_megatons": round(energy, 2),
-                "crater_diameter_meters": round(crater_diameter, 2)
-            },
-            "location": location,
-            "gemini_analysis": normalized_gemini
-        }
+            yield _sse('done', {'gemini_analysis': {'error': f"Exception calling Gemini: {type(e).__name__}: {e}"}})
+        finally:
+            release()
 
-        return jsonify(response_data)
+    try:
+        response = Response(stream_with_context(generate()), mimetype='text/event-stream',
+                            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+        response.call_on_close(release)
+    except BaseException:
+        release()
+        raise
+    return response
 
-    except (ValueError, KeyError) as e:
-        return jsonify({"error": f"Formato de parámetro inválido o faltan 'lat'/'lng': {e}"}), 400
+
+@bp.route('/simulate/<job_id>', methods=['GET'])
+def simulate_job(job_id):
+    """Estado de un análisis en segundo plano. ?wait=<s> hace long-poll (máx. 30 s)."""
+    job = jobs.get_manager(current_app.config).get(job_id)
+    if job is None:
+        return jsonify({'error': 'Trabajo no encontrado o caducado'}), 404
+    try:
+        wait = min(float(request.args.get('wait', 0)), 30.0)
+    except ValueError:
+        return jsonify({'error': "El parámetro 'wait' debe ser numérico"}), 400
+    if wait > 0 and not job.is_finished:
+        job.wait(wait)
+    return jsonify(_job_payload(job))
+
+
+@bp.route('/simulate/jobs/stats', methods=['GET'])
+def simulate_job_stats():
+    return jsonify(jobs.get_manager(current_app.config).stats())
+
+
+def _read_batch_scenarios():
+    """
+    Lee los escenarios del cuerpo: JSON ({'scenarios': [...]} o una lista) o
+    NDJSON (un objeto por línea). Devuelve (escenarios, es_ndjson, opciones).
+    """
+    is_ndjson = 'ndjson' in (request.mimetype or '')
+    if is_ndjson:
+        scenarios = []
+        for line in request.get_data(as_text=True).splitlines():
+            line = line.strip()
+            if line:
+                scenarios.append(json.loads(line))
+        return scenarios, True, {}
+
+    data = request.get_json(silent=True)
+    if isinstance(data, list):
+        return data, False, {}
+    if isinstance(data, dict) and isinstance(data.get('scenarios'), list):
+        return data['scenarios'], False, data
+    raise ValueError("Se esperaba una lista de escenarios o {'scenarios': [...]}")
+
+
+def _attach_batch_analyses(scenarios, results, diameters, velocities, densities, energy, crater):
+    # Los escenarios con ubicación se analizan juntos en prompts de varios escenarios
+    max_analyses = current_app.config.get('BATCH_MAX_ANALYSES', BATCH_MAX_ANALYSES)
+    indices = [i for i, scenario in enumerate(scenarios) if scenario.get('location')][:max_analyses]
+    items = [({
+        "diameter": float(diameters[i]), "velocity": float(velocities[i]), "density": float(densities[i]),
+        "energy": float(energy[i]), "crater_diameter": float(crater[i])
+    }, scenarios[i]['location']) for i in indices]
+    try:
+        analyses = services.get_gemini_analyses(items)
+    except Exception as e:
+        analyses = [{'error': f"Exception calling Gemini: {type(e).__name__}: {e}"}] * len(items)
+    for i, analysis in zip(indices, analyses):
+        results[i]['gemini_analysis'] = analysis
+
+
+@bp.route('/simulate/batch', methods=['POST'])
+@admission.cheap_route
+def simulate_batch():
+    """
+    Simula miles de escenarios en una sola petición con las versiones
+    vectorizadas de utils. Cada escenario: {id?, diameter, velocity, density,
+    target_density?, location?} (también acepta {'meteorite': {...}}).
+    Gemini solo se consulta con 'analysis': true (o ?analysis=1) y para a lo
+    sumo BATCH_MAX_ANALYSES escenarios que traigan location.
+    """
+    try:
+        scenarios, is_ndjson, options = _read_batch_scenarios()
+    except ValueError as e:
+        return jsonify({'error': f'Cuerpo inválido: {e}'}), 400
+
+    max_scenarios = current_app.config.get('BATCH_MAX_SCENARIOS', BATCH_MAX_SCENARIOS)
+    if len(scenarios) > max_scenarios:
+        return jsonify({'error': f'Máximo {max_scenarios} escenarios por lote'}), 413
+
+    count = len(scenarios)
+    diameters = np.empty(count)
+    velocities = np.empty(count)
+    densities = np.empty(count)
+    targets = np.empty(count)
+    for i, scenario in enumerate(scenarios):
+        try:
+            params = scenario.get('meteorite', scenario)
+            diameters[i] = float(params['diameter'])
+            velocities[i] = float(params['velocity'])
+            densities[i] = float(params['density'])
+            targets[i] = float(scenario.get('target_density', params.get('target_density', 1800)))
+        except (AttributeError, KeyError, TypeError, ValueError) as e:
+            return jsonify({'error': f'Escenario {i} inválido: {e}'}), 400
+
+    # NaN, inf o valores que desbordan la energía no tienen representación en JSON
+    finite = np.isfinite(diameters) & np.isfinite(velocities) & np.isfinite(densities) & np.isfinite(targets)
+    if not finite.all():
+        i = int(np.argmin(finite))
+        return jsonify({'error': f'Escenario {i} inválido: los parámetros deben ser números finitos'}), 400
+    with np.errstate(over='ignore', invalid='ignore'):
+        energy = utils.calculate_impact_energy_array(diameters, velocities, densities)
+        crater = utils.calculate_crater_diameter_array(energy, targets)
+    finite = np.isfinite(energy) & np.isfinite(crater)
+    if not finite.all():
+        i = int(np.argmin(finite))
+        return jsonify({'error': f'Escenario {i} inválido: la energía del impacto desborda'}), 400
+    energy_out = np.round(energy, 2).tolist()
+    crater_out = np.round(crater, 2).tolist()
+
+    results = []
+    for i, scenario in enumerate(scenarios):
+        results.append({
+            'id': scenario.get('id', i),
+            'energy_megatons': energy_out[i],
+            'crater_diameter_meters': crater_out[i],
+        })
+
+    want_analysis = options.get('analysis') or request.args.get('analysis') in ('1', 'true')
+    if want_analysis:
+        controller = admission.get_controller(current_app.config)
+        try:
+            admitted_at = controller.acquire(admission.request_priority())
+        except admission.AdmissionRejected as e:
+            return admission.rejected_response(e)
+        try:
+            _attach_batch_analyses(scenarios, results, diameters, velocities, densities, energy, crater)
+        finally:
+            controller.release(admitted_at)
+
+    if is_ndjson:
+        body = '\n'.join(json.dumps(r, ensure_ascii=False) for r in results) + '\n'
+        return Response(body, mimetype='application/x-ndjson')
+    return jsonify({'count': count, 'results': results})
+
+
+@bp.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    """Contadores de la caché de análisis de Gemini (aciertos, fallos, entradas)."""
+    return jsonify(analysis_cache.get_cache(current_app.config).stats())
+
+
+@bp.route('/gemini/stats', methods=['GET'])
+def gemini_stats():
+    """Estado del circuit breaker, llamadas en curso, latencias y tamaño de lote del cliente de Gemini."""
+    client = gemini_client.get_client(current_app.config)
+    coalescing = singleflight.get_singleflight(current_app.config).stats()
+    batching = services.get_batch_sizer(current_app.config).snapshot()
+    if client is None:
+        return jsonify({'configured': False, 'singleflight': coalescing, 'batching': batching})
+    return jsonify(dict(client.stats(), configured=True, singleflight=coalescing, batching=batching))
+
+
+_reference_impacts = None
+
+
+def _tile_scenario(args):
+    """
+    Escenario de las teselas a partir de la query: neo=<id o nombre> o
+    diameter/velocity/density, e impacts=lat,lng;lat,lng (o lat y lng). Sin
+    puntos de impacto se usan las ubicaciones de referencia (vista global).
+    Lanza ValueError/LookupError.
+    """
+    global _reference_impacts
+    if args.get('neo'):
+        snapshot = services.get_neo_catalog()
+        neo = None if isinstance(snapshot, dict) else snapshot.get_by_id(args['neo']) or snapshot.find(args['neo'])
+        if neo is None:
+            raise LookupError(f"NEO no encontrado: {args['neo']}")
+        physics = neo_scenarios.neo_physics(neo)
+        diameter, velocity, density = physics['diameter'], physics['velocity'], physics['density']
+    else:
+        diameter = float(args['diameter'])
+        velocity = float(args['velocity'])
+        density = float(args.get('density', 3000))
+
+    if args.get('impacts'):
+        impacts = [tuple(float(v) for v in point.split(',')) for point in args['impacts'].split(';') if point]
+        if any(len(point) != 2 for point in impacts):
+            raise ValueError("impacts debe tener el formato lat,lng;lat,lng")
+    elif args.get('lat') is not None and args.get('lng') is not None:
+        impacts = [(float(args['lat']), float(args['lng']))]
+    else:
+        if _reference_impacts is None:
+            _reference_impacts = [(loc['lat'], loc['lng'])
+                                  for loc in neo_scenarios.load_locations(neo_scenarios.DEFAULT_LOCATIONS_PATH)]
+        impacts = _reference_impacts
+    return tiles.Scenario(diameter, velocity, density, impacts)
+
+
+@bp.route('/tiles/<int:z>/<int:x>/<int:y>', methods=['GET'])
+@bp.route('/tiles/<int:z>/<int:x>/<int:y>.png', methods=['GET'])
+@admission.cheap_route
+def get_tile(z, x, y):
+    """
+    Tesela PNG 256x256 con las zonas de daño del escenario (ver _tile_scenario).
+    Se sirve desde el LRU o el disco si ya se calculó; la URL identifica el
+    contenido, así que el navegador puede guardarla un día.
+    """
+    if not tiles.valid_tile(z, x, y):
+        return jsonify({'error': 'Tesela fuera de rango'}), 404
+    try:
+        scenario = _tile_scenario(request.args)
+    except LookupError as e:
+        return jsonify({'error': str(e)}), 404
+    except (KeyError, ValueError, TypeError) as e:
+        return jsonify({'error': f'Parámetros de escenario inválidos: {e}'}), 400
+    payload = tiles.get_cache(current_app.config).get_tile(scenario, z, x, y)
+    response = http_cache.make_cached_response(payload, request, max_age=86400)
+    response.headers['X-Scenario-Hash'] = scenario.hash
+    return response
+
+
+@bp.route('/tiles/scenario', methods=['GET'])
+@admission.cheap_route
+def get_tile_scenario():
+    """Hash, energía y radio de cada zona del escenario (leyenda del mapa)."""
+    try:
+        scenario = _tile_scenario(request.args)
+    except LookupError as e:
+        return jsonify({'error': str(e)}), 404
+    except (KeyError, ValueError, TypeError) as e:
+        return jsonify({'error': f'Parámetros de escenario inválidos: {e}'}), 400
+    return jsonify(scenario.describe())
+
+
+@bp.route('/tiles/stats', methods=['GET'])
+def tile_stats():
+    """Aciertos de memoria y disco y teselas calculadas."""
+    return jsonify(tiles.get_cache(current_app.config).stats())
+
+
+@bp.route('/admission/stats', methods=['GET'])
+def admission_stats():
+    """Profundidad de cola, huecos ocupados y tiempos de espera del control de admisión."""
+    return jsonify(admission.get_controller(current_app.config).stats())
 
 
 @bp.route('/intensity', methods=['POST'])
+@admission.cheap_route
 def get_intensity():
     """Calcula y devuelve una 'intensidad' basada en parámetros del proyectil y ubicación.
     Espera JSON: { lat, lng, diameter, velocity, density, angle }
     Devuelve: { intensity: <n>, energy_megatons: <n>, crater_diameter_meters: <n> }
+    Se calcula con las fórmulas cerradas de utils (~1 µs por llamada): una
+    tabla precalculada con interpolación no es más rápida.
     """
     data = request.get_json() or {}
     try:
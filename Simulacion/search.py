@@ -0,0 +1,153 @@
+# app/search.py
+"""
+Índice de búsqueda de nombres de NEOs para /api/neos/search (autocompletado).
+
+Los nombres se normalizan con catalog.normalize_name, así que '433 Eros (A898 PA)',
+'433 Eros A898 PA' y '433 eros a898-pa' son la misma clave. Se indexan:
+
+- el nombre completo, su versión sin espacios y cada sufijo que empieza en una
+  palabra ('eros a898 pa', 'a898 pa', ...), para que 'eros' o 'a898' encuentren
+  '433 Eros A898 PA'. Las claves se guardan ordenadas: cada subárbol del trie
+  de prefijos es un rango contiguo que se localiza con bisect, sin un nodo por
+  carácter en memoria;
+- los trigramas del nombre, para proponer candidatos con erratas que luego se
+  ordenan por distancia de edición.
+"""
+import bisect
+import heapq
+from collections import defaultdict
+
+import numpy as np
+
+from catalog import normalize_name
+
+# Niveles de coincidencia, de mejor a peor
+EXACT, PREFIX, WORD, FUZZY = 0, 1, 2, 3
+MATCH_NAMES = ('exact', 'prefix', 'word', 'fuzzy')
+MAX_LIMIT = 50
+# Claves del rango de prefijo que se examinan como máximo por consulta
+PREFIX_SCAN = 400
+# Candidatos por trigramas que se verifican con distancia de edición
+FUZZY_CANDIDATES = 40
+
+
+def _trigrams(text):
+    padded = f'  {text} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_distance(a, b, max_distance, prefix=False):
+    """
+    Levenshtein acotado: devuelve max_distance + 1 en cuanto se supera. Con
+    prefix=True mide contra el mejor prefijo de b ('apofis' ~ 'apophis 99942').
+    """
+    if not prefix and abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if min(current) > max_distance:
+            return max_distance + 1
+        previous = current
+    return min(previous) if prefix else previous[-1]
+
+
+def _id_key(neo):
+    neo_id = neo.get('id')
+    return normalize_name(neo_id) if neo_id is not None else ''
+
+
+class SearchIndex:
+    """Se construye una vez por instantánea del catálogo (ver NeoCatalog.cached)."""
+
+    def __init__(self, neos):
+        self.neos = neos
+        self.names = [normalize_name(neo.get('name')) for neo in neos]
+        entries = set()
+        self.trigrams = defaultdict(list)
+        for index, name in enumerate(self.names):
+            if not name:
+                continue
+            words = name.split(' ')
+            entries.add((name, PREFIX, index))
+            entries.add((name.replace(' ', ''), PREFIX, index))
+            for start in range(1, len(words)):
+                entries.add((' '.join(words[start:]), WORD, index))
+            neo_id = _id_key(neos[index])
+            if neo_id:
+                entries.add((neo_id, PREFIX, index))
+            for gram in _trigrams(name):
+                self.trigrams[gram].append(index)
+        self.trigrams = {gram: np.array(indexes, dtype=np.int32) for gram, indexes in self.trigrams.items()}
+        entries = sorted(entries)
+        self.keys = [key for key, _, _ in entries]
+        self.entries = [(level, index) for _, level, index in entries]
+
+    def __len__(self):
+        return len(self.neos)
+
+    def _prefix_matches(self, query, best):
+        start = bisect.bisect_left(self.keys, query)
+        for position in range(start, min(start + PREFIX_SCAN, len(self.keys))):
+            key = self.keys[position]
+            if not key.startswith(query):
+                break
+            level, index = self.entries[position]
+            if key == query and level == PREFIX:
+                level = EXACT
+            # Entre coincidencias del mismo nivel, antes los nombres más cortos
+            rank = (level, 0, len(self.names[index]), index)
+            if rank < best.get(index, (FUZZY + 1,)):
+                best[index] = rank
+
+    def _fuzzy_matches(self, query, best):
+        grams = _trigrams(query)
+        postings = [self.trigrams[gram] for gram in grams if gram in self.trigrams]
+        if not postings:
+            return
+        counts = np.bincount(np.concatenate(postings), minlength=len(self.names))
+        max_distance = max(1, (len(query) + 2) // 4)
+        # Cada edición rompe como mucho 3 trigramas; además solo interesan los
+        # nombres que comparten casi tantos como el mejor candidato
+        threshold = max(1, len(grams) - 3 * max_distance, int(counts.max()) - 2)
+        candidates = np.flatnonzero(counts >= threshold)
+        if len(candidates) > FUZZY_CANDIDATES:
+            candidates = candidates[np.argpartition(counts[candidates], -FUZZY_CANDIDATES)[-FUZZY_CANDIDATES:]]
+        for index in candidates[np.argsort(-counts[candidates], kind='stable')].tolist():
+            if index in best:
+                continue
+            name = self.names[index]
+            # Contra el nombre completo y contra lo que empieza en cada palabra
+            # (autocompletado con erratas: 'ganymd', 'apofis'). Solo se prueban
+            # palabras cuyo inicio coincide con el de la consulta: las erratas
+            # en la primera letra son raras y así se evita casi todo el cálculo.
+            window = len(query) + max_distance
+            starts = [0] + [i + 1 for i, char in enumerate(name) if char == ' ']
+            distance = min([edit_distance(query, name, max_distance)]
+                           + [edit_distance(query, name[start:start + window], max_distance, prefix=True)
+                              for start in starts if query[0] in name[start:start + 2]])
+            if distance <= max_distance:
+                best[index] = (FUZZY, distance, len(name), index)
+
+    def search(self, query, limit=10):
+        """Lista de (neo, tipo de coincidencia, distancia) ordenada por relevancia."""
+        query = normalize_name(query)
+        if not query:
+            return []
+        limit = min(max(1, limit), MAX_LIMIT)
+        best = {}
+        self._prefix_matches(query, best)
+        if ' ' in query:
+            self._prefix_matches(query.replace(' ', ''), best)
+        exact = any(rank[0] == EXACT for rank in best.values())
+        if len(best) < limit and len(query) >= 3 and not exact:
+            self._fuzzy_matches(query, best)
+        ranked = heapq.nsmallest(limit, best.values())
+        return [(self.neos[index], MATCH_NAMES[level], distance) for level, distance, _, index in ranked]
+
+
+def get_index(snapshot):
+    """Índice de la instantánea, construido una vez por versión del catálogo."""
+    return snapshot.cached('search_index', lambda: SearchIndex(snapshot.neos))
@@ -0,0 +1,296 @@
+# app/serve.py
+"""
+Modo de producción multiproceso (pre-fork), sin el servidor de desarrollo con
+debug=True de app.py / frontend_app.py / run.py.
+
+El proceso padre parsea meteorites_data.json una sola vez, lo vuelca a una
+imagen de solo lectura (shared_catalog) y la instala como proveedor del
+catálogo; después importa la aplicación y crea el socket de escucha. Los
+workers se crean con fork, heredan el mmap de la imagen y comparten el
+socket: ninguno parsea ni copia el catálogo, así que la memoria no crece con
+el número de workers. El padre también construye antes del fork los JSON
+comprimidos de /api/neos, trajectories.bin, el índice de búsqueda y la base
+SQLite (ver Arbiter.prepare).
+
+    python serve.py --workers 4 --port 5000
+    python serve.py --app frontend_app:app --max-requests 5000
+
+Señales del proceso padre:
+    SIGTERM / SIGINT   parada ordenada (los workers terminan sus peticiones)
+    SIGHUP             regenera la imagen y reinicia los workers uno a uno
+
+Cada worker se recicla tras --max-requests peticiones (más un margen
+aleatorio para que no se reinicien todos a la vez) y el padre lo sustituye.
+Si meteorites_data.json cambia, el padre regenera la imagen y recicla los
+workers de forma escalonada.
+"""
+import argparse
+import gc
+import importlib
+import itertools
+import os
+import random
+import signal
+import socket
+import sys
+import threading
+import time
+
+from werkzeug.serving import make_server
+from werkzeug.wsgi import ClosingIterator
+
+import catalog
+import catalog_store
+import services
+import shared_catalog
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_IMAGE_PATH = os.path.join(BASE_DIR, 'catalog.img')
+
+
+def log(message):
+    print(f'[serve {os.getpid()}] {message}', file=sys.stderr, flush=True)
+
+
+class Worker:
+    """Lado hijo: sirve la aplicación hasta recibir SIGTERM o agotar max_requests."""
+
+    def __init__(self, app, listener, host, port, max_requests=0, graceful_timeout=30.0):
+        self.app = app
+        self.max_requests = max_requests
+        self.graceful_timeout = graceful_timeout
+        self._served = itertools.count(1)
+        self._active = 0
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self.server = make_server(host, port, self._wsgi, threaded=True, fd=listener.fileno())
+
+    def _finished(self):
+        with self._lock:
+            self._active -= 1
+
+    def _wsgi(self, environ, start_response):
+        with self._lock:
+            self._active += 1
+        if self.max_requests and next(self._served) >= self.max_requests:
+            self.stop('max_requests alcanzado')
+        try:
+            # ClosingIterator descuenta la petición cuando termina el cuerpo (también en SSE)
+            return ClosingIterator(self.app(environ, start_response), [self._finished])
+        except BaseException:
+            self._finished()
+            raise
+
+    def stop(self, reason):
+        if self._stopping.is_set():
+            return
+        self._stopping.set()
+        log(f'worker deja de aceptar conexiones ({reason})')
+        # shutdown() espera al bucle de serve_forever: no puede llamarse desde él
+        threading.Thread(target=self.server.shutdown, daemon=True).start()
+
+    def run(self):
+        signal.signal(signal.SIGTERM, lambda *_: self.stop('SIGTERM'))
+        signal.signal(signal.SIGINT, signal.SIG_IGN)    # Ctrl-C lo gestiona el padre
+        signal.signal(signal.SIGHUP, signal.SIG_IGN)
+        self.server.serve_forever()
+        deadline = time.monotonic() + self.graceful_timeout
+        while self._active > 0 and time.monotonic() < deadline:
+            time.sleep(0.05)
+        if self._active:
+            log(f'worker sale con {self._active} peticiones sin terminar')
+        return 0
+
+
+class Arbiter:
+    """Lado padre: imagen del catálogo, socket de escucha y ciclo de vida de los workers."""
+
+    def __init__(self, args):
+        self.args = args
+        self.source_path = args.data or catalog.get_provider().path
+        self.image_path = args.image
+        self.workers = {}           # pid -> momento de arranque
+        self.retiring = {}          # pid -> límite para salir antes del SIGKILL
+        self._stop = False
+        self._reload = False
+        self._stamp = None
+        self.app = None
+        self.listener = None
+
+    def _source_stamp(self):
+        try:
+            st = os.stat(self.source_path)
+            return (st.st_mtime_ns, st.st_size)
+        except OSError:
+            return None
+
+    def load_catalog(self):
+        stamp = self._source_stamp()
+        version = shared_catalog.build_image_from_file(self.source_path, self.image_path)
+        catalog.install_provider(shared_catalog.SharedCatalogProvider(self.image_path, self.source_path))
+        self._stamp = stamp
+        log(f'imagen del catálogo {self.image_path} (versión {version}, '
+            f'{os.path.getsize(self.image_path)} bytes)')
+
+    def start(self):
+        self.load_catalog()
+        module_name, _, attribute = self.args.app.partition(':')
+        self.app = getattr(importlib.import_module(module_name), attribute or 'app')
+        self.listener = socket.create_server((self.args.host, self.args.port), backlog=self.args.backlog)
+        log(f'escuchando en http://{self.args.host}:{self.args.port} con {self.args.workers} workers')
+
+        signal.signal(signal.SIGTERM, self._on_stop)
+        signal.signal(signal.SIGINT, self._on_stop)
+        signal.signal(signal.SIGHUP, self._on_reload)
+        self.prepare()
+        for _ in range(self.args.workers):
+            self.spawn()
+
+    def prepare(self):
+        """
+        Construye en el padre lo que heredan los workers: los derivados grandes
+        de la instantánea (JSON comprimidos, trajectories.bin, índice de
+        búsqueda) y la base SQLite de /api/neos. Así ningún worker hace su
+        propia copia ni reconstruye la base a partir del catálogo completo.
+        """
+        snapshot = catalog.get_provider().get()
+        try:
+            services.warm_catalog(snapshot, self.app.config)
+            catalog_store.get_store(self.app.config).ensure(snapshot)
+        except ImportError as e:
+            log(f'derivados del catálogo sin precalcular: {e}')
+        # Lo cargado hasta aquí no lo toca el recolector en los hijos: menos copy-on-write
+        gc.collect()
+        gc.freeze()
+
+    def _on_stop(self, *_):
+        self._stop = True
+
+    def _on_reload(self, *_):
+        self._reload = True
+
+    def spawn(self):
+        max_requests = self.args.max_requests
+        if max_requests:
+            max_requests += random.randint(0, self.args.max_requests_jitter)
+        pid = os.fork()
+        if pid == 0:
+            code = 1
+            try:
+                random.seed()
+                worker = Worker(self.app, self.listener, self.args.host, self.args.port,
+                                max_requests, self.args.graceful_timeout)
+                code = worker.run()
+            except Exception as e:
+                log(f'worker terminado por error: {type(e).__name__}: {e}')
+            finally:
+                os._exit(code)
+        self.workers[pid] = time.monotonic()
+        log(f'worker {pid} arrancado')
+        return pid
+
+    def retire(self, pid):
+        """Pide a un worker que termine sus peticiones y salga."""
+        self.workers.pop(pid, None)
+        self.retiring[pid] = time.monotonic() + self.args.graceful_timeout
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            self.retiring.pop(pid, None)
+
+    def rolling_restart(self, reason):
+        log(f'reinicio escalonado de los workers ({reason})')
+        for pid in list(self.workers):
+            # El sustituto arranca antes de retirar al anterior: nunca falta capacidad
+            self.spawn()
+            self.retire(pid)
+
+    def reap(self):
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            was_active = self.workers.pop(pid, None) is not None
+            self.retiring.pop(pid, None)
+            if was_active:
+                log(f'worker {pid} terminó (estado {os.waitstatus_to_exitcode(status)})')
+
+    def kill_overdue(self):
+        now = time.monotonic()
+        for pid, deadline in list(self.retiring.items()):
+            if now > deadline:
+                log(f'worker {pid} no terminó a tiempo: SIGKILL')
+                try:
+                    os.kill(pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+                self.retiring.pop(pid, None)
+
+    def run(self):
+        self.start()
+        last_poll = time.monotonic()
+        while not self._stop:
+            time.sleep(0.2)
+            self.reap()
+            self.kill_overdue()
+            if self._stop:
+                break
+            if self._reload:
+                self._reload = False
+                self._reload_catalog('SIGHUP')
+            elif self.args.poll and time.monotonic() - last_poll >= self.args.poll:
+                last_poll = time.monotonic()
+                if self._source_stamp() not in (None, self._stamp):
+                    self._reload_catalog(f'{self.source_path} cambió')
+            while len(self.workers) < self.args.workers and not self._stop:
+                self.spawn()
+        self.shutdown()
+        return 0
+
+    def _reload_catalog(self, reason):
+        try:
+            self.load_catalog()
+        except (OSError, ValueError) as e:
+            # Archivo a medio escribir o inválido: los workers siguen con la imagen anterior
+            log(f'no se pudo regenerar la imagen: {e}')
+            return
+        self.prepare()
+        self.rolling_restart(reason)
+
+    def shutdown(self):
+        log('parada ordenada')
+        for pid in list(self.workers):
+            self.retire(pid)
+        while self.retiring:
+            self.reap()
+            self.kill_overdue()
+            time.sleep(0.1)
+        self.listener.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Servidor multiproceso (pre-fork) con catálogo compartido.')
+    parser.add_argument('--app', default='app:app', help='módulo:atributo de la aplicación Flask')
+    parser.add_argument('--host', default=os.getenv('HOST', '0.0.0.0'))
+    parser.add_argument('--port', type=int, default=int(os.getenv('PORT', '5000')))
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='procesos worker')
+    parser.add_argument('--data', default=None, help='meteorites_data.json (por defecto METEORITES_DATA_PATH)')
+    parser.add_argument('--image', default=DEFAULT_IMAGE_PATH, help='imagen compartida del catálogo')
+    parser.add_argument('--max-requests', type=int, default=0, help='reciclar cada worker tras N peticiones (0 = nunca)')
+    parser.add_argument('--max-requests-jitter', type=int, default=0, help='margen aleatorio sobre --max-requests')
+    parser.add_argument('--graceful-timeout', type=float, default=30.0, help='segundos para terminar peticiones en curso')
+    parser.add_argument('--poll', type=float, default=float(os.getenv('CATALOG_POLL_SECONDS', '2')),
+                        help='segundos entre comprobaciones del JSON (0 = solo con SIGHUP)')
+    parser.add_argument('--backlog', type=int, default=2048)
+    args = parser.parse_args(argv)
+    if not hasattr(os, 'fork'):
+        parser.error('serve.py necesita os.fork (Linux o macOS); en Windows usa app.py')
+    args.workers = max(1, args.workers)
+    return Arbiter(args).run()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
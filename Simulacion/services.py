@@ -1,18 +1,27 @@
 # app/services.py (Versión con JSON local, sin NASA)
 
+import copy
 import json # <-- Importamos la librería para manejar JSON
-import google.generativeai as genai
+import threading
 from flask import current_app
+import catalog
+import http_cache
+import ingestion
+import analysis_cache
+import gemini_client
+import search
+import singleflight
+from settings import get_setting
 
-def get_nasa_neos():
+def get_neo_catalog():
     """
-    Obtiene los datos de los meteoritos desde el archivo local meteorites_data.json.
+    Devuelve la instantánea vigente del catálogo (catalog.NeoCatalog) o un dict
+    con 'error' si meteorites_data.json no se puede cargar.
+    El archivo se parsea una sola vez y se recarga en segundo plano cuando cambia
+    (ver catalog.CatalogProvider), así que aquí no hay lectura por petición.
     """
     try:
-        # 'with open(...)' abre, lee y cierra el archivo de forma segura.
-        with open('meteorites_data.json', 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        return data
+        return catalog.get_catalog()
     except FileNotFoundError:
         print("ERROR: El archivo 'meteorites_data.json' no se encontró en la carpeta principal.")
         return {"error": "El archivo de datos de meteoritos no fue encontrado."}
@@ -20,22 +29,183 @@ def get_nasa_neos():
         print("ERROR: El archivo 'meteorites_data.json' tiene un formato JSON inválido.")
         return {"error": "Error al leer el archivo de datos de meteoritos."}
 
+def get_nasa_neos():
+    """
+    Obtiene los datos de los meteoritos desde el archivo local meteorites_data.json.
+    """
+    snapshot = get_neo_catalog()
+    if isinstance(snapshot, dict):
+        return snapshot
+    return snapshot.data
+
+def get_nasa_neos_payload(include_trajectories=False):
+    """
+    Igual que get_nasa_neos() pero devuelve un http_cache.CachedPayload con el
+    JSON ya serializado (y sus variantes comprimidas) para la versión vigente.
+    Por defecto sin 'trajectory': se piden aparte a /api/neos/<id>/trajectory.
+    """
+    snapshot = get_neo_catalog()
+    if isinstance(snapshot, dict):
+        return snapshot
+    return _neos_payload(snapshot, include_trajectories)
+
+def _neos_payload(snapshot, include_trajectories):
+    if include_trajectories:
+        return snapshot.cached('neos.full.json', lambda: http_cache.CachedPayload.from_json(
+            snapshot.data, last_modified=snapshot.metadata.get('last_updated')))
+
+    def build():
+        data = dict(snapshot.data)
+        data['neos'] = [{k: v for k, v in neo.items() if k != 'trajectory'} for neo in snapshot.neos]
+        return http_cache.CachedPayload.from_json(data, last_modified=snapshot.metadata.get('last_updated'))
+    return snapshot.cached('neos.json', build)
+
+def get_neo_trajectories_payload():
+    """
+    Catálogo en el formato binario de fetch_meteorites (posiciones y trayectorias
+    en float32 con tabla de offsets y cabecera JSON), codificado una vez por versión.
+    """
+    snapshot = get_neo_catalog()
+    if isinstance(snapshot, dict):
+        return snapshot
+    return _trajectories_payload(snapshot, current_app.config)
+
+def _trajectories_payload(snapshot, config):
+    encode = ingestion.get_fetch_module(config).encode_binary_catalog
+    return snapshot.cached('trajectories.bin', lambda: http_cache.CachedPayload(
+        encode(snapshot.data), 'application/octet-stream',
+        last_modified=snapshot.metadata.get('last_updated')))
+
+def warm_catalog(snapshot, config=None):
+    """
+    Construye ya los derivados grandes de la instantánea (JSON de /api/neos con
+    y sin trayectorias, trajectories.bin e índice de búsqueda). serve.py lo
+    llama en el proceso padre antes del fork, así que los workers heredan estos
+    objetos en lugar de construir cada uno su copia. Lanza ImportError si no
+    se puede cargar fetch_meteorites (el binario queda para la primera petición).
+    """
+    _neos_payload(snapshot, False)
+    _neos_payload(snapshot, True)
+    search.get_index(snapshot)
+    _trajectories_payload(snapshot, config)
+
 def get_gemini_analysis(meteorite_data, location):
     """
     Genera un análisis del impacto ambiental usando la API de Gemini.
-    (Esta función no cambia)
+    Los resultados válidos se guardan en analysis_cache (memoria + SQLite), así
+    que un escenario repetido (o casi idéntico) no vuelve a llamar a Gemini.
+    Las peticiones simultáneas con la misma clave comparten una sola llamada
+    (singleflight), también entre workers si hay GEMINI_SINGLEFLIGHT_LOCK_DIR.
     """
-    # Use .get to avoid raising KeyError if the config key isn't present
-    api_key = current_app.config.get('GEMINI_API_KEY')
-    if not api_key:
-        return {'error': 'Gemini API key not configured. Please set GEMINI_API_KEY in the environment or .env'}
+    # Modelo (y backend) de app config: forma parte de la clave de caché
+    model_name = analysis_cache.model_key(current_app.config)
+    cache = analysis_cache.get_cache(current_app.config)
+    key = cache.key(meteorite_data, location, model_name)
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+
+    def compute():
+        analysis = _generate_gemini_analysis(meteorite_data, location, model_name)
+        # Los errores no se cachean para que el siguiente intento vuelva a llamar a Gemini
+        if isinstance(analysis, dict) and 'error' not in analysis:
+            cache.set(key, analysis)
+        return analysis
+
+    return singleflight.get_singleflight(current_app.config).do(key, compute, recheck=lambda: cache.get(key, count=False))
+
+def get_cached_gemini_analysis(meteorite_data, location):
+    """Devuelve el análisis cacheado del escenario o None, sin llamar nunca a Gemini."""
+    model_name = analysis_cache.model_key(current_app.config)
+    cache = analysis_cache.get_cache(current_app.config)
+    return cache.get(cache.key(meteorite_data, location, model_name))
+
+def get_gemini_analyses(items, before_call=None):
+    """
+    Versión por lotes de get_gemini_analysis para estudios paramétricos y
+    precalentamiento. items es una lista de (meteorite_data, location); devuelve
+    los análisis en el mismo orden. Los escenarios que no están en caché se
+    empaquetan en prompts de varios escenarios (ver _generate_batched) y los que
+    fallen dentro de un lote se reintentan uno a uno con el prompt normal.
+    before_call() se invoca antes de cada llamada al modelo (p. ej. un limitador
+    de ritmo), sea de un lote o de un escenario suelto.
+    """
+    model_name = analysis_cache.model_key(current_app.config)
+    cache = analysis_cache.get_cache(current_app.config)
+    keys = [cache.key(meteorite_data, location, model_name) for meteorite_data, location in items]
+    results = [None] * len(items)
+    pending = {}
+    for i, (key, item) in enumerate(zip(keys, items)):
+        cached = cache.get(key)
+        if cached is not None:
+            results[i] = cached
+        else:
+            pending.setdefault(key, item)    # escenarios repetidos se piden una sola vez
+
+    if pending:
+        client = _get_client()
+        if isinstance(client, dict):
+            generated = {key: client for key in pending}
+        else:
+            generated = _generate_batched(client, pending, model_name, before_call)
+        for key, analysis in generated.items():
+            if 'error' not in analysis:
+                cache.set(key, analysis)
+        for i, key in enumerate(keys):
+            if results[i] is None:
+                results[i] = copy.deepcopy(generated[key])
+    return results
+
+class BatchSizer:
+    """
+    Tamaño de lote adaptativo. Estima los caracteres de respuesta por escenario
+    (media móvil) para no pasar de max_output_chars, y reduce el tope a la mitad
+    cuando una respuesta llega cortada o ilegible; tras cada lote correcto el
+    tope vuelve a crecer de uno en uno hasta max_size.
+    """
+
+    def __init__(self, max_size=8, max_output_chars=30000, initial_chars_per_scenario=1200):
+        self.max_size = max(1, max_size)
+        self.max_output_chars = max_output_chars
+        self.chars_per_scenario = float(initial_chars_per_scenario)
+        self.cap = self.max_size
+        self._lock = threading.Lock()
+
+    def next_size(self):
+        with self._lock:
+            # Margen del 20 % sobre la estimación para no rozar el límite
+            fits = int(self.max_output_chars * 0.8 / max(self.chars_per_scenario, 1.0))
+            return max(1, min(self.cap, fits))
 
-    genai.configure(api_key=api_key)
-    # Permite configurar el nombre del modelo desde app config
-    model_name = current_app.config.get('GEMINI_MODEL', 'gemini-2.5-pro')
-    model = genai.GenerativeModel(model_name)
+    def observe(self, scenarios, chars):
+        with self._lock:
+            self.chars_per_scenario = 0.7 * self.chars_per_scenario + 0.3 * (chars / scenarios)
+            self.cap = min(self.max_size, self.cap + 1)
 
-    prompt = f"""
+    def shrink(self, size):
+        with self._lock:
+            self.cap = max(1, size // 2)
+
+    def snapshot(self):
+        with self._lock:
+            return {'cap': self.cap, 'max_size': self.max_size,
+                    'chars_per_scenario': round(self.chars_per_scenario), 'max_output_chars': self.max_output_chars}
+
+_batch_sizer = None
+_batch_sizer_lock = threading.Lock()
+
+def get_batch_sizer(config=None):
+    """BatchSizer del proceso: GEMINI_BATCH_SIZE y GEMINI_BATCH_MAX_OUTPUT_CHARS."""
+    global _batch_sizer
+    if _batch_sizer is None:
+        with _batch_sizer_lock:
+            if _batch_sizer is None:
+                _batch_sizer = BatchSizer(get_setting(config, 'GEMINI_BATCH_SIZE', 8, int),
+                                          get_setting(config, 'GEMINI_BATCH_MAX_OUTPUT_CHARS', 30000, int))
+    return _batch_sizer
+
+def _build_prompt(meteorite_data, location):
+    return f"""
     Eres un experto en astrofísica y comunicación de riesgos. Analiza el impacto de un meteorito de forma CONCISA.
 
     Datos del Impacto:
@@ -49,35 +219,211 @@ def get_gemini_analysis(meteorite_data, location):
     3.  **No uses listas, asteriscos ni lenguaje demasiado técnico.** Sé directo y claro.
     """
 
+def _parse_gemini_text(raw):
+    """Convierte el texto de Gemini en dict: JSON directo, primer objeto JSON o {'text': ...}."""
+    if not raw:
+        return {'error': 'No se obtuvo respuesta de Gemini.'}
+
+    text = raw.strip()
+    # Intentar parsear JSON directo
+    try:
+        parsed = json.loads(text)
+        return parsed
+    except Exception:
+        # Intentar extraer primer objeto JSON en el texto
+        start = text.find('{')
+        end = text.rfind('}')
+        if start != -1 and end != -1 and end > start:
+            try:
+                snippet = text[start:end+1]
+                parsed = json.loads(snippet)
+                return parsed
+            except Exception:
+                pass
+
+    # Si no se pudo parsear, devolver el texto crudo en campo 'text'
+    return {'text': text}
+
+def _get_client():
+    """Cliente compartido (gemini_client), o un dict con 'error' si falta la clave."""
+    client = gemini_client.get_client(current_app.config)
+    if client is None:
+        return {'error': 'Gemini API key not configured. Please set GEMINI_API_KEY in the environment or .env'}
+    return client
+
+def _degraded(error):
+    # Respuesta rápida cuando el circuito está abierto o no hay hueco: no se cachea
+    return {'error': f"Análisis no disponible temporalmente: {error}", 'degraded': True}
+
+def _generate_gemini_analysis(meteorite_data, location, model_name, before_call=None):
+    """Llamada real a Gemini (sin caché)."""
+    client = _get_client()
+    if isinstance(client, dict):
+        return client
+
     try:
-        response = model.generate_content(prompt)
+        if before_call is not None:
+            before_call()
+        response = client.generate(_build_prompt(meteorite_data, location))
         raw = None
         if hasattr(response, 'text') and response.text:
             raw = response.text
         elif hasattr(response, 'candidates') and response.candidates:
             raw = response.candidates[0].content
+        return _parse_gemini_text(raw)
+    except (gemini_client.GeminiUnavailable, gemini_client.GeminiTimeout) as e:
+        return _degraded(e)
+    except Exception as e:
+        return {'error': f"Error generando el análisis de Gemini: {e}"}
+
+def _build_batch_prompt(batch):
+    scenarios = [{
+        'id': scenario_id,
+        'diametro_m': round(meteorite_data['diameter'], 2),
+        'energia_mt': round(meteorite_data['energy'], 2),
+        'lat': location['lat'],
+        'lng': location['lng'],
+    } for scenario_id, (meteorite_data, location) in batch]
+    return f"""
+    Eres un experto en astrofísica y comunicación de riesgos. Analiza de forma CONCISA cada uno de los impactos de meteorito listados abajo.
+
+    Para CADA escenario escribe:
+    1.  **Descripción de la Zona:** En UNA SOLA FRASE, el tipo de área en la ubicación.
+    2.  **Análisis de Daños:** En un PÁRRAFO CORTO (máximo 4 o 5 líneas), los efectos inmediatos más devastadores.
+    3.  **No uses listas, asteriscos ni lenguaje demasiado técnico.**
+
+    Responde ÚNICAMENTE con un arreglo JSON, un objeto por escenario: [{{"id": "<id del escenario>", "text": "<zona y análisis>"}}]
 
-        if not raw:
-            return {'error': 'No se obtuvo respuesta de Gemini.'}
+    {gemini_client.BATCH_MARKER}
+    {json.dumps(scenarios, ensure_ascii=False)}
+    """
+
+def _parse_batch_text(raw, ids):
+    """
+    Extrae {id: análisis} de la respuesta por lotes (arreglo de {"id", "text"}
+    o un objeto {id: texto}). Devuelve None si no es JSON válido, p. ej. porque
+    la respuesta llegó cortada.
+    """
+    if not raw:
+        return None
+    text = raw.strip()
+    start = min([i for i in (text.find('['), text.find('{')) if i != -1], default=-1)
+    end = max(text.rfind(']'), text.rfind('}'))
+    if start == -1 or end <= start:
+        return None
+    try:
+        parsed = json.loads(text[start:end + 1])
+    except ValueError:
+        return None
+    if isinstance(parsed, dict):
+        parsed = [{'id': key, 'text': value} for key, value in parsed.items()]
+    if not isinstance(parsed, list):
+        return None
+    analyses = {}
+    for item in parsed:
+        if not isinstance(item, dict) or str(item.get('id')) not in ids:
+            continue
+        value = item.get('text')
+        if isinstance(value, dict):
+            analyses[str(item['id'])] = value
+        elif value:
+            analyses[str(item['id'])] = {'text': str(value).strip()}
+    return analyses
 
-        text = raw.strip()
-        # Intentar parsear JSON directo
+def _generate_batched(client, pending, model_name, before_call=None):
+    """
+    Genera los análisis de pending ({clave: (meteorite_data, location)}) en
+    lotes de tamaño adaptativo. Un lote cuya respuesta no se puede leer se
+    parte en dos y se reintenta; los escenarios sueltos (lotes de uno, o los
+    que falten en una respuesta válida) usan el prompt individual.
+    """
+    sizer = get_batch_sizer(current_app.config)
+    queue = list(pending.items())
+    results = {}
+    retry = []
+    while queue:
+        size = sizer.next_size()
+        batch, queue = queue[:size], queue[size:]
+        if len(batch) == 1:
+            retry.append(batch[0][0])
+            continue
+        ids = {f's{i}': key for i, (key, _) in enumerate(batch)}
         try:
-            parsed = json.loads(text)
-            return parsed
+            if before_call is not None:
+                before_call()
+            # Un lote grande tarda más: el plazo crece con el número de escenarios
+            response = client.generate(_build_batch_prompt([(sid, pending[key]) for sid, key in ids.items()]),
+                                       timeout=client.timeout * (1 + 0.25 * (len(batch) - 1)))
+            raw = getattr(response, 'text', None)
+        except gemini_client.GeminiUnavailable as e:
+            # Circuito abierto o sin hueco: no tiene sentido seguir llamando
+            for key in [key for key, _ in batch + queue] + retry:
+                results[key] = _degraded(e)
+            break
+        except gemini_client.GeminiTimeout:
+            sizer.shrink(len(batch))
+            queue = batch + queue
+            continue
         except Exception:
-            # Intentar extraer primer objeto JSON en el texto
-            start = text.find('{')
-            end = text.rfind('}')
-            if start != -1 and end != -1 and end > start:
-                try:
-                    snippet = text[start:end+1]
-                    parsed = json.loads(snippet)
-                    return parsed
-                except Exception:
-                    pass
-
-        # Si no se pudo parsear, devolver el texto crudo en campo 'text'
-        return {'text': text}
+            retry.extend(key for key, _ in batch)
+            continue
+
+        parsed = _parse_batch_text(raw, ids)
+        if parsed is None:
+            sizer.shrink(len(batch))
+            queue = batch + queue
+            continue
+        sizer.observe(len(batch), len(raw))
+        for sid, key in ids.items():
+            if sid in parsed:
+                results[key] = parsed[sid]
+            else:
+                retry.append(key)
+
+    for key in retry:
+        if key not in results:
+            results[key] = _generate_gemini_analysis(*pending[key], model_name, before_call)
+    return results
+
+def stream_gemini_analysis(meteorite_data, location):
+    """
+    Versión en streaming de get_gemini_analysis. Genera tuplas (evento, dato):
+    ('chunk', texto) por cada fragmento que envía Gemini y un ('done', dict)
+    final con el análisis normalizado, que también se guarda en caché.
+    """
+    model_name = analysis_cache.model_key(current_app.config)
+    cache = analysis_cache.get_cache(current_app.config)
+    key = cache.key(meteorite_data, location, model_name)
+    cached = cache.get(key)
+    if cached is not None:
+        yield 'done', cached
+        return
+
+    client = _get_client()
+    if isinstance(client, dict):
+        yield 'done', client
+        return
+
+    parts = []
+    try:
+        for chunk in client.stream(_build_prompt(meteorite_data, location)):
+            try:
+                text = chunk.text
+            except (AttributeError, ValueError):
+                # El SDK lanza ValueError en fragmentos vacíos o bloqueados por seguridad
+                continue
+            if text:
+                parts.append(text)
+                yield 'chunk', text
+    except (gemini_client.GeminiUnavailable, gemini_client.GeminiTimeout) as e:
+        yield 'done', _degraded(e)
+        return
     except Exception as e:
-        return {'error': f"Error generando el análisis de Gemini: {e}"}
\ No newline at end of file
+        yield 'done', {'error': f"Error generando el análisis de Gemini: {e}"}
+        return
+
+    # La extracción de JSON se hace una sola vez, con el texto completo
+    analysis = _parse_gemini_text(''.join(parts))
+    if isinstance(analysis, dict) and 'error' not in analysis:
+        cache.set(key, analysis)
+    yield 'done', analysis
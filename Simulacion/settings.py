@@ -0,0 +1,18 @@
+# app/settings.py
+"""Lectura de parámetros: primero app.config, luego variables de entorno."""
+import os
+
+
+def get_setting(config, name, default=None, cast=None):
+    """
+    Devuelve config[name] si está definido, si no os.environ[name], si no default.
+    cast (p. ej. int, float) se aplica al valor encontrado.
+    """
+    value = None
+    if config is not None:
+        value = config.get(name)
+    if value is None:
+        value = os.getenv(name)
+    if value is None:
+        return default
+    return cast(value) if cast is not None else value
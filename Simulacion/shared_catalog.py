@@ -0,0 +1,247 @@
+# app/shared_catalog.py
+"""
+Catálogo compartido entre procesos para el modo multiproceso (serve.py).
+
+El proceso padre parsea meteorites_data.json una sola vez y lo vuelca a una
+imagen binaria de solo lectura; los workers la abren con mmap, de modo que
+todas sus páginas las comparte el page cache del sistema, y decodifican cada
+NEO solo cuando se pide. Ningún worker guarda una copia parseada del catálogo:
+la memoria no crece con el número de workers.
+
+Formato (little-endian, secciones alineadas a 8 bytes):
+
+    b'NEOS', uint32 versión del formato, uint64 bytes de la cabecera
+    cabecera JSON: version, metadata, count y sections {nombre: {offset, count, dtype}}
+    records / record_offsets     cada NEO en JSON compacto, por posición
+    names / name_offsets         nombres (JSON) en orden de catálogo
+    <índice>_keys / _key_offsets / _targets
+                                 by_name, by_id y by_key: claves ordenadas (UTF-8)
+                                 y posición del NEO, para búsqueda binaria
+    ranked_<alias>               posiciones ordenadas de catalog.RANKED_KEYS
+"""
+import json
+import mmap
+import os
+import struct
+import tempfile
+import threading
+
+import numpy as np
+
+from catalog import NeoCatalog, normalize_name
+
+MAGIC = b'NEOS'
+FORMAT_VERSION = 1
+PREFIX = struct.Struct('<4sIQ')
+ALIGN = 8
+LOOKUP_TABLES = ('by_name', 'by_id', 'by_key')
+
+
+def _blob(items):
+    """Concatena bytes y devuelve (blob, offsets uint64 de longitud n + 1)."""
+    offsets = np.zeros(len(items) + 1, dtype='<u8')
+    if items:
+        offsets[1:] = np.cumsum([len(item) for item in items])
+    return np.frombuffer(b''.join(items), dtype=np.uint8), offsets
+
+
+def _dumps(value):
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def build_image(data, path, version=None):
+    """
+    Escribe la imagen de `data` (documento meteorites_data.json ya parseado) en
+    `path` de forma atómica. Los índices y rankings se calculan con NeoCatalog,
+    así que las consultas devuelven exactamente lo mismo que en un solo proceso.
+    """
+    snapshot = NeoCatalog(data, version)
+    position = {id(neo): i for i, neo in enumerate(snapshot.neos)}
+    arrays = {}
+    arrays['records'], arrays['record_offsets'] = _blob([_dumps(neo) for neo in snapshot.neos])
+    arrays['names'], arrays['name_offsets'] = _blob([_dumps(name) for name in snapshot.names])
+    for table in LOOKUP_TABLES:
+        items = sorted((str(key).encode('utf-8'), position[id(neo)])
+                       for key, neo in getattr(snapshot, table).items() if key is not None)
+        arrays[f'{table}_keys'], arrays[f'{table}_key_offsets'] = _blob([key for key, _ in items])
+        arrays[f'{table}_targets'] = np.array([target for _, target in items], dtype='<u4')
+    for alias, ranked in snapshot.ranked.items():
+        arrays[f'ranked_{alias}'] = np.array([position[id(neo)] for neo in ranked], dtype='<u4')
+
+    sections, chunks, offset = {}, [], 0
+    for name, array in arrays.items():
+        raw = array.tobytes()
+        sections[name] = {'offset': offset, 'count': len(array), 'dtype': array.dtype.str}
+        padding = -len(raw) % ALIGN
+        chunks.append(raw + b'\0' * padding)
+        offset += len(raw) + padding
+    header = _dumps({'version': version, 'metadata': snapshot.metadata,
+                     'count': len(snapshot.neos), 'sections': sections})
+    header += b' ' * (-(PREFIX.size + len(header)) % ALIGN)
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix='.' + os.path.basename(path) + '.', suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(PREFIX.pack(MAGIC, FORMAT_VERSION, len(header)))
+            f.write(header)
+            for chunk in chunks:
+                f.write(chunk)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return PREFIX.size + len(header) + offset
+
+
+def build_image_from_file(source_path, path):
+    """Parsea el JSON y escribe su imagen; la versión es la misma que usa CatalogProvider."""
+    st = os.stat(source_path)
+    with open(source_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    version = '%x-%x' % (st.st_mtime_ns, st.st_size)
+    build_image(data, path, version)
+    return version
+
+
+class _Records:
+    """Secuencia de solo lectura que decodifica cada elemento al accederlo."""
+
+    def __init__(self, buffer, start, offsets):
+        self._buffer = buffer
+        self._start = start
+        self._offsets = offsets
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def _decode(self, i):
+        return json.loads(self._buffer[self._start + int(self._offsets[i]):self._start + int(self._offsets[i + 1])])
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self._decode(j) for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return self._decode(i)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self._decode(i)
+
+
+class _Ranked:
+    """Vista de un ranking: posiciones en el mmap, NEOs decodificados al acceder."""
+
+    def __init__(self, records, positions):
+        self._records = records
+        self._positions = positions
+
+    def __len__(self):
+        return len(self._positions)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self._records[int(p)] for p in self._positions[i]]
+        return self._records[int(self._positions[i])]
+
+
+class SharedCatalog:
+    """
+    Misma interfaz de consulta que NeoCatalog (find, get_by_id, top_k, cached,
+    neos, names, metadata, data, version) sobre una imagen mapeada en memoria.
+    Cada consulta devuelve dicts nuevos, decodificados del mmap.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, format_version, header_bytes = PREFIX.unpack_from(self._mm, 0)
+        if magic != MAGIC or format_version != FORMAT_VERSION:
+            raise ValueError(f'{path} no es una imagen de catálogo v{FORMAT_VERSION}')
+        header = json.loads(self._mm[PREFIX.size:PREFIX.size + header_bytes])
+        body = PREFIX.size + header_bytes
+        self._starts = {name: body + info['offset'] for name, info in header['sections'].items()}
+        self._sections = {
+            name: np.frombuffer(self._mm, dtype=info['dtype'], count=info['count'], offset=self._starts[name])
+            for name, info in header['sections'].items()
+        }
+        self.version = header['version']
+        self.metadata = header['metadata']
+        self.neos = _Records(self._mm, self._starts['records'], self._sections['record_offsets'])
+        self._names = _Records(self._mm, self._starts['names'], self._sections['name_offsets'])
+        self.ranked = {name[len('ranked_'):]: _Ranked(self.neos, positions)
+                       for name, positions in self._sections.items() if name.startswith('ranked_')}
+        self._derived = {}
+        self._derived_lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.neos)
+
+    @property
+    def names(self):
+        return list(self._names)
+
+    @property
+    def data(self):
+        """Documento completo; se materializa en cada llamada (no se retiene)."""
+        return {'metadata': self.metadata, 'neos': list(self.neos)}
+
+    def _lookup(self, table, key):
+        start = self._starts[f'{table}_keys']
+        offsets = self._sections[f'{table}_key_offsets']
+        target = str(key).encode('utf-8')
+
+        def key_at(i):
+            return self._mm[start + int(offsets[i]):start + int(offsets[i + 1])]
+
+        low, high = 0, len(offsets) - 1
+        while low < high:
+            middle = (low + high) // 2
+            if key_at(middle) < target:
+                low = middle + 1
+            else:
+                high = middle
+        if low < len(offsets) - 1 and key_at(low) == target:
+            return self.neos[int(self._sections[f'{table}_targets'][low])]
+        return None
+
+    def find(self, name):
+        """Igual que NeoCatalog.find: nombre exacto, id o nombre normalizado."""
+        if name is None:
+            return None
+        neo = self._lookup('by_name', name)
+        if neo is None:
+            neo = self._lookup('by_id', name)
+        if neo is None:
+            neo = self._lookup('by_key', normalize_name(name))
+        return neo
+
+    def get_by_id(self, neo_id):
+        return self._lookup('by_id', neo_id)
+
+    top_k = NeoCatalog.top_k
+    cached = NeoCatalog.cached
+
+
+class SharedCatalogProvider:
+    """
+    Sustituto de catalog.CatalogProvider en los workers de serve.py. No vigila
+    el archivo: cuando el JSON cambia, el proceso padre genera otra imagen y
+    recicla los workers.
+    """
+
+    def __init__(self, image_path, source_path):
+        self.path = source_path
+        self.image_path = image_path
+        self._catalog = SharedCatalog(image_path)
+
+    def get(self):
+        return self._catalog
+
+    def refresh(self):
+        return False
@@ -0,0 +1,126 @@
+# app/singleflight.py
+"""
+Coalescencia de peticiones idénticas: mientras una llamada con cierta clave está
+en curso, las demás con la misma clave esperan y reciben su resultado.
+Opcionalmente se coordina entre workers con un archivo de bloqueo por clave.
+"""
+import copy
+import hashlib
+import os
+import threading
+from contextlib import contextmanager
+
+from settings import get_setting
+
+try:
+    import fcntl  # Solo POSIX; en Windows la coalescencia queda dentro del proceso
+except ImportError:
+    fcntl = None
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    do(key, fn, recheck) ejecuta fn una sola vez por clave en vuelo. Todos los
+    llamadores, también el líder, reciben una copia del resultado para que
+    ninguno modifique el de los demás.
+    Con lock_dir, el líder toma además un flock sobre <lock_dir>/<hash>.lock;
+    al obtenerlo llama a recheck() (p. ej. leer la caché compartida) por si
+    otro worker ya calculó el valor mientras esperaba.
+    """
+
+    def __init__(self, lock_dir=None):
+        self.lock_dir = lock_dir if fcntl is not None else None
+        if self.lock_dir:
+            os.makedirs(self.lock_dir, exist_ok=True)
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.counters = {'leaders': 0, 'followers': 0, 'cross_process_hits': 0}
+
+    @contextmanager
+    def _file_lock(self, key):
+        path = os.path.join(self.lock_dir, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.lock')
+        while True:
+            f = open(path, 'a+')
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                # Si otro worker borró el archivo mientras esperábamos, el bloqueo
+                # es sobre un inodo huérfano: se vuelve a abrir la ruta actual
+                if os.fstat(f.fileno()).st_ino == os.stat(path).st_ino:
+                    break
+            except FileNotFoundError:
+                pass
+            f.close()
+        try:
+            yield
+        finally:
+            # Se borra antes de soltarlo para no dejar un archivo por clave
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            f.close()
+
+    def do(self, key, fn, recheck=None):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+            self.counters['leaders' if leader else 'followers'] += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return copy.deepcopy(call.result)
+
+        try:
+            if self.lock_dir:
+                with self._file_lock(key):
+                    value = recheck() if recheck is not None else None
+                    if value is not None:
+                        with self._lock:
+                            self.counters['cross_process_hits'] += 1
+                        call.result = value
+                    else:
+                        call.result = fn()
+            else:
+                call.result = fn()
+            return copy.deepcopy(call.result)
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+            stats['in_flight'] = len(self._calls)
+        stats['cross_process'] = bool(self.lock_dir)
+        return stats
+
+
+_flight = None
+_flight_lock = threading.Lock()
+
+
+def get_singleflight(config=None):
+    """Instancia del proceso; GEMINI_SINGLEFLIGHT_LOCK_DIR activa la coordinación entre workers."""
+    global _flight
+    if _flight is None:
+        with _flight_lock:
+            if _flight is None:
+                _flight = SingleFlight(get_setting(config, 'GEMINI_SINGLEFLIGHT_LOCK_DIR'))
+    return _flight
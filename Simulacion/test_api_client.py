@@ -3,7 +3,7 @@ import json
 
 client = app.test_client()
 
-payload = {"meteorite": {"diameter": 1000, "velocity": 20, "density": 3000}, "location": {"lat": 0, "lng": 0}}
+payload = {"meteorite": {"diameter": 1000, "velocity": 20, "density": 3000}, "location": {"lat": 0, "lng": 0}, "wait": 60}
 resp = client.post('/api/simulate', json=payload)
 print('STATUS', resp.status_code)
 try:
@@ -0,0 +1,6 @@
+# tests/conftest.py
+"""Los módulos de Simulacion se importan por nombre (import utils), como en app.py."""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
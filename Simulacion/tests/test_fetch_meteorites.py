@@ -0,0 +1,103 @@
+# tests/test_fetch_meteorites.py
+"""Ingesta completa (fetch_meteorites.py --all) contra un stub HTTP local vía --base-url."""
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+import ingestion
+
+TOTAL_PAGES = 5
+PAGE_SIZE = 2
+
+
+class _Stub(BaseHTTPRequestHandler):
+    """
+    Página 1: 429 con Retry-After la primera vez. Página 2: 503 la primera vez.
+    Página 3: responde tarde, así que termina después de la 4.
+    """
+
+    def do_GET(self):
+        page = int(parse_qs(urlparse(self.path).query)['page'][0])
+        with self.server.lock:
+            self.server.requests.setdefault(page, []).append(time.monotonic())
+            attempt = len(self.server.requests[page])
+        if page == 1 and attempt == 1:
+            return self._reply(429, {'error': 'slow down'}, {'Retry-After': '1'})
+        if page == 2 and attempt == 1:
+            return self._reply(503, {'error': 'unavailable'})
+        if page == 3:
+            time.sleep(0.3)
+        neos = [{'id': f'{page}-{i}', 'name': f'NEO {page}-{i}'} for i in range(PAGE_SIZE)]
+        self._reply(200, {'page': {'total_pages': TOTAL_PAGES, 'total_elements': TOTAL_PAGES * PAGE_SIZE},
+                          'near_earth_objects': neos})
+
+    def _reply(self, status, body, headers=None):
+        raw = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(raw)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _Stub)
+    server.lock = threading.Lock()
+    server.requests = {}
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _run(stub, output):
+    base_url = f'http://127.0.0.1:{stub.server_address[1]}/neo/browse'
+    return subprocess.run(
+        [sys.executable, ingestion.DEFAULT_PATH, '--all', '--base-url', base_url, '--output', str(output),
+         '--page-size', str(PAGE_SIZE), '--concurrency', '2', '--rate', '0', '--retries', '3',
+         '--backoff', '0.05'],
+        capture_output=True, text=True, timeout=60)
+
+
+def test_full_fetch_retries_and_keeps_page_order(stub, tmp_path):
+    output = tmp_path / 'meteorites_data.json'
+    result = _run(stub, output)
+    assert result.returncode == 0, result.stdout + result.stderr
+
+    # 429: se reintenta y se respeta Retry-After
+    first, second = stub.requests[1]
+    assert second - first >= 1.0
+    # 5xx: un reintento y después éxito
+    assert len(stub.requests[2]) == 2
+    assert all(len(stub.requests[page]) == 1 for page in (0, 3, 4))
+
+    # La salida sigue el orden de página aunque la 3 llegue después de la 4
+    with open(output, encoding='utf-8') as f:
+        data = json.load(f)
+    expected = [f'{page}-{i}' for page in range(TOTAL_PAGES) for i in range(PAGE_SIZE)]
+    assert [neo['id'] for neo in data['neos']] == expected
+    assert os.path.exists(tmp_path / 'meteorites_data.bin')
+
+
+def test_failed_full_fetch_leaves_output_untouched(stub, tmp_path):
+    output = tmp_path / 'meteorites_data.json'
+    output.write_text('{"neos": []}', encoding='utf-8')
+    stub.shutdown()
+    stub.server_close()
+    result = _run(stub, output)
+    assert result.returncode == 1
+    assert output.read_text(encoding='utf-8') == '{"neos": []}'
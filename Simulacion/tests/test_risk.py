@@ -0,0 +1,29 @@
+# tests/test_risk.py
+import risk
+
+
+def _distributions(diameter):
+    return risk.merge_distributions(risk.default_distributions({'diameter_meters': 100}), {'diameter': diameter})
+
+
+def test_samples_outside_histogram_range_are_counted():
+    # Energías de 1e-25 a 1e-13 Mt: todas por debajo de ENERGY_LOG_RANGE, y las de diámetro 0 dan log10 = -inf
+    distributions = _distributions({'dist': 'uniform', 'low': 0.0, 'high': 1e-3})
+    chunk = risk.simulate_chunk(distributions, 5000, 1)
+    assert chunk['energy_hist'].sum() == 5000
+    assert chunk['crater_hist'].sum() == 5000
+
+    energy = risk.summarize([chunk])['energy_megatons']
+    assert sum(energy['histogram']['counts']) == 5000
+    for value in energy['percentiles'].values():
+        assert energy['min'] <= value <= energy['max']
+
+
+def test_percentiles_track_samples_below_range():
+    distributions = _distributions({'dist': 'loguniform', 'low': 1e-4, 'high': 1e-3})
+    chunks = [risk.simulate_chunk(distributions, 20000, seed) for seed in range(2)]
+    summary = risk.summarize(chunks)['energy_megatons']
+    assert summary['max'] < 10 ** risk.ENERGY_LOG_RANGE[0]
+    assert summary['percentiles']['p99'] <= summary['max']
+    assert summary['percentiles']['p1'] < 10 ** risk.ENERGY_LOG_RANGE[0]
+
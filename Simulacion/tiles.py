@@ -0,0 +1,320 @@
+# app/tiles.py
+"""
+Teselas PNG (Web Mercator, 256 px) con las zonas de daño de un escenario:
+un NEO del catálogo o unos parámetros (diámetro, velocidad, densidad) impactando
+en uno o varios puntos. La distancia de cada píxel al impacto más cercano se
+calcula con numpy para toda la tesela a la vez y se clasifica en zonas a partir
+del cráter y la energía de utils.
+
+Las teselas se guardan en un LRU en memoria y en disco bajo
+TILE_CACHE_DIR/<hash del escenario>/<z>/<x>/<y>.png. El disco se limita a
+TILE_CACHE_MAX_BYTES: al pasarse, se borran las teselas usadas hace más tiempo.
+"""
+import hashlib
+import json
+import math
+import os
+import struct
+import threading
+import zlib
+
+import numpy as np
+
+import utils
+from cache import LRUCache
+from http_cache import CachedPayload
+from settings import get_setting
+
+TILE_SIZE = 256
+MAX_ZOOM = 18
+MAX_IMPACTS = 500
+EARTH_RADIUS_M = 6371008.8
+DEFAULT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tile_cache')
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+# Tras una limpieza el disco queda en esta fracción del máximo
+EVICT_TARGET = 0.8
+# Cambiar al modificar el modelo o los colores: invalida las teselas guardadas
+MODEL_VERSION = 1
+
+# Radios de sobrepresión escalados (km por kt^(1/3), aproximación de Glasstone):
+# 20 psi destrucción grave, 5 psi daños en edificios, 1 psi rotura de cristales
+BLAST_SCALED_RADII_KM = (0.22, 0.46, 1.18)
+
+# Índice de zona -> RGBA: 0 sin daño, 1 leve, 2 moderado, 3 grave, 4 cráter
+PALETTE = (
+    (0, 0, 0, 0),
+    (255, 235, 59, 90),
+    (255, 152, 0, 130),
+    (244, 67, 54, 170),
+    (120, 0, 0, 210),
+)
+ZONE_NAMES = ('ninguno', 'leve', 'moderado', 'grave', 'cráter')
+
+
+def damage_radii(energy_megatons):
+    """Radios (m) de las zonas 4..1 en orden creciente: cráter, 20 psi, 5 psi, 1 psi."""
+    if energy_megatons <= 0:
+        return np.zeros(4)
+    crater_radius = utils.calculate_crater_diameter(energy_megatons) / 2
+    yield_scale = (energy_megatons * 1000) ** (1 / 3)
+    blast = [r * 1000 * yield_scale for r in BLAST_SCALED_RADII_KM]
+    return np.maximum.accumulate(np.array([crater_radius] + blast))
+
+
+class Scenario:
+    """Parámetros del impacto más los puntos de impacto (lista de (lat, lng))."""
+
+    def __init__(self, diameter, velocity, density, impacts):
+        if not impacts:
+            raise ValueError('Se necesita al menos un punto de impacto')
+        if len(impacts) > MAX_IMPACTS:
+            raise ValueError(f'Máximo {MAX_IMPACTS} puntos de impacto por escenario')
+        self.diameter = float(diameter)
+        self.velocity = float(velocity)
+        self.density = float(density)
+        self.impacts = np.radians(np.array(impacts, dtype=np.float64).reshape(-1, 2))
+        self.energy = utils.calculate_impact_energy(self.diameter, self.velocity, self.density)
+        self.radii = damage_radii(self.energy)
+        canonical = json.dumps({
+            'model': MODEL_VERSION,
+            'd': float(f'{self.diameter:.6g}'), 'v': float(f'{self.velocity:.6g}'), 'rho': float(f'{self.density:.6g}'),
+            'impacts': [[round(lat, 5), round(lng, 5)] for lat, lng in impacts],
+        }, sort_keys=True)
+        self.hash = hashlib.sha1(canonical.encode('utf-8')).hexdigest()[:20]
+
+    def describe(self):
+        return {
+            'scenario': self.hash,
+            'energy_megatons': self.energy,
+            'impacts': len(self.impacts),
+            'zones': [{'zone': ZONE_NAMES[4 - i], 'radius_meters': float(r)} for i, r in enumerate(self.radii)],
+        }
+
+
+def _tile_lonlat(z, x, y):
+    """Longitudes (256,) y latitudes (256,) en radianes de los centros de píxel."""
+    n = TILE_SIZE * (2 ** z)
+    offsets = np.arange(TILE_SIZE) + 0.5
+    lng = (x * TILE_SIZE + offsets) / n * 2 * math.pi - math.pi
+    lat = np.arctan(np.sinh(math.pi * (1 - 2 * (y * TILE_SIZE + offsets) / n)))
+    return lng, lat
+
+
+def _haversine(lat1, lng1, lat2, lng2):
+    a = (np.sin((lat2 - lat1) / 2) ** 2
+         + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def render_levels(scenario, z, x, y, chunk=64):
+    """
+    Matriz (256, 256) uint8 con la zona de cada píxel, o None si ningún impacto
+    alcanza la tesela. Los impactos lejanos se descartan antes del cálculo por
+    píxel comparando con el centro y las esquinas de la tesela.
+    """
+    max_radius = scenario.radii[-1]
+    if max_radius <= 0:
+        return None
+    lng, lat = _tile_lonlat(z, x, y)
+    corners_lat = np.array([lat[0], lat[0], lat[-1], lat[-1]])
+    corners_lng = np.array([lng[0], lng[-1], lng[0], lng[-1]])
+    center_lat, center_lng = lat[TILE_SIZE // 2], lng[TILE_SIZE // 2]
+    half_diagonal = _haversine(center_lat, center_lng, corners_lat, corners_lng).max()
+    impact_lat, impact_lng = scenario.impacts[:, 0], scenario.impacts[:, 1]
+    near = _haversine(center_lat, center_lng, impact_lat, impact_lng) <= max_radius + half_diagonal
+    if not near.any():
+        return None
+
+    grid_lat = lat[:, None]
+    grid_lng = lng[None, :]
+    nearest = np.full((TILE_SIZE, TILE_SIZE), np.inf)
+    candidates = np.nonzero(near)[0]
+    for start in range(0, len(candidates), chunk):
+        idx = candidates[start:start + chunk]
+        distances = _haversine(grid_lat[None], grid_lng[None],
+                               impact_lat[idx, None, None], impact_lng[idx, None, None])
+        np.minimum(nearest, distances.min(axis=0), out=nearest)
+
+    levels = (len(scenario.radii) - np.searchsorted(scenario.radii, nearest, side='left')).astype(np.uint8)
+    return levels if levels.any() else None
+
+
+def encode_png(levels):
+    """PNG con paleta (1 byte por píxel y canal alfa en tRNS), sin dependencias externas."""
+    height, width = levels.shape
+
+    def chunk(kind, data):
+        return (struct.pack('>I', len(data)) + kind + data
+                + struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff))
+
+    raw = np.hstack([np.zeros((height, 1), dtype=np.uint8), levels]).tobytes()  # filtro 0 por fila
+    return (b'\x89PNG\r\n\x1a\n'
+            + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 3, 0, 0, 0))
+            + chunk(b'PLTE', bytes(c for rgba in PALETTE for c in rgba[:3]))
+            + chunk(b'tRNS', bytes(rgba[3] for rgba in PALETTE))
+            + chunk(b'IDAT', zlib.compress(raw, 6))
+            + chunk(b'IEND', b''))
+
+
+EMPTY_TILE = CachedPayload(encode_png(np.zeros((TILE_SIZE, TILE_SIZE), dtype=np.uint8)), 'image/png', compress=False)
+
+
+class TileCache:
+    """
+    LRU de CachedPayload más almacén en disco (un PNG por tesela, escritura
+    atómica) de a lo sumo max_bytes. Cada acierto en disco actualiza el mtime
+    del archivo, así que borrar por mtime más antiguo es un LRU aproximado que
+    sirve también con varios workers sobre el mismo directorio.
+    """
+
+    def __init__(self, maxsize=4096, directory=DEFAULT_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.memory = LRUCache(maxsize)
+        self.directory = directory or None
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._evict_lock = threading.Lock()
+        self.counters = {'memory_hits': 0, 'disk_hits': 0, 'rendered': 0, 'empty': 0, 'evicted': 0}
+        self._disk_bytes = self._scan()[1] if self.directory else 0
+        if self.max_bytes and self._disk_bytes > self.max_bytes:
+            self.evict()
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def _path(self, scenario_hash, z, x, y):
+        return os.path.join(self.directory, scenario_hash, str(z), str(x), f'{y}.png')
+
+    def get_tile(self, scenario, z, x, y):
+        key = (scenario.hash, z, x, y)
+        payload = self.memory.get(key)
+        if payload is not None:
+            self._count('memory_hits')
+            return payload
+
+        path = self._path(scenario.hash, z, x, y) if self.directory else None
+        body = self._read(path) if path else None
+        if body is not None:
+            payload = CachedPayload(body, 'image/png', compress=False)
+            self._count('disk_hits')
+        else:
+            levels = render_levels(scenario, z, x, y)
+            if levels is None:
+                # Las teselas vacías comparten un único PNG y no se guardan en disco
+                payload = EMPTY_TILE
+                self._count('empty')
+            else:
+                payload = CachedPayload(encode_png(levels), 'image/png', compress=False)
+                self._count('rendered')
+                if path:
+                    self._write(path, payload.body)
+        self.memory.set(key, payload)
+        return payload
+
+    def _read(self, path):
+        try:
+            with open(path, 'rb') as f:
+                body = f.read()
+            os.utime(path)
+            return body
+        except OSError:
+            # No existe, o otro worker la borró al limpiar
+            return None
+
+    def _write(self, path, body):
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+            with open(tmp, 'wb') as f:
+                f.write(body)
+            os.replace(tmp, path)
+        except OSError as e:
+            print(f"WARNING: no se pudo guardar la tesela {path}: {e}")
+            return
+        with self._lock:
+            self._disk_bytes += len(body)
+            over = self.max_bytes and self._disk_bytes > self.max_bytes
+        if over:
+            self.evict()
+
+    def _scan(self):
+        """([(mtime, bytes, ruta), ...], bytes totales) de las teselas en disco."""
+        files, total = [], 0
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                if not name.endswith('.png'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                files.append((st.st_mtime, st.st_size, path))
+                total += st.st_size
+        return files, total
+
+    def evict(self):
+        """
+        Borra las teselas menos usadas hasta dejar el disco en EVICT_TARGET del
+        máximo. El total se recalcula recorriendo el directorio, porque otros
+        workers también escriben en él.
+        """
+        if not self._evict_lock.acquire(blocking=False):
+            return 0     # otro hilo ya está limpiando
+        try:
+            files, total = self._scan()
+            target = int(self.max_bytes * EVICT_TARGET)
+            removed = 0
+            for _, size, path in sorted(files):
+                if total <= target:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total -= size
+                removed += 1
+            for root, dirs, names in os.walk(self.directory, topdown=False):
+                if root != self.directory and not dirs and not names:
+                    try:
+                        os.rmdir(root)
+                    except OSError:
+                        pass
+            with self._lock:
+                self._disk_bytes = total
+                self.counters['evicted'] += removed
+            return removed
+        finally:
+            self._evict_lock.release()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+        stats['memory_entries'] = len(self.memory)
+        stats['directory'] = self.directory
+        stats['disk_bytes'] = self._disk_bytes
+        stats['max_disk_bytes'] = self.max_bytes
+        return stats
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache(config=None):
+    """
+    Caché del proceso: TILE_CACHE_SIZE, TILE_CACHE_DIR ('' desactiva el disco)
+    y TILE_CACHE_MAX_BYTES (0 = sin límite).
+    """
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = TileCache(get_setting(config, 'TILE_CACHE_SIZE', 4096, int),
+                                   get_setting(config, 'TILE_CACHE_DIR', DEFAULT_DIR),
+                                   get_setting(config, 'TILE_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES, int))
+    return _cache
+
+
+def valid_tile(z, x, y):
+    return 0 <= z <= MAX_ZOOM and 0 <= x < 2 ** z and 0 <= y < 2 ** z
@@ -0,0 +1,134 @@
+# app/trajectories.py
+"""
+Trayectorias bajo demanda para /api/neos/<id>/trajectory.
+La órbita se regenera a partir de los elementos guardados en el catálogo
+(fetch_meteorites.record_orbit + calculate_trajectories) con el número de
+puntos y la fracción de órbita pedidos, y se simplifica con Douglas-Peucker
+según la tolerancia: una vista alejada con cientos de NEOs necesita muchos
+menos puntos que un primer plano de uno solo.
+"""
+import json
+import threading
+
+import numpy as np
+
+import ingestion
+from cache import LRUCache
+from http_cache import CachedPayload
+from settings import get_setting
+
+DEFAULT_POINTS = 120
+DEFAULT_FRACTION = 0.8
+MAX_POINTS = 5000
+
+
+def _segment_distances(points, start, end):
+    """Distancia de points (n, 3) al segmento start-end."""
+    direction = end - start
+    length_sq = float(direction @ direction)
+    if length_sq == 0.0:
+        return np.linalg.norm(points - start, axis=1)
+    t = np.clip((points - start) @ direction / length_sq, 0.0, 1.0)
+    return np.linalg.norm(points - (start + t[:, None] * direction), axis=1)
+
+
+def douglas_peucker(points, tolerance):
+    """
+    Índices (ordenados) de los puntos que se conservan al simplificar la
+    polilínea con Douglas-Peucker: ningún punto descartado queda a más de
+    `tolerance` del trazo resultante. Los tramos curvos conservan más puntos.
+    """
+    n = len(points)
+    if tolerance <= 0 or n <= 2:
+        return np.arange(n)
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]    # iterativo: sin límite de recursión para órbitas largas
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        distances = _segment_distances(points[first + 1:last], points[first], points[last])
+        farthest = int(np.argmax(distances))
+        if distances[farthest] > tolerance:
+            split = first + 1 + farthest
+            keep[split] = True
+            stack.append((first, split))
+            stack.append((split, last))
+    return np.nonzero(keep)[0]
+
+
+def parse_params(args):
+    """points, fraction y tolerance de la query string. Lanza ValueError si no son válidos."""
+    points = int(args.get('points', DEFAULT_POINTS))
+    fraction = float(args.get('fraction', DEFAULT_FRACTION))
+    tolerance = float(args.get('tolerance', 0))
+    if not 2 <= points <= MAX_POINTS:
+        raise ValueError(f'points debe estar entre 2 y {MAX_POINTS}')
+    if not 0 < fraction <= 1:
+        raise ValueError('fraction debe estar en (0, 1]')
+    if not tolerance >= 0:
+        raise ValueError('tolerance no puede ser negativa')
+    return points, fraction, tolerance
+
+
+class TrajectoryService:
+    """Genera, simplifica y memoriza (LRU de CachedPayload) las trayectorias."""
+
+    def __init__(self, maxsize=2048, config=None):
+        self.memory = LRUCache(maxsize)
+        self.config = config
+        self._lock = threading.Lock()
+        self.counters = {'hits': 0, 'generated': 0, 'points_generated': 0, 'points_returned': 0}
+
+    def _count(self, **amounts):
+        with self._lock:
+            for name, amount in amounts.items():
+                self.counters[name] += amount
+
+    def payload(self, neo, catalog_version, points=DEFAULT_POINTS, fraction=DEFAULT_FRACTION, tolerance=0.0):
+        # La versión del catálogo forma parte de la clave: una recarga invalida las entradas
+        key = (catalog_version, str(neo.get('id')), points, round(fraction, 6), round(tolerance, 6))
+        cached = self.memory.get(key)
+        if cached is not None:
+            self._count(hits=1)
+            return cached
+
+        fetch = ingestion.get_fetch_module(self.config)
+        orbit = fetch.record_orbit(neo)
+        generated = fetch.calculate_trajectories(*orbit, num_points=points, orbit_fraction=fraction)[0]
+        xyz = np.column_stack([generated['x'], generated['y'], generated['z']])
+        kept = xyz[douglas_peucker(xyz, tolerance)]
+        body = {
+            'id': neo.get('id'),
+            'name': neo.get('name'),
+            'points': points,
+            'fraction': fraction,
+            'tolerance': tolerance,
+            'point_count': len(kept),
+            'trajectory': [{'x': x, 'y': y, 'z': z} for x, y, z in kept.tolist()],
+        }
+        payload = CachedPayload(json.dumps(body, separators=(',', ':')).encode('utf-8'))
+        self.memory.set(key, payload)
+        self._count(generated=1, points_generated=points, points_returned=len(kept))
+        return payload
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+        stats['entries'] = len(self.memory)
+        return stats
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_service(config=None):
+    """Servicio del proceso; TRAJECTORY_CACHE_SIZE fija el tamaño del LRU."""
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                _service = TrajectoryService(get_setting(config, 'TRAJECTORY_CACHE_SIZE', 2048, int), config)
+    return _service
@@ -1,6 +1,8 @@
 # app/utils.py
 import math
 
+import numpy as np
+
 # Constantes físicas
 Tnt_to_Joules = 4.184e15  # Joules por megatón de TNT
 
@@ -27,4 +29,40 @@ def calculate_crater_diameter(energy_megatons, target_density_kgm3=1800):
     Cf = 1.161
     transient_diameter = Cf * (energy_joules / target_density_kgm3) ** (1 / 3.4)
     final_diameter_meters = transient_diameter * 1.25
-    return final_diameter_meters
\ No newline at end of file
+    return final_diameter_meters
+
+# --- Versiones vectorizadas (NumPy) para lotes de escenarios ---
+
+def calculate_impact_energy_array(diameter_m, velocity_kms, density_kgm3):
+    """
+    Igual que calculate_impact_energy pero sobre arreglos (o escalares) que se
+    combinan por broadcasting. Devuelve un ndarray de megatones; los elementos
+    con algún parámetro <= 0 valen 0 y los NaN se propagan, como en la versión
+    escalar.
+    """
+    diameter, velocity, density = np.broadcast_arrays(
+        np.asarray(diameter_m, dtype=np.float64),
+        np.asarray(velocity_kms, dtype=np.float64),
+        np.asarray(density_kgm3, dtype=np.float64),
+    )
+    valid = ~((diameter <= 0) | (velocity <= 0) | (density <= 0))
+    radius_m = diameter / 2
+    mass_kg = (4 / 3) * math.pi * radius_m ** 3 * density
+    kinetic_energy_joules = 0.5 * mass_kg * (velocity * 1000) ** 2
+    return np.where(valid, kinetic_energy_joules / Tnt_to_Joules, 0.0)
+
+def calculate_crater_diameter_array(energy_megatons, target_density_kgm3=1800):
+    """
+    Igual que calculate_crater_diameter sobre arreglos. target_density_kgm3 puede
+    ser un escalar o un arreglo por escenario.
+    """
+    energy, target_density = np.broadcast_arrays(
+        np.asarray(energy_megatons, dtype=np.float64),
+        np.asarray(target_density_kgm3, dtype=np.float64),
+    )
+    valid = (energy > 0) & (target_density > 0)
+    safe_energy = np.where(valid, energy, 1.0)
+    safe_density = np.where(valid, target_density, 1.0)
+    Cf = 1.161
+    transient_diameter = Cf * (safe_energy * Tnt_to_Joules / safe_density) ** (1 / 3.4)
+    return np.where(valid, transient_diameter * 1.25, 0.0)
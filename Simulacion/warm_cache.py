@@ -0,0 +1,182 @@
+# app/warm_cache.py
+"""
+Precalentamiento de la caché de análisis de Gemini (CLI).
+Recorre catálogo × ubicaciones de referencia, calcula la física con utils y
+llena analysis_cache a través de services.get_gemini_analysis, de modo que
+tras un despliegue o una recarga de datos los escenarios habituales ya salgan
+de caché.
+
+    python warm_cache.py --workers 4 --rate 2 --batch 8
+    python warm_cache.py --fake --limit 50          # stub local, sin red
+
+El progreso se guarda en un checkpoint (una clave de caché por línea); si el
+proceso se interrumpe, la siguiente ejecución continúa donde se quedó.
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from dotenv import load_dotenv
+from flask import Flask
+
+import analysis_cache
+import catalog
+import services
+from neo_scenarios import DEFAULT_LOCATIONS_PATH, load_locations, neo_physics
+from rate_limit import RateLimiter
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CHECKPOINT_PATH = os.path.join(BASE_DIR, 'warm_cache.checkpoint')
+
+
+class Checkpoint:
+    """Claves ya calentadas, en un archivo de texto al que solo se añaden líneas."""
+
+    def __init__(self, path):
+        self.path = path
+        self.done = set()
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                self.done = {line.rstrip('\n') for line in f if line.strip()}
+
+    def __contains__(self, key):
+        return key in self.done
+
+    def add(self, key):
+        with self._lock:
+            self.done.add(key)
+            if self.path:
+                with open(self.path, 'a', encoding='utf-8') as f:
+                    f.write(key + '\n')
+
+
+def build_scenarios(neos, locations, key_fn):
+    """Producto catálogo × ubicaciones, sin repetir claves de caché (la rejilla agrupa vecinos)."""
+    scenarios, seen = [], set()
+    for neo in neos:
+        meteorite_data = neo_physics(neo)
+        if meteorite_data['energy'] <= 0:
+            continue
+        for location in locations:
+            loc = {'lat': location['lat'], 'lng': location['lng']}
+            key = key_fn(meteorite_data, loc)
+            if key in seen:
+                continue
+            seen.add(key)
+            scenarios.append((key, neo.get('name'), location['name'], meteorite_data, loc))
+    return scenarios
+
+
+def create_app(args):
+    app = Flask(__name__)
+    load_dotenv(os.path.join(BASE_DIR, '.env'))
+    app.config['GEMINI_API_KEY'] = os.getenv('GEMINI_API_KEY')
+    app.config['GEMINI_MODEL'] = os.getenv('GEMINI_MODEL', 'gemini-2.5-pro')
+    if args.fake:
+        app.config['GEMINI_BACKEND'] = 'fake'
+        app.config['GEMINI_FAKE_LATENCY'] = args.fake_latency
+    return app
+
+
+def warm(app, scenarios, checkpoint, workers=4, rate=0.0, batch_size=8, progress_every=25, out=sys.stdout):
+    """
+    Calienta los escenarios pendientes en grupos de batch_size (prompts de
+    varios escenarios, ver services.get_gemini_analyses; con batch_size 1, el
+    prompt individual). Cada llamada al modelo consume un token del limitador,
+    también los reintentos uno a uno. Devuelve el resumen de contadores.
+    """
+    # El mismo token bucket que usa la ingesta con la API de la NASA
+    limiter = RateLimiter(rate, burst=workers)
+    counters = {'total': len(scenarios), 'skipped_checkpoint': 0, 'cached': 0, 'generated': 0, 'errors': 0}
+    lock = threading.Lock()
+    started = time.monotonic()
+
+    def count(name, amount=1):
+        with lock:
+            before = sum(counters[k] for k in ('skipped_checkpoint', 'cached', 'generated', 'errors'))
+            counters[name] += amount
+        if progress_every and (before + amount) // progress_every > before // progress_every:
+            print(f"  {before + amount}/{counters['total']} ({time.monotonic() - started:.1f} s)", file=out)
+
+    def run(group):
+        pending = []
+        with app.app_context():
+            for scenario in group:
+                key, _, _, meteorite_data, location = scenario
+                if key in checkpoint:
+                    count('skipped_checkpoint')
+                elif services.get_cached_gemini_analysis(meteorite_data, location) is not None:
+                    checkpoint.add(key)
+                    count('cached')
+                else:
+                    pending.append(scenario)
+            if not pending:
+                return
+            try:
+                analyses = services.get_gemini_analyses([(s[3], s[4]) for s in pending],
+                                                        before_call=limiter.acquire)
+            except Exception as e:
+                analyses = [{'error': f'{type(e).__name__}: {e}'}] * len(pending)
+        for (key, neo_name, location_name, _, _), analysis in zip(pending, analyses):
+            if isinstance(analysis, dict) and 'error' in analysis:
+                # Sin checkpoint: se reintentará en la siguiente ejecución
+                print(f"  ERROR {neo_name} @ {location_name}: {analysis['error']}", file=out)
+                count('errors')
+            else:
+                checkpoint.add(key)
+                count('generated')
+
+    batch_size = max(1, batch_size)
+    groups = [scenarios[i:i + batch_size] for i in range(0, len(scenarios), batch_size)]
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='warm-cache') as pool:
+        list(pool.map(run, groups))
+    counters['seconds'] = round(time.monotonic() - started, 2)
+    return counters
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Precalienta la caché de análisis de Gemini.')
+    parser.add_argument('--data', default=None, help='meteorites_data.json (por defecto METEORITES_DATA_PATH)')
+    parser.add_argument('--locations', default=DEFAULT_LOCATIONS_PATH, help='ubicaciones de referencia (.json o .csv)')
+    parser.add_argument('--checkpoint', default=DEFAULT_CHECKPOINT_PATH, help="archivo de progreso ('' lo desactiva)")
+    parser.add_argument('--restart', action='store_true', help='ignora el checkpoint existente')
+    parser.add_argument('--workers', type=int, default=4, help='escenarios en paralelo')
+    parser.add_argument('--rate', type=float, default=1.0, help='llamadas a Gemini por segundo (0 = sin límite)')
+    parser.add_argument('--batch', type=int, default=8, help='escenarios por prompt de Gemini (1 = uno a uno)')
+    parser.add_argument('--limit', type=int, default=0, help='máximo de NEOs (los de mayor energía primero)')
+    parser.add_argument('--fake', action='store_true', help='usa el stub local de Gemini (GEMINI_BACKEND=fake)')
+    parser.add_argument('--fake-latency', type=float, default=0.0, help='latencia simulada del stub (s)')
+    args = parser.parse_args(argv)
+
+    app = create_app(args)
+    if args.data:
+        with open(args.data, encoding='utf-8') as f:
+            snapshot = catalog.NeoCatalog(json.load(f))
+    else:
+        snapshot = catalog.get_catalog()
+    neos = snapshot.top_k(args.limit or len(snapshot.neos), 'energy')
+    locations = load_locations(args.locations)
+
+    if args.restart and args.checkpoint and os.path.exists(args.checkpoint):
+        os.remove(args.checkpoint)
+    checkpoint = Checkpoint(args.checkpoint)
+
+    with app.app_context():
+        cache = analysis_cache.get_cache(app.config)
+        model_name = analysis_cache.model_key(app.config)
+        scenarios = build_scenarios(neos, locations, lambda md, loc: cache.key(md, loc, model_name))
+
+    print(f"Calentando {len(scenarios)} escenarios ({len(neos)} NEOs × {len(locations)} ubicaciones, "
+          f"{len(checkpoint.done)} ya en el checkpoint)")
+    summary = warm(app, scenarios, checkpoint, workers=args.workers, rate=args.rate, batch_size=args.batch)
+    print(json.dumps(summary, ensure_ascii=False))
+    return 1 if summary['errors'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
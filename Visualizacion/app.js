@@ -218,6 +218,8 @@ const MOON_RADIUS = 2.7;
 const MOON_DISTANCE = 60;
 const EARTH_MOON_DISTANCE = 60;
 const TRAJECTORY_SCALE = 0.5;
+// Catálogo binario generado por fetch_meteorites.py (también servido en /api/neos/trajectories.bin)
+const NEO_BINARY_URL = 'meteorites_data.bin';
 
 // Camera tracking system
 let cameraMode = 'auto'; // 'auto' or 'manual'
@@ -935,24 +937,40 @@ function createOrbitalPaths() {
 	scene.add(eclipticPlane);
 }
 
+function trajectoryPointCount(trajectory) {
+	if (!trajectory) return 0;
+	// Las trayectorias del catálogo binario son Float32Array planos (x, y, z, x, y, z, ...)
+	return ArrayBuffer.isView(trajectory) ? trajectory.length / 3 : trajectory.length;
+}
+
 function createTrajectoryLine(trajectoryPoints, isHazardous = false) {
-	if (!trajectoryPoints || trajectoryPoints.length < 2) return null;
+	const pointCount = trajectoryPointCount(trajectoryPoints);
+	if (pointCount < 2) return null;
 	
-	console.log(`Creating trajectory line with ${trajectoryPoints.length} points`);
-	console.log('First point:', trajectoryPoints[0]);
-	console.log('Last point:', trajectoryPoints[trajectoryPoints.length - 1]);
+	console.log(`Creating trajectory line with ${pointCount} points`);
 	
 	// Scale factor to bring trajectory coordinates into Earth-Moon system range
 	// Using global TRAJECTORY_SCALE constant
 	
-	// Create line geometry from trajectory points with scaling
-	const points = trajectoryPoints.map(point => 
-		new THREE.Vector3(
-			point.x * TRAJECTORY_SCALE, 
-			point.y * TRAJECTORY_SCALE, 
-			point.z * TRAJECTORY_SCALE
-		)
-	);
+	// Flat scaled buffer, used directly as the line's position attribute
+	const flat = new Float32Array(pointCount * 3);
+	if (ArrayBuffer.isView(trajectoryPoints)) {
+		for (let i = 0; i < flat.length; i++) {
+			flat[i] = trajectoryPoints[i] * TRAJECTORY_SCALE;
+		}
+	} else {
+		trajectoryPoints.forEach((point, i) => {
+			flat[i * 3] = point.x * TRAJECTORY_SCALE;
+			flat[i * 3 + 1] = point.y * TRAJECTORY_SCALE;
+			flat[i * 3 + 2] = point.z * TRAJECTORY_SCALE;
+		});
+	}
+	
+	// Vector3 points for the tube curve and key positions
+	const points = [];
+	for (let i = 0; i < pointCount; i++) {
+		points.push(new THREE.Vector3(flat[i * 3], flat[i * 3 + 1], flat[i * 3 + 2]));
+	}
 	
 	console.log('Scaled points range:', {
 		first: points[0],
@@ -960,7 +978,8 @@ function createTrajectoryLine(trajectoryPoints, isHazardous = false) {
 	});
 	
 	// Method 1: Create basic line
-	const geometry = new THREE.BufferGeometry().setFromPoints(points);
+	const geometry = new THREE.BufferGeometry();
+	geometry.setAttribute('position', new THREE.BufferAttribute(flat, 3));
 	const material = new THREE.LineBasicMaterial({
 		color: isHazardous ? 0xff44ff : 0x44ffff, 
 		transparent: false,
@@ -1025,8 +1044,9 @@ function createTrajectoryVisualizations() {
 	let totalTrajectoryPoints = 0;
 	
 	neos.forEach((neo, index) => {
-		if (neo.trajectory && neo.trajectory.length > 1) {
-			console.log(`Creating trajectory for NEO ${index}: ${neo.name} with ${neo.trajectory.length} points`);
+		const pointCount = trajectoryPointCount(neo.trajectory);
+		if (pointCount > 1) {
+			console.log(`Creating trajectory for NEO ${index}: ${neo.name} with ${pointCount} points`);
 			
 			const trajectoryLine = createTrajectoryLine(neo.trajectory, neo.is_hazardous);
 			
@@ -1036,12 +1056,12 @@ function createTrajectoryVisualizations() {
 					neoId: neo.id,
 					isHazardous: neo.is_hazardous,
 					name: neo.name,
-					pointCount: neo.trajectory.length
+					pointCount: pointCount
 				};
 				
 				trajectoryGroup.add(trajectoryLine);
 				createdTrajectories++;
-				totalTrajectoryPoints += neo.trajectory.length;
+				totalTrajectoryPoints += pointCount;
 				console.log(`Added trajectory ${createdTrajectories} for ${neo.name}`);
 			} else {
 				console.log(`Failed to create trajectory for ${neo.name}`);
@@ -1059,9 +1079,46 @@ function createTrajectoryVisualizations() {
 	updateTrajectoryStats(createdTrajectories, totalTrajectoryPoints);
 }
 
+function parseBinaryCatalog(buffer) {
+	// Formato descrito en fetch_meteorites.py: prefijo de 16 bytes, cabecera JSON
+	// y secciones float32/uint32 que se envuelven sin copiar
+	const prefix = new DataView(buffer, 0, 16);
+	const magic = String.fromCharCode(...new Uint8Array(buffer, 0, 4));
+	if (magic !== 'NEOB' || prefix.getUint32(4, true) !== 1) {
+		throw new Error('Unsupported binary catalog');
+	}
+	const headerBytes = prefix.getUint32(8, true);
+	const count = prefix.getUint32(12, true);
+	const header = JSON.parse(new TextDecoder().decode(new Uint8Array(buffer, 16, headerBytes)));
+	const body = 16 + headerBytes;
+	const sections = header.sections;
+	const offsets = new Uint32Array(buffer, body + sections.offsets.offset, count + 1);
+	const positions = new Float32Array(buffer, body + sections.positions.offset, count * 3);
+	const points = new Float32Array(buffer, body + sections.points.offset, header.point_count * 3);
+	
+	const neos = header.neos.map((neo, i) => Object.assign({}, neo, {
+		position: { x: positions[i * 3], y: positions[i * 3 + 1], z: positions[i * 3 + 2] },
+		trajectory: points.subarray(offsets[i] * 3, offsets[i + 1] * 3)
+	}));
+	return { metadata: header.metadata, neos: neos };
+}
+
+function fetchMeteoriteData() {
+	// Primero el catálogo binario; si no existe (o es de otra versión) se usa el JSON
+	return fetch(NEO_BINARY_URL)
+	.then(response => {
+		if (!response.ok) throw new Error(`HTTP ${response.status}`);
+		return response.arrayBuffer();
+	})
+	.then(parseBinaryCatalog)
+	.catch(error => {
+		console.warn('Binary NEO catalog unavailable, falling back to JSON:', error);
+		return fetch('meteorites_data.json').then(response => response.json());
+	});
+}
+
 function loadMeteoriteData() {
-	fetch('meteorites_data.json')
-	.then(response => response.json())
+	fetchMeteoriteData()
 	.then(data => {
 		meteoriteData = data;
 		createNEOVisualizations();
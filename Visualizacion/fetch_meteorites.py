@@ -6,11 +6,31 @@ This script fetches Near Earth Objects data from NASA's NEO API
 and saves it to a JSON file for use in the Three.js Earth visualization.
 """
 
-import requests
+import argparse
+import hashlib
+import itertools
 import json
 import math
+import os
+import random
+import sqlite3
+import struct
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from datetime import datetime, timedelta
 
+import numpy as np
+import requests
+
+# The token bucket lives in the backend (Simulacion/rate_limit.py), shared with warm_cache.py
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'Simulacion')
+if BACKEND_DIR not in sys.path:
+    sys.path.append(BACKEND_DIR)
+from rate_limit import RateLimiter  # noqa: E402
+
 def calculate_orbital_velocity(semi_major_axis, current_radius):
     """
     Calculate orbital velocity using vis-viva equation
@@ -159,6 +179,46 @@ def calculate_impact_statistics(diameter_meters, semi_major_axis_au, density_kg_
         'historical_comparison': comparison
     }
 
+TRAJECTORY_DTYPE = np.dtype([('x', np.float64), ('y', np.float64), ('z', np.float64)])
+
+
+def calculate_trajectories(orbit_radius, inclination, eccentricity, phase, num_points=120, orbit_fraction=0.8):
+    """
+    Vectorized trajectory generator for many NEOs at once.
+
+    Args:
+        orbit_radius, inclination (degrees), eccentricity, phase (radians):
+            arrays (or scalars) with one value per NEO
+        num_points: Number of trajectory points per NEO
+        orbit_fraction: Fraction of orbit to show (0.8 = 4/5 of complete orbit)
+
+    Returns:
+        Structured array of shape (n_neos, num_points) with fields x, y, z.
+        Same model as the original per-point loop: r = a * (1 + e*cos(θ)) in the
+        orbital plane, then a rotation around the x axis by the inclination.
+    """
+    orbit_radius, inclination, eccentricity, phase = (
+        np.atleast_1d(np.asarray(v, dtype=np.float64)) for v in (orbit_radius, inclination, eccentricity, phase))
+    angle_step = 2 * math.pi * orbit_fraction / num_points
+    angles = phase[:, None] + np.arange(num_points) * angle_step          # (n_neos, num_points)
+    cos_angles = np.cos(angles)
+    distance = orbit_radius[:, None] * (1 + eccentricity[:, None] * cos_angles)
+    x_orbital = distance * cos_angles
+    z_orbital = distance * np.sin(angles)
+    inclination_rad = np.radians(inclination)[:, None]
+
+    trajectories = np.empty(angles.shape, dtype=TRAJECTORY_DTYPE)
+    trajectories['x'] = x_orbital
+    trajectories['y'] = z_orbital * np.sin(inclination_rad)
+    trajectories['z'] = z_orbital * np.cos(inclination_rad)
+    return trajectories
+
+
+def trajectory_to_dicts(points):
+    """Convert one row of calculate_trajectories into the JSON form [{'x', 'y', 'z'}, ...]."""
+    return [{'x': x, 'y': y, 'z': z} for x, y, z in points.tolist()]
+
+
 def calculate_trajectory_points(position, velocity, orbit_radius, inclination, eccentricity=0.1, num_points=100, orbit_fraction=0.75):
     """
     Calculate comprehensive trajectory points for visualization showing a significant portion of the orbit
@@ -172,52 +232,190 @@ def calculate_trajectory_points(position, velocity, orbit_radius, inclination, e
         eccentricity: Orbital eccentricity (0 = circular, <1 = elliptical)
         num_points: Number of trajectory points to generate
         orbit_fraction: Fraction of orbit to show (0.75 = 3/4 of complete orbit)
+
+    Single-NEO wrapper around calculate_trajectories.
     """
-    trajectory_points = []
-    
-    # Convert inclination to radians
-    inclination_rad = math.radians(inclination)
-    
     # Calculate current angle in orbit
     current_angle = math.atan2(position['z'], position['x'])
-    
-    # Calculate angular step to cover the desired orbit fraction
-    total_angle = 2 * math.pi * orbit_fraction  # Radians to cover
-    angle_step = total_angle / num_points
-    
-    for i in range(num_points):
-        # Calculate angle for this point
-        angle = current_angle + (i * angle_step)
-        
-        # Calculate distance from focus (accounting for eccentricity)
-        # For elliptical orbit: r = a(1-e²)/(1+e*cos(θ))
-        # For simplification in visualization, use: r = orbit_radius * (1 + eccentricity * cos(angle))
-        distance = orbit_radius * (1 + eccentricity * math.cos(angle))
-        
-        # Calculate position in orbital plane
-        x_orbital = distance * math.cos(angle)
-        z_orbital = distance * math.sin(angle)
-        
-        # Apply inclination (rotate around x-axis)
-        x = x_orbital
-        y = z_orbital * math.sin(inclination_rad)
-        z = z_orbital * math.cos(inclination_rad)
-        
-        trajectory_points.append({'x': x, 'y': y, 'z': z})
-    
-    return trajectory_points
+    points = calculate_trajectories(orbit_radius, inclination, eccentricity, current_angle,
+                                    num_points=num_points, orbit_fraction=orbit_fraction)
+    return trajectory_to_dicts(points[0])
+
+
+NEO_BROWSE_URL = "https://api.nasa.gov/neo/rest/v1/neo/browse"
+NASA_API_KEY = os.getenv("NASA_API_KEY", "N3XChOFuv4MAG8lvarqKN2dIEQDobrdLxgoaQE5b")
+
+
+def neo_fingerprint(neo):
+    """
+    Hash of the raw NeoWs fields that process_neo actually uses. Incremental
+    refreshes reprocess a NEO only when this changes, so bookkeeping fields
+    such as observation dates do not trigger a rebuild.
+    """
+    orbital_data = neo.get('orbital_data', {})
+    relevant = {
+        'name': neo.get('name'),
+        'diameter': neo.get('estimated_diameter', {}).get('meters', {}),
+        'orbit': {key: orbital_data.get(key) for key in ('semi_major_axis', 'eccentricity', 'inclination')},
+        'hazardous': neo.get('is_potentially_hazardous_asteroid', False),
+    }
+    return hashlib.sha1(json.dumps(relevant, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+
+def scene_orbit_radius(semi_major_axis_au):
+    """Orbit radius in scene units (clamped so every orbit stays visible)."""
+    return max(80, min(300, semi_major_axis_au * 50))
+
+
+def record_orbit(record):
+    """
+    Orbit parameters (orbit_radius, inclination, eccentricity, phase) of an
+    output record, so its trajectory can be regenerated without the raw NeoWs
+    data. The phase is recovered from the stored position (the first
+    trajectory point): y*sin(i) + z*cos(i) = r*sin(phase).
+    """
+    inclination = float(record.get('inclination') or 0)
+    eccentricity = float(record.get('eccentricity') or 0)
+    orbit_radius = scene_orbit_radius(float(record.get('orbit_radius_au') or 1.5))
+    position = record.get('position') or {}
+    inclination_rad = math.radians(inclination)
+    x, y, z = position.get('x', orbit_radius), position.get('y', 0.0), position.get('z', 0.0)
+    phase = math.atan2(y * math.sin(inclination_rad) + z * math.cos(inclination_rad), x)
+    return orbit_radius, inclination, eccentricity, phase
+
+
+def _neo_record(neo):
+    """
+    Scalar fields of one raw NeoWs object plus the orbit parameters
+    (orbit_radius, inclination, eccentricity, phase) its trajectory needs.
+    Raises ValueError/TypeError/KeyError on malformed data.
+    """
+    # Extract required fields
+    name = neo.get('name', 'Unknown NEO')
+    neo_id = neo.get('id', 'unknown')
+
+    # Get estimated diameter (in meters)
+    diameter_data = neo.get('estimated_diameter', {}).get('meters', {})
+    diameter_min = diameter_data.get('estimated_diameter_min', 100)
+    diameter_max = diameter_data.get('estimated_diameter_max', 1000)
+    avg_diameter = (diameter_min + diameter_max) / 2
+
+    # Get orbital data
+    orbital_data = neo.get('orbital_data', {})
+    semi_major_axis = float(orbital_data.get('semi_major_axis', 1.5))  # AU
+    eccentricity = float(orbital_data.get('eccentricity', 0.1))
+    inclination = float(orbital_data.get('inclination', 5))  # degrees
+
+    # Check if potentially hazardous
+    is_hazardous = neo.get('is_potentially_hazardous_asteroid', False)
+
+    # Generate orbital position (simplified circular orbit for visualization)
+    # Convert semi-major axis from AU to our scene units (Earth-Moon system scale)
+    # 1 AU ≈ 150 million km, Earth-Moon distance ≈ 384,400 km
+    # In our scene: Earth-Moon distance = 60 units
+    # So 1 AU ≈ 60 * (150M / 0.384M) ≈ 23,437 units (too big for visualization)
+    # Scale it down for better visualization
+
+    orbit_radius = scene_orbit_radius(semi_major_axis)  # Scale for visibility
+
+    # Random position on orbit (since we don't have real-time position data)
+    angle = hash(neo_id) % 360  # Deterministic but varied positioning
+    angle_rad = math.radians(angle)
 
-def fetch_nasa_neos():
+    # Apply inclination
+    inclination_rad = math.radians(inclination)
+
+    x = orbit_radius * math.cos(angle_rad)
+    z = orbit_radius * math.sin(angle_rad) * math.cos(inclination_rad)
+
+    # Calculate size for visualization (scaled down from real size)
+    size = max(0.2, min(2.0, math.log10(avg_diameter) * 0.3))
+
+    # Calculate orbital velocity
+    current_radius = orbit_radius
+    velocity = calculate_orbital_velocity(semi_major_axis, current_radius)
+
+    # Calculate impact statistics
+    impact_stats = calculate_impact_statistics(avg_diameter, semi_major_axis)
+
+    record = {
+        'name': name.replace('(', '').replace(')', ''),  # Clean name
+        'id': neo_id,
+        'source_hash': neo_fingerprint(neo),
+        'position': None,  # first trajectory point, filled in by process_neos
+        'diameter_meters': avg_diameter,
+        # Keep the NeoWs range so risk estimates can sample the diameter uncertainty
+        'diameter_min_meters': diameter_min,
+        'diameter_max_meters': diameter_max,
+        'orbit_radius_au': semi_major_axis,
+        'eccentricity': eccentricity,
+        'inclination': inclination,
+        'is_hazardous': is_hazardous,
+        'size': size,
+        'velocity': velocity,
+        'trajectory': None,
+        'impact_stats': impact_stats
+    }
+    # The trajectory starts at the current angle in the (inclined) orbital plane
+    return record, (orbit_radius, inclination, eccentricity, math.atan2(z, x))
+
+
+def process_neos(neos_raw, num_points=120, orbit_fraction=0.8):
+    """
+    Turn a list of raw NeoWs objects into visualization records. Scalar fields
+    are built per NEO; all trajectories are computed in one array operation
+    and only converted to {'x', 'y', 'z'} dicts here, at the output boundary.
+    Malformed NEOs are skipped (the output can be shorter than the input).
+    """
+    records, orbits = [], []
+    for neo in neos_raw:
+        try:
+            record, orbit = _neo_record(neo)
+        except (ValueError, TypeError, KeyError) as e:
+            print(f"Skipping NEO due to data error: {e}")
+            continue
+        records.append(record)
+        orbits.append(orbit)
+    if not records:
+        return []
+
+    orbit_radius, inclination, eccentricity, phase = np.array(orbits, dtype=np.float64).T
+    trajectories = calculate_trajectories(orbit_radius, inclination, eccentricity, phase,
+                                          num_points=num_points, orbit_fraction=orbit_fraction)
+    for record, points in zip(records, trajectories):
+        _attach_trajectory(record, points)
+    return records
+
+
+def _attach_trajectory(record, points):
+    # Ensure the meteorite position matches the first trajectory point
+    x, y, z = points[0].tolist()
+    record['position'] = {'x': x, 'y': y, 'z': z}
+    record['trajectory'] = trajectory_to_dicts(points)
+
+
+def process_neo(neo, num_points=120, orbit_fraction=0.8):
+    """
+    Turn one raw NeoWs object into the record used by the visualization.
+    Raises ValueError/TypeError/KeyError on malformed data.
+    """
+    record, orbit = _neo_record(neo)
+    _attach_trajectory(record, calculate_trajectories(*orbit, num_points=num_points,
+                                                      orbit_fraction=orbit_fraction)[0])
+    return record
+
+
+def fetch_nasa_neos(output_path='meteorites_data.json'):
     """
     Fetch Near Earth Objects data from NASA's NEO API
     API: https://api.nasa.gov/neo/rest/v1/neo/browse?api_key=DEMO_KEY
     """
     
     # NASA NEO API endpoint
-    base_url = "https://api.nasa.gov/neo/rest/v1/neo/browse"
+    base_url = NEO_BROWSE_URL
     
     params = {
-        "api_key": "N3XChOFuv4MAG8lvarqKN2dIEQDobrdLxgoaQE5b",
+        "api_key": NASA_API_KEY,
         "size": 100,  # Number of NEOs to fetch
         "page": 0
     }
@@ -233,98 +431,12 @@ def fetch_nasa_neos():
         print(f"Retrieved {len(neos_raw)} Near Earth Objects from NASA API")
         
         # Process NEOs for Three.js
-        processed_neos = []
-        
-        for neo in neos_raw:
-            try:
-                # Extract required fields
-                name = neo.get('name', 'Unknown NEO')
-                neo_id = neo.get('id', 'unknown')
-                
-                # Get estimated diameter (in meters)
-                diameter_data = neo.get('estimated_diameter', {}).get('meters', {})
-                diameter_min = diameter_data.get('estimated_diameter_min', 100)
-                diameter_max = diameter_data.get('estimated_diameter_max', 1000)
-                avg_diameter = (diameter_min + diameter_max) / 2
-                
-                # Get orbital data
-                orbital_data = neo.get('orbital_data', {})
-                semi_major_axis = float(orbital_data.get('semi_major_axis', 1.5))  # AU
-                eccentricity = float(orbital_data.get('eccentricity', 0.1))
-                inclination = float(orbital_data.get('inclination', 5))  # degrees
-                
-                # Check if potentially hazardous
-                is_hazardous = neo.get('is_potentially_hazardous_asteroid', False)
-                
-                # Generate orbital position (simplified circular orbit for visualization)
-                # Convert semi-major axis from AU to our scene units (Earth-Moon system scale)
-                # 1 AU ≈ 150 million km, Earth-Moon distance ≈ 384,400 km
-                # In our scene: Earth-Moon distance = 60 units
-                # So 1 AU ≈ 60 * (150M / 0.384M) ≈ 23,437 units (too big for visualization)
-                # Scale it down for better visualization
-                
-                orbit_radius = max(80, min(300, semi_major_axis * 50))  # Scale for visibility
-                
-                # Random position on orbit (since we don't have real-time position data)
-                angle = hash(neo_id) % 360  # Deterministic but varied positioning
-                angle_rad = math.radians(angle)
-                
-                # Apply inclination
-                inclination_rad = math.radians(inclination)
-                
-                x = orbit_radius * math.cos(angle_rad)
-                z = orbit_radius * math.sin(angle_rad) * math.cos(inclination_rad)
-                y = orbit_radius * math.sin(angle_rad) * math.sin(inclination_rad)
-                
-                # Calculate size for visualization (scaled down from real size)
-                size = max(0.2, min(2.0, math.log10(avg_diameter) * 0.3))
-                
-                # Calculate orbital velocity and trajectory
-                current_radius = orbit_radius
-                velocity = calculate_orbital_velocity(semi_major_axis, current_radius)
-                trajectory = calculate_trajectory_points(
-                    {'x': x, 'y': y, 'z': z}, 
-                    velocity, 
-                    orbit_radius, 
-                    inclination, 
-                    eccentricity,
-                    num_points=120,  # More points for smoother curves
-                    orbit_fraction=0.8  # Show 80% of orbit
-                )
-                
-                # Ensure the meteorite position matches the first trajectory point
-                if trajectory and len(trajectory) > 0:
-                    first_point = trajectory[0]
-                    x, y, z = first_point['x'], first_point['y'], first_point['z']
-                
-                # Calculate impact statistics
-                impact_stats = calculate_impact_statistics(avg_diameter, semi_major_axis)
-                
-                processed_neo = {
-                    'name': name.replace('(', '').replace(')', ''),  # Clean name
-                    'id': neo_id,
-                    'position': {'x': x, 'y': y, 'z': z},
-                    'diameter_meters': avg_diameter,
-                    'orbit_radius_au': semi_major_axis,
-                    'eccentricity': eccentricity,
-                    'inclination': inclination,
-                    'is_hazardous': is_hazardous,
-                    'size': size,
-                    'velocity': velocity,
-                    'trajectory': trajectory,
-                    'impact_stats': impact_stats
-                }
-                
-                processed_neos.append(processed_neo)
-                
-            except (ValueError, TypeError, KeyError) as e:
-                print(f"Skipping NEO due to data error: {e}")
-                continue
+        processed_neos = process_neos(neos_raw)
         
         print(f"Processed {len(processed_neos)} valid Near Earth Objects")
         
         if len(processed_neos) > 0:
-            return create_neo_output_file(processed_neos, base_url)
+            return create_neo_output_file(processed_neos, base_url, output_path)
         else:
             print("No valid NEO data found")
             return None
@@ -339,7 +451,445 @@ def fetch_nasa_neos():
         print(f"Unexpected error: {e}")
         return None
 
-def create_neo_output_file(processed_neos, source_url):
+
+def make_session(pool_size=8):
+    """requests.Session with a connection pool sized for `pool_size` concurrent requests."""
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+class HttpCache:
+    """
+    On-disk cache of GET responses, one JSON file per URL + query (the API key
+    is left out of the key). Cached entries are revalidated with If-None-Match
+    and If-Modified-Since; a 304 reuses the stored body.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self.counters = {'not_modified': 0, 'fetched': 0}
+
+    def _path(self, url, params):
+        relevant = sorted((k, str(v)) for k, v in params.items() if k != 'api_key')
+        key = hashlib.sha1(json.dumps([url, relevant]).encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, key + '.json')
+
+    def load(self, url, params):
+        try:
+            with open(self._path(url, params), encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def conditional_headers(self, entry):
+        headers = {}
+        if entry and entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry and entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def store(self, url, params, response):
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        if not etag and not last_modified:
+            return      # nothing to revalidate against next time
+        write_json_atomic(self._path(url, params),
+                          {'etag': etag, 'last_modified': last_modified, 'body': response.text})
+
+    def count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+
+def fetch_page(session, base_url, page, page_size, api_key=NASA_API_KEY, limiter=None,
+               max_retries=5, backoff=1.0, timeout=30, http_cache=None):
+    """
+    GET one browse page and return its JSON. Retries 429/5xx and connection
+    errors with exponential backoff plus jitter, honouring Retry-After.
+    With http_cache the request is conditional and a 304 returns the cached page.
+    """
+    params = {"api_key": api_key, "size": page_size, "page": page}
+    cached = http_cache.load(base_url, params) if http_cache is not None else None
+    headers = http_cache.conditional_headers(cached) if http_cache is not None else {}
+    for attempt in range(max_retries + 1):
+        if limiter is not None:
+            limiter.acquire()
+        try:
+            response = session.get(base_url, params=params, headers=headers, timeout=timeout)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            if attempt == max_retries:
+                raise
+            delay = backoff * (2 ** attempt)
+            print(f"Page {page}: {e}; retrying in {delay:.1f}s")
+        else:
+            if response.status_code == 304 and cached is not None:
+                http_cache.count('not_modified')
+                return json.loads(cached['body'])
+            if response.status_code not in RETRY_STATUS or attempt == max_retries:
+                response.raise_for_status()
+                if http_cache is not None:
+                    http_cache.count('fetched')
+                    http_cache.store(base_url, params, response)
+                return response.json()
+            retry_after = response.headers.get('Retry-After')
+            try:
+                delay = float(retry_after)
+            except (TypeError, ValueError):
+                delay = backoff * (2 ** attempt)
+            print(f"Page {page}: HTTP {response.status_code}; retrying in {delay:.1f}s")
+        time.sleep(delay + random.uniform(0, backoff))
+
+
+def iter_catalog_pages(base_url=NEO_BROWSE_URL, api_key=NASA_API_KEY, page_size=20, max_pages=None,
+                       concurrency=4, rate_limit=5.0, max_retries=5, backoff=1.0, session=None,
+                       http_cache=None):
+    """
+    Yield (page_number, raw_neos) for every page of the browse catalog, in
+    completion order. Page 0 is fetched first to learn total_pages; the rest
+    are fetched by a thread pool with at most 2 * concurrency pages in flight,
+    so raw pages are dropped as soon as the caller has processed them.
+    """
+    session = session or make_session(concurrency)
+    limiter = RateLimiter(rate_limit, burst=concurrency)
+
+    def fetch(page):
+        return fetch_page(session, base_url, page, page_size, api_key, limiter, max_retries, backoff,
+                          http_cache=http_cache)
+
+    first = fetch(0)
+    total_pages = int(first.get('page', {}).get('total_pages', 1))
+    if max_pages is not None:
+        total_pages = min(total_pages, max_pages)
+    print(f"Catalog has {first.get('page', {}).get('total_elements', '?')} NEOs; fetching {total_pages} pages")
+    yield 0, first.get('near_earth_objects', [])
+    del first
+
+    pending_pages = iter(range(1, total_pages))
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        in_flight = {}
+        for page in itertools.islice(pending_pages, 2 * concurrency):
+            in_flight[pool.submit(fetch, page)] = page
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                page = in_flight.pop(future)
+                data = future.result()
+                for next_page in itertools.islice(pending_pages, 1):
+                    in_flight[pool.submit(fetch, next_page)] = next_page
+                yield page, data.get('near_earth_objects', [])
+
+
+def fetch_all_neos(output_path='meteorites_data.json', base_url=NEO_BROWSE_URL, **options):
+    """
+    Full-catalog ingestion: walk every browse page concurrently (see
+    iter_catalog_pages for the options) and process each page as it arrives.
+    Output order follows page order and duplicated ids are kept once.
+    """
+    started = time.monotonic()
+    by_page = {}
+    raw_count = 0
+    try:
+        for page, neos_raw in iter_catalog_pages(base_url=base_url, **options):
+            processed = process_neos(neos_raw)
+            raw_count += len(neos_raw)
+            by_page[page] = processed
+            print(f"Page {page}: {len(processed)} NEOs ({time.monotonic() - started:.1f}s)")
+    except (requests.RequestException, json.JSONDecodeError) as e:
+        print(f"Error fetching the NEO catalog: {e}")
+        return None
+
+    seen = set()
+    processed_neos = []
+    for page in sorted(by_page):
+        for neo in by_page[page]:
+            if neo['id'] not in seen:
+                seen.add(neo['id'])
+                processed_neos.append(neo)
+    print(f"Processed {len(processed_neos)} of {raw_count} NEOs from {len(by_page)} pages "
+          f"in {time.monotonic() - started:.1f}s")
+    if not processed_neos:
+        print("No valid NEO data found")
+        return None
+    return create_neo_output_file(processed_neos, base_url, output_path)
+
+def _write_atomic(path, write, mode='w'):
+    """
+    Call write(f) on a temp file in the same directory and rename it over `path`,
+    so readers (e.g. the Flask app's catalog watcher) never see a partial file.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix='.' + os.path.basename(path) + '.', suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, mode) as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_path, 0o644)   # mkstemp creates 0600; the files are served to browsers
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def write_json_atomic(path, data, indent=None):
+    """Atomically write `data` as JSON to `path`."""
+    _write_atomic(path, lambda f: json.dump(data, f, indent=indent))
+
+
+# Binary catalog (meteorites_data.bin): same NEOs as the JSON file, with positions
+# and trajectories as float32 so a browser can wrap them as Float32Array views.
+#
+#   offset 0   magic b'NEOB', uint32 version, uint32 header_bytes, uint32 count
+#   offset 16  UTF-8 JSON header (metadata, scalar fields of each NEO, sections),
+#              space-padded to a multiple of 4 bytes
+#   body       sections at the byte offsets listed in header['sections'],
+#              relative to the start of the body (16 + header_bytes):
+#                offsets    uint32[count + 1]   first point of NEO i is offsets[i]
+#                positions  float32[count * 3]  x, y, z of each NEO
+#                points     float32[total * 3]  all trajectories back to back
+#
+# Everything is little-endian and 4-byte aligned.
+BINARY_MAGIC = b'NEOB'
+BINARY_VERSION = 1
+BINARY_PREFIX = struct.Struct('<4sIII')
+BINARY_OMITTED_FIELDS = ('position', 'trajectory')
+
+
+def binary_catalog_path(json_path):
+    """meteorites_data.json -> meteorites_data.bin"""
+    return os.path.splitext(json_path)[0] + '.bin'
+
+
+def _xyz(point):
+    point = point or {}
+    return (point.get('x', 0.0), point.get('y', 0.0), point.get('z', 0.0))
+
+
+def encode_binary_catalog(output_data):
+    """Encode a catalog dict ({'metadata', 'neos'}) into the binary layout above."""
+    neos = output_data.get('neos', [])
+    count = len(neos)
+    offsets = np.zeros(count + 1, dtype='<u4')
+    positions = np.zeros((count, 3), dtype='<f4')
+    trajectories = []
+    scalars = []
+    for i, neo in enumerate(neos):
+        positions[i] = _xyz(neo.get('position'))
+        points = np.array([_xyz(p) for p in neo.get('trajectory') or []], dtype='<f4').reshape(-1, 3)
+        trajectories.append(points)
+        offsets[i + 1] = offsets[i] + len(points)
+        scalars.append({k: v for k, v in neo.items() if k not in BINARY_OMITTED_FIELDS})
+    points = np.concatenate(trajectories) if trajectories else np.zeros((0, 3), dtype='<f4')
+
+    sections = {}
+    body = []
+    position = 0
+    for name, array in (('offsets', offsets), ('positions', positions), ('points', points)):
+        raw = array.tobytes()
+        sections[name] = {'offset': position, 'bytes': len(raw)}
+        body.append(raw)
+        position += len(raw)
+
+    header = json.dumps({
+        'version': BINARY_VERSION,
+        'metadata': output_data.get('metadata', {}),
+        'count': count,
+        'point_count': int(offsets[-1]),
+        'neos': scalars,
+        'sections': sections,
+    }, separators=(',', ':')).encode('utf-8')
+    header += b' ' * (-len(header) % 4)
+    return BINARY_PREFIX.pack(BINARY_MAGIC, BINARY_VERSION, len(header), count) + header + b''.join(body)
+
+
+def decode_binary_catalog(data):
+    """
+    Inverse of encode_binary_catalog.
+    Returns (header, offsets, positions, points) with numpy views over `data`.
+    """
+    magic, version, header_bytes, count = BINARY_PREFIX.unpack_from(data, 0)
+    if magic != BINARY_MAGIC or version != BINARY_VERSION:
+        raise ValueError(f"Not a version {BINARY_VERSION} NEO binary catalog")
+    header = json.loads(bytes(data[BINARY_PREFIX.size:BINARY_PREFIX.size + header_bytes]))
+    body = BINARY_PREFIX.size + header_bytes
+
+    def section(name, dtype):
+        info = header['sections'][name]
+        return np.frombuffer(data, dtype=dtype, count=info['bytes'] // np.dtype(dtype).itemsize,
+                             offset=body + info['offset'])
+
+    return (header, section('offsets', '<u4'),
+            section('positions', '<f4').reshape(count, 3), section('points', '<f4').reshape(-1, 3))
+
+
+# SQLite catalog (meteorites_data.sqlite): one row per NEO with the fields the
+# API filters and sorts on as indexed columns, plus the whole record (without
+# its trajectory, which the API generates on demand) as JSON.
+CATALOG_DB_VERSION = 1
+CATALOG_DB_COLUMNS = (
+    # column, type, value from the record
+    ('id', 'TEXT', lambda neo: None if neo.get('id') is None else str(neo['id'])),
+    ('name', 'TEXT', lambda neo: neo.get('name')),
+    ('is_hazardous', 'INTEGER', lambda neo: int(bool(neo.get('is_hazardous')))),
+    ('diameter_meters', 'REAL', lambda neo: neo.get('diameter_meters')),
+    ('orbit_radius_au', 'REAL', lambda neo: neo.get('orbit_radius_au')),
+    ('inclination', 'REAL', lambda neo: neo.get('inclination')),
+    ('energy_megatons', 'REAL', lambda neo: (neo.get('impact_stats') or {}).get('energy_megatons')),
+)
+
+
+def catalog_db_path(json_path):
+    """meteorites_data.json -> meteorites_data.sqlite"""
+    return os.path.splitext(json_path)[0] + '.sqlite'
+
+
+def write_catalog_db(path, output_data):
+    """
+    Build the SQLite catalog in a temp file and rename it over `path`, so
+    readers keep their open (old) database until they reopen the new one.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix='.' + os.path.basename(path) + '.', suffix='.tmp', dir=directory)
+    os.close(fd)
+    try:
+        conn = sqlite3.connect(tmp_path)
+        try:
+            columns = ', '.join(f'{name} {kind}' for name, kind, _ in CATALOG_DB_COLUMNS)
+            conn.execute('CREATE TABLE metadata (key TEXT PRIMARY KEY, value TEXT NOT NULL)')
+            conn.execute(f'CREATE TABLE neos (rowid INTEGER PRIMARY KEY, {columns}, record TEXT NOT NULL)')
+            conn.executemany('INSERT INTO metadata VALUES (?, ?)', [
+                ('schema_version', json.dumps(CATALOG_DB_VERSION)),
+                ('metadata', json.dumps(output_data.get('metadata', {}))),
+            ])
+            placeholders = ', '.join('?' * (len(CATALOG_DB_COLUMNS) + 1))
+            conn.executemany(f'INSERT INTO neos VALUES (NULL, {placeholders})', (
+                [value(neo) for _, _, value in CATALOG_DB_COLUMNS]
+                + [json.dumps({k: v for k, v in neo.items() if k != 'trajectory'})]
+                for neo in output_data.get('neos', [])))
+            # Built after the inserts, which is faster than maintaining them row by row
+            for name, _, _ in CATALOG_DB_COLUMNS:
+                conn.execute(f'CREATE INDEX neos_{name} ON neos ({name})')
+            conn.commit()
+        finally:
+            conn.close()
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def write_binary_catalog(path, output_data):
+    """Atomically write the binary form of `output_data` to `path`; returns its size in bytes."""
+    body = encode_binary_catalog(output_data)
+    _write_atomic(path, lambda f: f.write(body), mode='wb')
+    return len(body)
+
+
+def load_existing_catalog(path):
+    """Previous output file as a list of NEO records ([] if missing or unreadable)."""
+    try:
+        with open(path) as f:
+            return json.load(f).get('neos', [])
+    except (OSError, ValueError, AttributeError):
+        return []
+
+
+def refresh_catalog(output_path='meteorites_data.json', full=False, base_url=NEO_BROWSE_URL,
+                    http_cache_dir='.neows_http_cache', prune=False, **options):
+    """
+    Incremental refresh of an existing output file.
+    Pages are fetched with conditional requests against an on-disk HTTP cache;
+    a NEO is reprocessed only if its fingerprint (diameter, orbit, name,
+    hazard flag) changed, and the merge into the previous catalog is keyed by
+    id. NEOs missing from the fetch are kept unless `prune` is set on a full
+    run. The file is replaced atomically and a change summary is returned.
+    """
+    started = time.monotonic()
+    http_cache = HttpCache(http_cache_dir)
+    existing = load_existing_catalog(output_path)
+    by_id = {neo['id']: neo for neo in existing if 'id' in neo}
+    summary = {'added': [], 'updated': [], 'unchanged': 0, 'removed': [], 'skipped': 0}
+    seen = set()
+    new_records = []
+
+    try:
+        if full:
+            pages = iter_catalog_pages(base_url=base_url, http_cache=http_cache, **options)
+        else:
+            page = fetch_page(make_session(1), base_url, 0, options.get('page_size', 100),
+                              options.get('api_key', NASA_API_KEY),
+                              max_retries=options.get('max_retries', 5), backoff=options.get('backoff', 1.0),
+                              http_cache=http_cache)
+            pages = [(0, page.get('near_earth_objects', []))]
+        for _, neos_raw in pages:
+            changed_raw = []
+            for raw in neos_raw:
+                neo_id = raw.get('id')
+                if neo_id is None or neo_id in seen:
+                    continue
+                seen.add(neo_id)
+                previous = by_id.get(neo_id)
+                if previous is not None and previous.get('source_hash') == neo_fingerprint(raw):
+                    summary['unchanged'] += 1
+                else:
+                    changed_raw.append(raw)
+            records = process_neos(changed_raw)
+            summary['skipped'] += len(changed_raw) - len(records)
+            for record in records:
+                neo_id = record['id']
+                if neo_id in by_id:
+                    summary['updated'].append(neo_id)
+                    by_id[neo_id] = record
+                else:
+                    summary['added'].append(neo_id)
+                    new_records.append(record)
+    except (requests.RequestException, json.JSONDecodeError) as e:
+        print(f"Error fetching the NEO catalog, keeping {output_path} untouched: {e}")
+        return None
+
+    merged = []
+    for neo in existing:
+        neo_id = neo.get('id')
+        if prune and full and neo_id not in seen:
+            summary['removed'].append(neo_id)
+            continue
+        merged.append(by_id.get(neo_id, neo))
+    merged.extend(new_records)
+
+    changed = summary['added'] or summary['updated'] or summary['removed']
+    if changed or not existing:
+        create_neo_output_file(merged, base_url, output_path)
+    else:
+        print(f"No changes; {output_path} left untouched")
+
+    result = {
+        'added': len(summary['added']),
+        'updated': len(summary['updated']),
+        'removed': len(summary['removed']),
+        'unchanged': summary['unchanged'],
+        'skipped': summary['skipped'],
+        'pages_not_modified': http_cache.counters['not_modified'],
+        'pages_fetched': http_cache.counters['fetched'],
+        'seconds': round(time.monotonic() - started, 2),
+        'changed_ids': {key: summary[key][:50] for key in ('added', 'updated', 'removed')},
+    }
+    print("Change summary: " + json.dumps(result))
+    return result
+
+
+def create_neo_output_file(processed_neos, source_url, output_path='meteorites_data.json'):
     """Create the output JSON file for NEOs"""
     # Separate hazardous and non-hazardous asteroids
     hazardous_count = sum(1 for neo in processed_neos if neo['is_hazardous'])
@@ -356,10 +906,13 @@ def create_neo_output_file(processed_neos, source_url):
         'neos': processed_neos
     }
     
-    with open('meteorites_data.json', 'w') as f:
-        json.dump(output_data, f, indent=2)
+    write_json_atomic(output_path, output_data, indent=2)
+    binary_bytes = write_binary_catalog(binary_catalog_path(output_path), output_data)
+    write_catalog_db(catalog_db_path(output_path), output_data)
     
-    print(f"NEO data saved to meteorites_data.json")
+    print(f"NEO data saved to {output_path}")
+    print(f"Binary catalog saved to {binary_catalog_path(output_path)} ({binary_bytes} bytes)")
+    print(f"SQLite catalog saved to {catalog_db_path(output_path)}")
     print(f"Total NEOs: {len(processed_neos)}")
     print(f"Potentially hazardous: {hazardous_count}")
     
@@ -371,7 +924,7 @@ def create_neo_output_file(processed_neos, source_url):
     return output_data
     return output_data
 
-def create_sample_data():
+def create_sample_data(output_path='meteorites_data.json'):
     """
     Create sample NEO data if NASA API is unavailable
     """
@@ -392,9 +945,10 @@ def create_sample_data():
     ]
     
     processed_neos = []
+    orbits = []
     
     for i, neo in enumerate(sample_neos):
-        orbit_radius = max(80, min(300, neo['orbit_radius'] * 50))
+        orbit_radius = scene_orbit_radius(neo['orbit_radius'])
         
         # Distribute around orbit
         angle = (i * 36) % 360  # Spread them out
@@ -407,18 +961,10 @@ def create_sample_data():
         
         size = max(0.3, min(2.0, math.log10(neo['diameter']) * 0.5))
         
-        # Calculate orbital velocity and trajectory for sample data
+        # Calculate orbital velocity for sample data (trajectories are computed below, all at once)
         current_radius = orbit_radius
         velocity = calculate_orbital_velocity(neo['orbit_radius'], current_radius)
-        trajectory = calculate_trajectory_points(
-            {'x': x, 'y': y, 'z': z}, 
-            velocity, 
-            orbit_radius, 
-            i * 5, 
-            eccentricity=0.1,
-            num_points=120,  # More points for smoother curves
-            orbit_fraction=0.8  # Show 80% of orbit
-        )
+        orbits.append((orbit_radius, i * 5, 0.1, math.atan2(z, x)))
         
         processed_neo = {
             'name': neo['name'],
@@ -431,11 +977,18 @@ def create_sample_data():
             'is_hazardous': neo['hazardous'],
             'size': size,
             'velocity': velocity,
-            'trajectory': trajectory
+            'trajectory': None
         }
         
         processed_neos.append(processed_neo)
     
+    orbit_radius, inclination, eccentricity, phase = np.array(orbits).T
+    trajectories = calculate_trajectories(orbit_radius, inclination, eccentricity, phase,
+                                          num_points=120,  # More points for smoother curves
+                                          orbit_fraction=0.8)  # Show 80% of orbit
+    for processed_neo, points in zip(processed_neos, trajectories):
+        processed_neo['trajectory'] = trajectory_to_dicts(points)
+    
     hazardous_count = sum(1 for neo in processed_neos if neo['is_hazardous'])
     
     output_data = {
@@ -450,24 +1003,60 @@ def create_sample_data():
         'neos': processed_neos
     }
     
-    with open('meteorites_data.json', 'w') as f:
-        json.dump(output_data, f, indent=2)
+    write_json_atomic(output_path, output_data, indent=2)
+    write_binary_catalog(binary_catalog_path(output_path), output_data)
+    write_catalog_db(catalog_db_path(output_path), output_data)
     
-    print(f"Sample NEO data saved to meteorites_data.json")
+    print(f"Sample NEO data saved to {output_path} (and its .bin/.sqlite)")
     print(f"Total NEOs: {len(processed_neos)}")
     print(f"Potentially hazardous: {hazardous_count}")
     return output_data
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fetch NASA NeoWs data into meteorites_data.json")
+    parser.add_argument('--all', action='store_true',
+                        help="walk the whole browse catalog instead of the first 100 NEOs")
+    parser.add_argument('--base-url', default=NEO_BROWSE_URL,
+                        help="browse endpoint (point it at a local stub for tests)")
+    parser.add_argument('--output', default='meteorites_data.json')
+    parser.add_argument('--concurrency', type=int, default=4, help="pages fetched in parallel")
+    parser.add_argument('--rate', type=float, default=5.0, help="max requests per second (0 = unlimited)")
+    parser.add_argument('--page-size', type=int, default=20)
+    parser.add_argument('--max-pages', type=int, default=None)
+    parser.add_argument('--retries', type=int, default=5)
+    parser.add_argument('--backoff', type=float, default=1.0, help="base delay for exponential backoff (s)")
+    parser.add_argument('--incremental', action='store_true',
+                        help="merge changes into the existing output instead of rebuilding it")
+    parser.add_argument('--http-cache', default='.neows_http_cache',
+                        help="directory for cached responses (used with --incremental)")
+    parser.add_argument('--prune', action='store_true',
+                        help="with --all --incremental, drop NEOs no longer in the catalog")
+    args = parser.parse_args()
+
     print("NASA Near Earth Objects (NEO) Data Fetcher")
     print("=" * 50)
     
-    # Try to fetch real NEO data from NASA API
-    data = fetch_nasa_neos()
+    if args.incremental:
+        options = {'page_size': args.page_size if args.all else 100,
+                   'max_retries': args.retries, 'backoff': args.backoff}
+        if args.all:
+            options.update(max_pages=args.max_pages, concurrency=args.concurrency, rate_limit=args.rate)
+        data = refresh_catalog(args.output, full=args.all, base_url=args.base_url,
+                               http_cache_dir=args.http_cache, prune=args.prune, **options)
+    elif args.all:
+        data = fetch_all_neos(args.output, base_url=args.base_url, page_size=args.page_size,
+                              max_pages=args.max_pages, concurrency=args.concurrency,
+                              rate_limit=args.rate, max_retries=args.retries, backoff=args.backoff)
+    else:
+        # Try to fetch real NEO data from NASA API
+        data = fetch_nasa_neos(args.output)
     
-    # If NASA API fails, create sample data
+    # If NASA API fails, create sample data (--all and --incremental runs keep the existing file instead)
+    if data is None and (args.incremental or args.all):
+        print(f"\nCatalog fetch failed; {args.output} left untouched")
+        raise SystemExit(1)
     if data is None:
         print("\nNASA NEO API unavailable, creating sample data...")
-        data = create_sample_data()
+        data = create_sample_data(args.output)
     
     print("\nDone! Run the HTML file to see Near Earth Objects rendered around Earth.")